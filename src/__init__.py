@@ -7,12 +7,14 @@ __version__ = "2.0.0-local"
 __author__ = "masa-jp-art"
 
 from .ollama_client import OllamaClient
+from .async_ollama_client import AsyncOllamaClient
 from .checkpoint_manager import CheckpointManager
 from .utils import load_config, load_prompts, data_to_markdown, rich_print, setup_logging
 from .pipeline import Pipeline
 
 __all__ = [
     "OllamaClient",
+    "AsyncOllamaClient",
     "CheckpointManager",
     "Pipeline",
     "load_config",
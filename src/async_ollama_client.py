@@ -0,0 +1,121 @@
+"""
+Async Ollama Client Module
+asyncio front end for OllamaClient with bounded request concurrency
+"""
+
+import asyncio
+import weakref
+from typing import Optional, Dict, Any, Callable
+from loguru import logger
+
+from .ollama_client import OllamaClient
+
+
+class AsyncOllamaClient:
+    """
+    asyncio client for Ollama API
+
+    Wraps an OllamaClient and runs its generation methods in worker
+    threads, with at most max_parallel_requests calls in flight at once.
+    Caching, retries, circuit breaking, JSON repair, output budgets and
+    continuations are the wrapped client's; server/model management is
+    done on the wrapped client directly.
+    """
+
+    def __init__(
+        self,
+        client: Optional[OllamaClient] = None,
+        max_parallel_requests: int = 3,
+        **kwargs,
+    ):
+        """
+        Initialize async Ollama client
+
+        Args:
+            client: Client to wrap (a new OllamaClient built from kwargs if None)
+            max_parallel_requests: Maximum number of concurrent requests
+                (performance.max_parallel_requests)
+            **kwargs: Keyword arguments for OllamaClient when client is None
+        """
+        if client is None:
+            kwargs.setdefault("pool_size", max_parallel_requests)
+            client = OllamaClient(**kwargs)
+        self.client = client
+
+        self.max_parallel_requests = max(1, int(max_parallel_requests))
+        # One semaphore per event loop, so the client can be reused across asyncio.run calls
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        logger.info(
+            f"Initialized AsyncOllamaClient (max parallel requests: {self.max_parallel_requests})"
+        )
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """
+        Get the concurrency semaphore for the running event loop
+
+        Returns:
+            Semaphore limiting in-flight requests
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_parallel_requests)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def _run(self, method: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking client method in a worker thread once a slot is free
+
+        Args:
+            method: Bound OllamaClient method
+            *args: Positional arguments for it
+            **kwargs: Keyword arguments for it
+
+        Returns:
+            The method's result
+        """
+        async with self._get_semaphore():
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+    async def generate(self, prompt: str, **kwargs) -> Optional[str]:
+        """
+        Generate text using Ollama API
+
+        Args:
+            prompt: Input prompt
+            **kwargs: Arguments of OllamaClient.generate
+
+        Returns:
+            Generated text, or None on failure
+        """
+        return await self._run(self.client.generate, prompt, **kwargs)
+
+    async def generate_json(self, prompt: str, **kwargs) -> Optional[Dict[str, Any]]:
+        """
+        Generate JSON output
+
+        Args:
+            prompt: Input prompt
+            **kwargs: Arguments of OllamaClient.generate_json
+
+        Returns:
+            Parsed JSON dictionary, or None on failure
+        """
+        return await self._run(self.client.generate_json, prompt, **kwargs)
+
+    async def generate_text(self, prompt: str, **kwargs) -> Optional[str]:
+        """
+        Generate free-form text (for novels, references)
+
+        Args:
+            prompt: Input prompt
+            **kwargs: Arguments of OllamaClient.generate_text (including stream)
+
+        Returns:
+            Generated text, or None on failure
+        """
+        return await self._run(self.client.generate_text, prompt, **kwargs)
@@ -0,0 +1,490 @@
+"""
+Benchmark Module
+End-to-end pipeline benchmark against the mock server with per-phase breakdown
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional
+
+import yaml as yaml_lib
+from loguru import logger
+
+from .pipeline import Pipeline
+from .utils import load_config, setup_logging
+
+try:
+    import psutil
+except ImportError:  # Optional dependency: fall back to getrusage (process-lifetime peak)
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+# Simulated backends (development.mock_server settings). Rates are for a
+# 20B model on a single local machine; concurrency is OLLAMA_NUM_PARALLEL.
+LATENCY_PROFILES: Dict[str, Dict[str, Any]] = {
+    "instant": {"load_time": 0.0, "tokens_per_second": 0.0, "prompt_tokens_per_second": 0.0, "concurrency": 4},
+    "gpu": {"load_time": 6.0, "tokens_per_second": 45.0, "prompt_tokens_per_second": 1500.0, "concurrency": 1},
+    "gpu_parallel": {"load_time": 6.0, "tokens_per_second": 45.0, "prompt_tokens_per_second": 1500.0, "concurrency": 4},
+    # One slow request in twenty (busy node); two slots leave room for a hedge
+    "gpu_stragglers": {
+        "load_time": 6.0, "tokens_per_second": 45.0, "prompt_tokens_per_second": 1500.0, "concurrency": 2,
+        "straggler_rate": 0.05, "straggler_factor": 5.0,
+    },
+    "cpu": {"load_time": 20.0, "tokens_per_second": 8.0, "prompt_tokens_per_second": 60.0, "concurrency": 1},
+}
+
+PHASES = ["phase0", "phase1", "phase2", "phase3", "phase4", "phase5", "phase6"]
+
+_BENCHMARK_VERSION = 1
+
+
+def scale_profile(profile: Dict[str, Any], time_scale: float) -> Dict[str, Any]:
+    """
+    Speed up a latency profile
+
+    Args:
+        profile: Latency profile
+        time_scale: Factor by which every simulated duration is divided
+
+    Returns:
+        Mock server settings with load time divided and token rates multiplied
+    """
+    return {
+        **profile,
+        "load_time": profile["load_time"] / time_scale,
+        "tokens_per_second": profile["tokens_per_second"] * time_scale,
+        "prompt_tokens_per_second": profile["prompt_tokens_per_second"] * time_scale,
+    }
+
+
+def step_dependencies(pipeline: Pipeline) -> Dict[str, List[str]]:
+    """
+    Get the steps each full-pipeline step waits for
+
+    Taken from the step graph run_full_pipeline runs, so the dependencies
+    follow the pipeline's configuration (digests, packing). Checkpoint
+    steps are included; they make no LLM call.
+
+    Args:
+        pipeline: Pipeline whose graph to read
+
+    Returns:
+        Step name -> names of the steps it depends on
+    """
+    state = {"phase1": {}, "characters_list": "", "world_data": {}, "plot_data": {}, "novels": {}, "references": {}}
+    graph = pipeline._build_pipeline_graph("", state)
+    return {step: graph.dependencies(step) for step in graph.order()}
+
+
+def _graph_step(step: str, dependencies: Dict[str, List[str]]) -> str:
+    """
+    Get the graph step a call was made by
+
+    Separate requests for failed packed slots ("phase4.extract_keywords.03",
+    "phase6.media.md") are made by the packed step ("phase4.extract_keywords.packed",
+    "phase6.packed"); other calls are named like their step.
+    """
+    if step in dependencies:
+        return step
+    parts = step.split(".")
+    for end in range(len(parts) - 1, 0, -1):
+        packed = ".".join(parts[:end]) + ".packed"
+        if packed in dependencies:
+            return packed
+    return step
+
+
+def critical_path_seconds(step_seconds: Dict[str, float], dependencies: Dict[str, List[str]]) -> float:
+    """
+    Length of the longest chain of dependent LLM calls
+
+    This is the wall time the steps would take with unlimited parallelism;
+    steps without calls in step_seconds take no time.
+
+    Args:
+        step_seconds: Step name -> total call time of that step
+        dependencies: Step name -> steps it waits for (see step_dependencies)
+
+    Returns:
+        Critical path time in seconds
+    """
+    seconds: Dict[str, float] = defaultdict(float)
+    for step, value in step_seconds.items():
+        seconds[_graph_step(step, dependencies)] += value
+    finish: Dict[str, float] = {}
+
+    def finish_time(step: str) -> float:
+        if step not in finish:
+            ready = max((finish_time(dep) for dep in dependencies.get(step, [])), default=0.0)
+            finish[step] = ready + seconds.get(step, 0.0)
+        return finish[step]
+
+    return max((finish_time(step) for step in seconds), default=0.0)
+
+
+def _directory_bytes(path: Path) -> int:
+    """Total size of the files under a directory"""
+    if not path.exists():
+        return 0
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def _current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, if psutil is installed"""
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class _PeakRssSampler:
+    """
+    Samples this process's RSS in a background thread
+
+    Without psutil, falls back to the getrusage high-water mark, which
+    covers the whole process lifetime rather than the sampled interval.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        while True:
+            self.peak = max(self.peak, _current_rss() or 0)
+            if self._stop.wait(self.interval):
+                break
+
+    def __enter__(self) -> "_PeakRssSampler":
+        if psutil is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, _current_rss() or 0)
+        elif resource is not None:
+            # ru_maxrss is in kilobytes on Linux
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _git_commit() -> Optional[str]:
+    """Current git commit hash, or None outside a git checkout"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def _read_call_records(pipeline: Pipeline) -> List[Dict[str, Any]]:
+    """Load the call records the pipeline's metrics recorder has written"""
+    if pipeline.metrics is None or not pipeline.metrics.jsonl_path.exists():
+        return []
+    with open(pipeline.metrics.jsonl_path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _step_seconds(records: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Total wall time per step (including retries and continuations)"""
+    seconds: Dict[str, float] = defaultdict(float)
+    for record in records:
+        seconds[record["step"]] += record.get("wall_seconds") or 0.0
+    return dict(seconds)
+
+
+class PipelineBenchmark:
+    """
+    Runs the pipeline against the mock server and measures each phase
+
+    Every run gets a fresh output directory, metrics file and mock server,
+    so results do not depend on earlier runs or on the response cache.
+    """
+
+    def __init__(
+        self,
+        profile: str = "instant",
+        time_scale: float = 1.0,
+        config_path: str = "config/ollama_config.yaml",
+        prompts_dir: str = "config/prompts",
+        seed: int = 0,
+        hedging: bool = False,
+    ):
+        """
+        Initialize benchmark
+
+        Args:
+            profile: Name of a latency profile in LATENCY_PROFILES
+            time_scale: Factor by which simulated durations are divided
+            config_path: Base configuration file
+            prompts_dir: Directory containing prompt templates
+            seed: Seed for the pipeline's random sampling
+            hedging: Enable performance.hedging (delays scaled like the profile)
+        """
+        if profile not in LATENCY_PROFILES:
+            raise ValueError(f"Unknown latency profile: {profile} (choose from {', '.join(LATENCY_PROFILES)})")
+
+        self.profile = profile
+        self.time_scale = time_scale
+        self.config_path = config_path
+        self.prompts_dir = prompts_dir
+        self.seed = seed
+        self.hedging = hedging
+        self.mock_settings = scale_profile(LATENCY_PROFILES[profile], time_scale)
+        self._run_critical_path = 0.0
+
+    def _write_config(self, work_dir: Path) -> Path:
+        """Write the benchmark configuration (mock backend, isolated outputs)"""
+        config = load_config(self.config_path)
+        development = config.setdefault("development", {})
+        development["mock_api_calls"] = True
+        development["mock_server"] = {**development.get("mock_server", {}), **self.mock_settings, "seed": self.seed}
+        config.setdefault("output", {})["base_dir"] = str(work_dir / "output")
+        config.setdefault("checkpointing", {})["output_dir"] = str(work_dir / "output" / "checkpoints")
+        config["metrics"] = {"enabled": True, "dir": str(work_dir / "metrics"), "prometheus_file": None}
+        config.setdefault("performance", {})["use_context_cache"] = False
+        config.setdefault("safety", {}).setdefault("rate_limit", {})["enabled"] = False
+        hedging = config["performance"].setdefault("hedging", {})
+        hedging["enabled"] = self.hedging
+        hedging["min_delay"] = hedging.get("min_delay", 0.5) / self.time_scale
+
+        config_file = work_dir / "benchmark_config.yaml"
+        with open(config_file, "w", encoding="utf-8") as f:
+            yaml_lib.dump(config, f, allow_unicode=True, sort_keys=False)
+        return config_file
+
+    def _measure(self, pipeline: Pipeline, output_dir: Path, action: Callable[[], Any]) -> Dict[str, Any]:
+        """Run one action and measure it"""
+        records_before = len(_read_call_records(pipeline))
+        requests_before = pipeline.mock_server.requests
+        bytes_before = _directory_bytes(output_dir)
+
+        with _PeakRssSampler() as sampler:
+            start_time = time.perf_counter()
+            action()
+            wall_seconds = time.perf_counter() - start_time
+
+        records = _read_call_records(pipeline)[records_before:]
+        return {
+            "wall_seconds": round(wall_seconds, 4),
+            "llm_calls": len(records),
+            "http_requests": pipeline.mock_server.requests - requests_before,
+            "bytes_written": _directory_bytes(output_dir) - bytes_before,
+            "peak_rss_mb": round(sampler.peak / (1024 * 1024), 1),
+            "critical_path_seconds": round(
+                critical_path_seconds(_step_seconds(records), step_dependencies(pipeline)), 4
+            ),
+            "llm_seconds": round(sum(_step_seconds(records).values()), 4),
+        }
+
+    def run_phases(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Run Phase 0-6 one method at a time
+
+        Returns:
+            Phase name -> measurements
+        """
+        with tempfile.TemporaryDirectory(prefix="benchmark_") as temp_dir:
+            work_dir = Path(temp_dir)
+            pipeline = Pipeline(config_path=str(self._write_config(work_dir)), prompts_dir=self.prompts_dir)
+            output_dir = Path(pipeline.base_dir)
+            random.seed(self.seed)
+            state: Dict[str, Any] = {}
+
+            steps: Dict[str, Callable[[], Any]] = {
+                "phase0": lambda: state.update(user_context=pipeline.run_phase0_context_extraction()),
+                "phase1": lambda: state.update(phase1=pipeline.run_phase1_expansion(state["user_context"])),
+                "phase2": lambda: state.update(
+                    characters=pipeline.run_phase2_characters(state["user_context"], state["phase1"])
+                ),
+                "phase3": lambda: state.update(world=pipeline.run_phase3_world_building(state["phase1"])),
+                "phase4": lambda: state.update(
+                    plot=pipeline.run_phase4_plot_generation(
+                        state["user_context"], state["phase1"], state["characters"], state["world"]
+                    )
+                ),
+                "phase5": lambda: pipeline.run_phase5_novel_generation(state["characters"], state["plot"]),
+                "phase6": lambda: pipeline.run_phase6_reference_generation(
+                    state["user_context"], state["phase1"], state["characters"], state["world"], state["plot"]
+                ),
+            }
+
+            try:
+                if not pipeline.check_prerequisites():
+                    raise RuntimeError("Mock server prerequisites not met")
+                results = {}
+                for phase in PHASES:
+                    results[phase] = self._measure(pipeline, output_dir, steps[phase])
+                    logger.info(f"{phase}: {results[phase]['wall_seconds']:.2f}s, {results[phase]['llm_calls']} calls")
+                self._run_critical_path = critical_path_seconds(
+                    _step_seconds(_read_call_records(pipeline)), step_dependencies(pipeline)
+                )
+                return results
+            finally:
+                pipeline.close()
+
+    def run_full(self) -> Dict[str, Any]:
+        """
+        Run Pipeline.run_full_pipeline once
+
+        Returns:
+            Measurements for the whole run
+        """
+        with tempfile.TemporaryDirectory(prefix="benchmark_") as temp_dir:
+            work_dir = Path(temp_dir)
+            pipeline = Pipeline(config_path=str(self._write_config(work_dir)), prompts_dir=self.prompts_dir)
+            random.seed(self.seed)
+            try:
+                result = self._measure(pipeline, Path(pipeline.base_dir), pipeline.run_full_pipeline)
+                result["critical_path"] = pipeline.critical_path
+                return result
+            finally:
+                pipeline.close()
+
+    def run(self, full: bool = True) -> Dict[str, Any]:
+        """
+        Run the benchmark
+
+        Args:
+            full: Also time run_full_pipeline (a second, separate run)
+
+        Returns:
+            JSON-serializable report
+        """
+        phases = self.run_phases()
+        totals = {
+            field: round(sum(result[field] for result in phases.values()), 4)
+            for field in ("wall_seconds", "llm_calls", "http_requests", "bytes_written", "llm_seconds")
+        }
+        totals["peak_rss_mb"] = max(result["peak_rss_mb"] for result in phases.values())
+        # Across phases: a step may only wait for the steps it reads from
+        totals["critical_path_seconds"] = round(self._run_critical_path, 4)
+
+        report = {
+            "benchmark_version": _BENCHMARK_VERSION,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "profile": self.profile,
+            "time_scale": self.time_scale,
+            "mock_server": self.mock_settings,
+            "seed": self.seed,
+            "hedging": self.hedging,
+            "phases": phases,
+            "phases_total": totals,
+        }
+        if full:
+            report["full_pipeline"] = self.run_full()
+        return report
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Compare two benchmark reports
+
+    Args:
+        baseline: Earlier report
+        current: New report
+
+    Returns:
+        Phase name (plus "full_pipeline") -> field -> (baseline, current, change ratio)
+    """
+    sections = {phase: (baseline["phases"].get(phase), result) for phase, result in current["phases"].items()}
+    if "full_pipeline" in baseline and "full_pipeline" in current:
+        sections["full_pipeline"] = (baseline["full_pipeline"], current["full_pipeline"])
+
+    comparison: Dict[str, Dict[str, Any]] = {}
+    for section, (before, after) in sections.items():
+        if before is None:
+            continue
+        comparison[section] = {}
+        for field, value in after.items():
+            old = before.get(field)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            ratio = (value - old) / old if old else None
+            comparison[section][field] = (old, value, ratio)
+    return comparison
+
+
+def main() -> None:
+    """Run the benchmark from the command line"""
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against the mock Ollama server")
+    parser.add_argument("--profile", default="gpu", choices=sorted(LATENCY_PROFILES))
+    parser.add_argument("--time-scale", type=float, default=20.0, help="Divide simulated durations by this factor")
+    parser.add_argument("--config", default="config/ollama_config.yaml")
+    parser.add_argument("--prompts-dir", default="config/prompts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Report path (default: output/benchmarks/<commit>_<profile>_<time>.json)")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    parser.add_argument("--no-full", action="store_true", help="Skip the run_full_pipeline run")
+    parser.add_argument("--hedging", action="store_true", help="Enable hedged requests")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    setup_logging(log_level=args.log_level)
+
+    benchmark = PipelineBenchmark(
+        profile=args.profile,
+        time_scale=args.time_scale,
+        config_path=args.config,
+        prompts_dir=args.prompts_dir,
+        seed=args.seed,
+        hedging=args.hedging,
+    )
+    report = benchmark.run(full=not args.no_full)
+
+    output_path = Path(
+        args.output
+        or f"output/benchmarks/{report['commit'] or 'nogit'}_{args.profile}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'phase':<14}{'wall s':>10}{'crit s':>10}{'calls':>8}{'bytes':>10}{'rss MB':>9}")
+    rows = list(report["phases"].items()) + [("total", report["phases_total"])]
+    if "full_pipeline" in report:
+        rows.append(("full_pipeline", report["full_pipeline"]))
+    for name, result in rows:
+        print(
+            f"{name:<14}{result['wall_seconds']:>10.2f}{result.get('critical_path_seconds', 0):>10.2f}"
+            f"{result['llm_calls']:>8}{result['bytes_written']:>10}{result['peak_rss_mb']:>9.1f}"
+        )
+    print(f"Report saved to {output_path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} (commit {baseline.get('commit')}):")
+        for section, fields in compare_reports(baseline, report).items():
+            old, new, ratio = fields.get("wall_seconds", (None, None, None))
+            if old is None:
+                continue
+            change = f"{ratio:+.1%}" if ratio is not None else "n/a"
+            print(f"{section:<14}{old:>10.2f} -> {new:>8.2f}  ({change})")
+
+
+if __name__ == "__main__":
+    main()
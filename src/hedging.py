@@ -0,0 +1,158 @@
+"""
+Hedging Module
+Duplicate slow requests to cut tail latency
+"""
+
+import math
+import re
+import threading
+from collections import defaultdict, deque
+from typing import Deque, Dict, Any, Optional
+from loguru import logger
+
+
+# Trailing chapter/item number of a step name ("phase4.extract_keywords.03")
+_STEP_INDEX_PATTERN = re.compile(r"[._]\d+$")
+
+
+class HedgePolicy:
+    """
+    Decides when to send a duplicate (hedge) request
+
+    Latencies of completed calls are kept per request kind. Once a kind has
+    min_samples observations, a call that has not answered after the
+    configured latency percentile gets a duplicate on another host or
+    server slot; whichever answers first wins and the other is cancelled.
+    Hedges are capped at max_hedge_ratio of eligible calls so a slow server
+    is not flooded with duplicates.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_samples: int = 5,
+        min_delay: float = 0.5,
+        max_delay: Optional[float] = None,
+        max_hedge_ratio: float = 0.1,
+        window: int = 200,
+    ):
+        """
+        Initialize hedge policy
+
+        Args:
+            percentile: Latency percentile after which a hedge is sent
+            min_samples: Observations needed before a kind is hedged
+            min_delay: Lower bound for the hedge delay in seconds
+            max_delay: Optional upper bound for the hedge delay in seconds
+            max_hedge_ratio: Largest fraction of eligible calls that may be hedged
+            window: Latest latencies kept per request kind
+        """
+        self.percentile = percentile
+        self.min_samples = max(1, int(min_samples))
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_hedge_ratio = max_hedge_ratio
+
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+        # Counters
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+        logger.info(
+            f"HedgePolicy initialized: p{percentile:g} delay, "
+            f"at most {max_hedge_ratio:.0%} of calls hedged"
+        )
+
+    @staticmethod
+    def key_for(step: Optional[str]) -> str:
+        """
+        Get the request kind of a step, dropping any chapter number
+
+        Args:
+            step: Pipeline step name
+
+        Returns:
+            Key latencies are grouped by
+        """
+        return _STEP_INDEX_PATTERN.sub("", step or "unknown")
+
+    def delay(self, key: str) -> Optional[float]:
+        """
+        Get how long to wait before hedging a call
+
+        Args:
+            key: Request kind
+
+        Returns:
+            Delay in seconds, or None while there is too little history
+        """
+        with self._lock:
+            samples = sorted(self._latencies[key])
+        if len(samples) < self.min_samples:
+            return None
+
+        # Nearest-rank percentile
+        rank = max(1, math.ceil(self.percentile / 100 * len(samples)))
+        delay = max(self.min_delay, samples[rank - 1])
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+        return delay
+
+    def record_latency(self, key: str, seconds: float) -> None:
+        """
+        Add a completed call's latency to the history
+
+        Args:
+            key: Request kind
+            seconds: Time until the response arrived
+        """
+        with self._lock:
+            self._latencies[key].append(seconds)
+
+    def start_call(self) -> None:
+        """Count a call that is eligible for hedging"""
+        with self._lock:
+            self.calls += 1
+
+    def try_hedge(self) -> bool:
+        """
+        Reserve a hedge if the hedge budget allows one
+
+        Returns:
+            True if the duplicate may be sent
+        """
+        with self._lock:
+            if self.hedged + 1 > max(1.0, self.max_hedge_ratio * self.calls):
+                return False
+            self.hedged += 1
+            return True
+
+    def cancel_hedge(self) -> None:
+        """Give back a hedge reserved with try_hedge that was not sent"""
+        with self._lock:
+            self.hedged = max(0, self.hedged - 1)
+
+    def record_win(self) -> None:
+        """Count a hedge that answered before the original request"""
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hedging statistics
+
+        Returns:
+            Dictionary with eligible calls, hedges sent, hedge wins,
+            hedge rate (hedges per call) and win rate (wins per hedge)
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+                "win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0,
+            }
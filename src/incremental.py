@@ -0,0 +1,133 @@
+"""
+Incremental Build Module
+Input fingerprints that let unchanged pipeline steps reuse their artifacts
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterable
+from loguru import logger
+
+
+class StepFingerprints:
+    """
+    Records what each pipeline step was generated from
+
+    A step's fingerprint is a hash of everything that determines its output
+    request: the rendered prompt, model, system prompt, schema and options.
+    After a step succeeds, its fingerprint and artifact paths are stored as
+    "<step>.json" in fingerprint_dir. On the next run a step whose
+    fingerprint is unchanged and whose artifacts still exist is skipped and
+    its artifacts are read back instead.
+
+    Steps downstream of a changed step are rebuilt without tracking the
+    graph: their prompts embed the changed output, so their fingerprints
+    change too.
+    """
+
+    def __init__(self, fingerprint_dir: str = "./output/intermediate/fingerprints", enabled: bool = True):
+        """
+        Initialize step fingerprints
+
+        Args:
+            fingerprint_dir: Directory holding one fingerprint record per step
+            enabled: Whether steps may be skipped (when False every step is
+                rebuilt and nothing is recorded)
+        """
+        self.fingerprint_dir = Path(fingerprint_dir)
+        self.enabled = enabled
+
+        # Counters
+        self.rebuilt = 0
+        self.skipped = 0
+
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(**inputs: Any) -> str:
+        """
+        Hash the inputs of a step
+
+        Args:
+            **inputs: Everything that determines the step's output (JSON-serializable)
+
+        Returns:
+            Hex SHA-256 digest
+        """
+        material = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _record_path(self, step: str) -> Path:
+        """Fingerprint record of a step"""
+        return self.fingerprint_dir / f"{step}.json"
+
+    def is_current(self, step: str, fingerprint: str) -> bool:
+        """
+        Check whether a step can be skipped, and count it as skipped if so
+
+        A step that is not current counts as rebuilt only once record()
+        stores its new fingerprint, so failed steps are not counted.
+
+        Args:
+            step: Step name (as recorded in the call metrics)
+            fingerprint: Fingerprint of the step's inputs in this run
+
+        Returns:
+            True if the step was last built from the same inputs and its
+            artifacts still exist
+        """
+        if not self.enabled:
+            return False
+
+        current = False
+        try:
+            with open(self._record_path(step), "r", encoding="utf-8") as f:
+                record = json.load(f)
+            current = record.get("fingerprint") == fingerprint and all(
+                Path(artifact).exists() for artifact in record.get("artifacts", [])
+            )
+        except (OSError, ValueError):
+            pass
+
+        if current:
+            with self._lock:
+                self.skipped += 1
+            logger.info(f"Up to date, skipping {step}")
+        return current
+
+    def record(self, step: str, fingerprint: str, artifacts: Iterable[str] = ()) -> None:
+        """
+        Store the fingerprint of a successfully built step and count it as rebuilt
+
+        Args:
+            step: Step name
+            fingerprint: Fingerprint of the inputs it was built from
+            artifacts: Files it wrote
+        """
+        if not self.enabled:
+            return
+
+        path = self._record_path(step)
+        temp_path = path.with_suffix(".tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": fingerprint, "artifacts": list(artifacts)}, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to record fingerprint of {step}: {e}")
+
+        with self._lock:
+            self.rebuilt += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get incremental build statistics
+
+        Returns:
+            Dictionary with steps rebuilt and steps skipped as up to date
+        """
+        return {"rebuilt": self.rebuilt, "skipped": self.skipped}
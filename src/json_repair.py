@@ -0,0 +1,390 @@
+"""
+JSON Repair Module
+Tolerant parsing of malformed or truncated JSON produced by LLMs
+"""
+
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+
+# Typographic double quotes that models sometimes use as JSON delimiters
+SMART_QUOTES = "“”„‟＂"
+
+# Characters that end an unquoted token
+_TOKEN_END = set(" \t\r\n,:{}[]\"") | set(SMART_QUOTES)
+
+_NUMBER_PATTERN = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?")
+
+# Python-style literals mapped to their JSON equivalents
+_LITERALS = {
+    "true": "true",
+    "false": "false",
+    "null": "null",
+    "True": "true",
+    "False": "false",
+    "None": "null",
+    "NaN": "null",
+    "Infinity": "null",
+}
+
+_VALID_ESCAPES = set('"\\/bfnrtu')
+
+
+class _Container:
+    """Open object or array and what the parser expects next inside it"""
+
+    def __init__(self, opener: str):
+        self.opener = opener
+        # Objects: key -> colon -> value -> comma; arrays: value -> comma
+        self.expect = "key" if opener == "{" else "value"
+
+    @property
+    def closer(self) -> str:
+        return "}" if self.opener == "{" else "]"
+
+
+class _Repairer:
+    """
+    Single-pass scanner that re-emits JSON while fixing common LLM mistakes
+
+    The output position after every complete value is remembered, so a
+    document that is cut off mid-value can be rolled back to its last
+    complete element and closed.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self.out: List[str] = []
+        self.stack: List[_Container] = []
+        self.fixes: List[str] = []
+        self.safe_length = 0
+        self.finished = False
+
+    def fix(self, description: str) -> None:
+        """Record a repair (once per kind)"""
+        if description not in self.fixes:
+            self.fixes.append(description)
+
+    def mark_safe(self) -> None:
+        """Remember the current output as a valid prefix"""
+        self.safe_length = len(self.out)
+
+    def strip_trailing(self, characters: str) -> bool:
+        """Remove trailing characters from the output, returning True if a comma was removed"""
+        removed_comma = False
+        while self.out and len(self.out[-1]) == 1 and self.out[-1] in characters:
+            removed_comma |= self.out[-1] == ","
+            self.out.pop()
+        return removed_comma
+
+    def begin_value(self) -> Optional[_Container]:
+        """Prepare the output for a new key or value, inserting a missing comma"""
+        container = self.stack[-1] if self.stack else None
+        if container is not None and container.expect == "comma":
+            self.out.append(",")
+            container.expect = "key" if container.opener == "{" else "value"
+            self.fix("missing comma")
+        return container
+
+    def end_value(self, container: Optional[_Container]) -> None:
+        """Update state after a complete value"""
+        if container is None:
+            self.finished = True
+        else:
+            container.expect = "comma"
+        self.mark_safe()
+
+    def run(self) -> str:
+        """Scan the whole text and return the repaired JSON"""
+        text = self.text
+        while self.pos < len(text) and not self.finished:
+            ch = text[self.pos]
+
+            if ch in " \t\r\n":
+                self.out.append(ch)
+                self.pos += 1
+            elif ch in "{[":
+                container = self.begin_value()
+                if container is not None and container.expect == "key":
+                    # A nested value where a key belongs: nothing sensible to keep
+                    break
+                if container is not None and container.expect == "colon":
+                    self.out.append(":")
+                    self.fix("missing colon")
+                self.out.append(ch)
+                self.stack.append(_Container(ch))
+                self.pos += 1
+                self.mark_safe()
+            elif ch in "}]":
+                self.close_container(ch)
+                self.pos += 1
+            elif ch == ",":
+                container = self.stack[-1] if self.stack else None
+                if container is not None and container.expect == "comma":
+                    self.out.append(",")
+                    container.expect = "key" if container.opener == "{" else "value"
+                else:
+                    self.fix("extra comma")
+                self.pos += 1
+            elif ch == ":":
+                container = self.stack[-1] if self.stack else None
+                if container is not None and container.expect == "colon":
+                    self.out.append(":")
+                    container.expect = "value"
+                else:
+                    self.fix("stray colon")
+                self.pos += 1
+            elif ch == '"' or ch in SMART_QUOTES:
+                self.read_string()
+            else:
+                self.read_token()
+
+        if not self.finished:
+            self.close_truncated()
+        return "".join(self.out)
+
+    def close_container(self, closer: str) -> None:
+        """Handle a closing bracket"""
+        if not self.stack:
+            self.fix("unbalanced bracket")
+            return
+
+        if self.strip_trailing(" \t\r\n,"):
+            self.fix("trailing comma")
+
+        container = self.stack[-1]
+        if container.expect in ("colon", "value") and container.opener == "{":
+            # Key without a value: drop it
+            self.drop_dangling_key()
+
+        if closer != container.closer:
+            self.fix("mismatched bracket")
+        self.stack.pop()
+        self.out.append(container.closer)
+        self.end_value(self.stack[-1] if self.stack else None)
+
+    def drop_dangling_key(self) -> None:
+        """Remove a trailing object key that has no value"""
+        self.strip_trailing(" \t\r\n:")
+        if self.out and self.out[-1].startswith('"'):
+            self.out.pop()
+        self.strip_trailing(" \t\r\n,")
+        self.fix("dangling key")
+
+    def closing_quote_ahead(self, index: int, is_key: bool) -> bool:
+        """
+        Decide whether a quote at index ends the current string
+
+        A quote only closes a string when what follows makes structural
+        sense; otherwise it is treated as an unescaped quote inside the text.
+        """
+        rest = index + 1
+        newline = False
+        while rest < len(self.text) and self.text[rest] in " \t\r\n":
+            newline |= self.text[rest] == "\n"
+            rest += 1
+        if rest >= len(self.text):
+            return True
+
+        following = self.text[rest]
+        if is_key:
+            return following == ":"
+        if following in ",}]":
+            return True
+        # Next value on a new line with the comma missing
+        return newline and (following == '"' or following in SMART_QUOTES)
+
+    def read_string(self) -> None:
+        """Read a quoted string, escaping what JSON does not allow raw"""
+        container = self.begin_value()
+        is_key = container is not None and container.expect == "key"
+        if container is not None and container.expect == "colon":
+            self.out.append(":")
+            container.expect = "value"
+            self.fix("missing colon")
+
+        opening = self.text[self.pos]
+        if opening != '"':
+            self.fix("smart quotes")
+        self.pos += 1
+
+        chars: List[str] = ['"']
+        text = self.text
+        while self.pos < len(text):
+            ch = text[self.pos]
+
+            if ch == "\\":
+                if self.pos + 1 >= len(text):
+                    self.pos += 1
+                    break
+                escaped = text[self.pos + 1]
+                if escaped in _VALID_ESCAPES:
+                    chars.append(ch + escaped)
+                    self.pos += 2
+                else:
+                    chars.append("\\\\")
+                    self.fix("invalid escape")
+                    self.pos += 1
+                continue
+
+            is_quote = ch == '"' or (opening != '"' and ch in SMART_QUOTES)
+            if is_quote and self.closing_quote_ahead(self.pos, is_key):
+                chars.append('"')
+                self.pos += 1
+                self.out.append("".join(chars))
+                if is_key:
+                    container.expect = "colon"
+                else:
+                    self.end_value(container)
+                return
+
+            if ch == '"':
+                chars.append('\\"')
+                self.fix("unescaped quote")
+            elif ch == "\n":
+                chars.append("\\n")
+                self.fix("unescaped newline")
+            elif ch == "\r":
+                chars.append("\\r")
+                self.fix("unescaped newline")
+            elif ch == "\t":
+                chars.append("\\t")
+            elif ord(ch) < 0x20:
+                chars.append(f"\\u{ord(ch):04x}")
+            else:
+                chars.append(ch)
+            self.pos += 1
+
+        # Ran out of text inside the string: leave it for close_truncated()
+
+    def read_token(self) -> None:
+        """Read an unquoted token (number, literal or bare word)"""
+        start = self.pos
+        while self.pos < len(self.text) and self.text[self.pos] not in _TOKEN_END:
+            self.pos += 1
+        token = self.text[start:self.pos]
+
+        if self.pos >= len(self.text):
+            # A token running into the end of the text may be incomplete
+            return
+
+        container = self.begin_value()
+        if container is not None and container.expect == "colon":
+            self.out.append(":")
+            container.expect = "value"
+            self.fix("missing colon")
+
+        if container is not None and container.expect == "key":
+            self.out.append(json.dumps(token, ensure_ascii=False))
+            container.expect = "colon"
+            self.fix("unquoted key")
+            return
+
+        if _NUMBER_PATTERN.fullmatch(token) or token in ("true", "false", "null"):
+            self.out.append(token)
+        elif token in _LITERALS:
+            self.out.append(_LITERALS[token])
+            self.fix("non-JSON literal")
+        else:
+            self.out.append(json.dumps(token, ensure_ascii=False))
+            self.fix("unquoted string")
+        self.end_value(container)
+
+    def close_truncated(self) -> None:
+        """Close a document that ended before its root value was complete"""
+        self.fix("truncated")
+        # Brackets are only opened at safe points, so the stack still matches the output
+        del self.out[self.safe_length:]
+        self.strip_trailing(" \t\r\n")
+
+        while self.stack:
+            self.out.append(self.stack.pop().closer)
+
+
+def extract_json_text(text: str) -> Optional[str]:
+    """
+    Cut the JSON document out of a model response
+
+    Drops markdown code fences and any prose before the first bracket.
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        Text starting at the first "{" or "[", or None if there is none
+    """
+    fence = re.search(r"```(?:json)?\s*\n?(.*?)(?:```|$)", text, re.DOTALL)
+    if fence and fence.group(1).strip():
+        text = fence.group(1)
+
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        return None
+    return text[min(starts):]
+
+
+def repair_json(text: str) -> Tuple[Optional[Any], List[str]]:
+    """
+    Parse JSON, repairing common LLM formatting problems
+
+    Handles code fences and surrounding prose, trailing and missing commas,
+    smart quotes, unescaped quotes and newlines inside strings, unquoted
+    words, Python literals, and documents truncated mid-value (the
+    incomplete element is dropped and open brackets are closed).
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        Tuple of the parsed value (None if it could not be repaired) and
+        the list of repairs applied
+    """
+    candidate = extract_json_text(text)
+    if candidate is None:
+        return None, []
+
+    try:
+        return json.loads(candidate), []
+    except json.JSONDecodeError:
+        pass
+
+    repairer = _Repairer(candidate)
+    repaired = repairer.run()
+    try:
+        return json.loads(repaired), repairer.fixes
+    except json.JSONDecodeError:
+        return None, repairer.fixes
+
+
+def merge_continuation(partial: str, continuation: str, min_overlap: int = 8) -> str:
+    """
+    Append a continuation to a truncated response
+
+    Models asked to continue often repeat the last few characters, or
+    start over from the beginning; both cases are detected.
+
+    Args:
+        partial: Truncated response
+        continuation: Text generated to complete it
+        min_overlap: Shortest repeated suffix that is removed
+
+    Returns:
+        Combined response
+    """
+    fence = re.match(r"\s*```(?:json)?\s*\n?(.*?)(?:```\s*)?$", continuation, re.DOTALL)
+    if fence:
+        continuation = fence.group(1)
+
+    head = partial.lstrip()[:40]
+    if len(head) >= min_overlap and continuation.lstrip().startswith(head):
+        # Started over: the continuation is a complete new response
+        return continuation.strip()
+
+    stripped = continuation.lstrip()
+    for size in range(min(len(partial), len(stripped), 500), min_overlap - 1, -1):
+        if partial.endswith(stripped[:size]):
+            return partial + stripped[size:]
+
+    return partial + continuation
@@ -0,0 +1,194 @@
+"""
+Load Balancer Module
+Routes requests across multiple Ollama hosts
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+from loguru import logger
+
+
+class HostNode:
+    """State of a single Ollama host"""
+
+    def __init__(self, base_url: str):
+        """
+        Initialize host node
+
+        Args:
+            base_url: Server base URL (e.g. "http://localhost:11434")
+        """
+        self.base_url = base_url
+        self.outstanding = 0
+        self.healthy = True
+        self.failed_at = 0.0
+
+
+class HostPool:
+    """
+    Pool of Ollama hosts with least-outstanding-requests routing
+
+    Requests that share an affinity key (e.g. one pipeline run) stick to the
+    same host so its prompt/KV cache stays warm. Hosts that fail are taken
+    out of rotation and re-probed after health_check_interval seconds.
+    """
+
+    def __init__(
+        self,
+        base_urls: List[str],
+        probe: Callable[[str], bool],
+        health_check_interval: float = 30.0,
+    ):
+        """
+        Initialize host pool
+
+        Args:
+            base_urls: Server base URLs
+            probe: Health check callable taking a base URL (OllamaClient.check_server)
+            health_check_interval: Seconds before a failed host is probed again
+        """
+        if not base_urls:
+            raise ValueError("HostPool requires at least one host")
+
+        self.nodes: Dict[str, HostNode] = {url: HostNode(url) for url in base_urls}
+        self.probe = probe
+        self.health_check_interval = health_check_interval
+
+        self._affinity: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+        logger.info(f"HostPool initialized with {len(self.nodes)} host(s)")
+
+    def _recover_due_nodes(self) -> None:
+        """Probe failed hosts whose recheck interval has passed"""
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                node for node in self.nodes.values()
+                if not node.healthy and now - node.failed_at >= self.health_check_interval
+            ]
+            # Push the next check out so concurrent callers do not probe the same host
+            for node in due:
+                node.failed_at = now
+
+        for node in due:
+            if self.probe(node.base_url):
+                self.mark_healthy(node.base_url)
+
+    def probe_all(self) -> List[str]:
+        """
+        Probe every host and update its health
+
+        Returns:
+            List of healthy base URLs
+        """
+        healthy = []
+        for base_url in list(self.nodes):
+            if self.probe(base_url):
+                self.mark_healthy(base_url)
+                healthy.append(base_url)
+            else:
+                self.mark_failed(base_url)
+        return healthy
+
+    def select(
+        self,
+        affinity_key: Optional[str] = None,
+        exclude: Optional[List[str]] = None,
+    ) -> Optional[str]:
+        """
+        Pick a host for the next request
+
+        Args:
+            affinity_key: Optional key whose requests should stick to one host
+            exclude: Hosts to avoid (e.g. one that is already serving a duplicate)
+
+        Returns:
+            Base URL of the chosen host, or None if no host is healthy
+        """
+        self._recover_due_nodes()
+        exclude = exclude or []
+
+        with self._lock:
+            candidates = [
+                node for node in self.nodes.values()
+                if node.healthy and node.base_url not in exclude
+            ]
+            if not candidates:
+                return None
+
+            if affinity_key is not None:
+                pinned = self._affinity.get(affinity_key)
+                if pinned is not None and any(node.base_url == pinned for node in candidates):
+                    return pinned
+
+            chosen = min(candidates, key=lambda node: node.outstanding).base_url
+
+            if affinity_key is not None and chosen != self._affinity.get(affinity_key):
+                if affinity_key in self._affinity:
+                    logger.info(f"Moving affinity {affinity_key} to {chosen}")
+                self._affinity[affinity_key] = chosen
+
+            return chosen
+
+    @contextmanager
+    def lease(self, base_url: str) -> Iterator[str]:
+        """
+        Track an in-flight request on a host
+
+        Args:
+            base_url: Host serving the request
+
+        Yields:
+            The same base URL
+        """
+        with self._lock:
+            self.nodes[base_url].outstanding += 1
+        try:
+            yield base_url
+        finally:
+            with self._lock:
+                self.nodes[base_url].outstanding -= 1
+
+    def mark_failed(self, base_url: str) -> None:
+        """
+        Take a host out of rotation
+
+        Args:
+            base_url: Host that failed
+        """
+        with self._lock:
+            node = self.nodes.get(base_url)
+            if node is None:
+                return
+            if node.healthy:
+                logger.warning(f"Host {base_url} marked unhealthy")
+            node.healthy = False
+            node.failed_at = time.monotonic()
+
+    def mark_healthy(self, base_url: str) -> None:
+        """
+        Return a host to rotation
+
+        Args:
+            base_url: Host that responded
+        """
+        with self._lock:
+            node = self.nodes.get(base_url)
+            if node is None:
+                return
+            if not node.healthy:
+                logger.info(f"Host {base_url} is healthy again")
+            node.healthy = True
+
+    def healthy_hosts(self) -> List[str]:
+        """
+        Get hosts currently in rotation
+
+        Returns:
+            List of healthy base URLs
+        """
+        with self._lock:
+            return [node.base_url for node in self.nodes.values() if node.healthy]
@@ -0,0 +1,239 @@
+"""
+Metrics Module
+Per-call inference metrics from Ollama timing fields
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from loguru import logger
+
+
+# Timing and token fields returned by /api/generate (durations in nanoseconds)
+TIMING_FIELDS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+
+_NANOSECONDS = 1e9
+
+# Counters exported to the Prometheus file: (metric name, record field, help text)
+_COUNTERS = [
+    ("ollama_prompt_tokens_total", "prompt_tokens", "Prompt tokens evaluated"),
+    ("ollama_output_tokens_total", "output_tokens", "Output tokens generated"),
+    ("ollama_load_seconds_total", "load_seconds", "Time spent loading the model"),
+    ("ollama_prefill_seconds_total", "prefill_seconds", "Time spent evaluating prompts"),
+    ("ollama_decode_seconds_total", "decode_seconds", "Time spent generating output tokens"),
+    ("ollama_call_seconds_total", "wall_seconds", "Wall-clock time of calls including retries"),
+    ("ollama_limiter_wait_seconds_total", "limiter_wait_seconds", "Time calls waited for the rate limiter"),
+    ("ollama_retries_total", "retries", "Retried attempts"),
+    ("ollama_hedged_calls_total", "hedged", "Calls that sent a hedge request"),
+    ("ollama_hedge_wins_total", "hedge_won", "Hedge requests that answered first"),
+]
+
+
+def _label(value: Any) -> str:
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _seconds(nanoseconds: Optional[float]) -> Optional[float]:
+    """Convert an Ollama duration to seconds"""
+    if nanoseconds is None:
+        return None
+    return nanoseconds / _NANOSECONDS
+
+
+def _rate(tokens: Optional[float], seconds: Optional[float]) -> Optional[float]:
+    """Tokens per second, or None if either value is missing"""
+    if not tokens or not seconds:
+        return None
+    return tokens / seconds
+
+
+def build_call_record(
+    stats: Dict[str, Any],
+    step: Optional[str] = None,
+    model: Optional[str] = None,
+    wall_seconds: Optional[float] = None,
+    streaming: bool = False,
+) -> Dict[str, Any]:
+    """
+    Build a metrics record for one generate call
+
+    Args:
+        stats: Call statistics (Ollama timing fields plus cached, attempts,
+            host, success, done_reason, hedged, hedge_won, follow_up and
+            limiter_wait as filled in by OllamaClient)
+        step: Pipeline step name (e.g. "phase1.desire_list")
+        model: Model name
+        wall_seconds: Wall-clock duration of the call including retries
+        streaming: Whether the response was streamed
+
+    Returns:
+        Record with token counts, phase durations in seconds and tokens/sec
+    """
+    prompt_tokens = stats.get("prompt_eval_count")
+    output_tokens = stats.get("eval_count")
+    prefill_seconds = _seconds(stats.get("prompt_eval_duration"))
+    decode_seconds = _seconds(stats.get("eval_duration"))
+    attempts = stats.get("attempts", 0)
+
+    return {
+        "timestamp": time.time(),
+        "step": step or "unknown",
+        "model": model,
+        "host": stats.get("host"),
+        "streaming": streaming,
+        "cached": bool(stats.get("cached")),
+        "success": bool(stats.get("success")),
+        "attempts": attempts,
+        "retries": max(0, attempts - 1),
+        "done_reason": stats.get("done_reason"),
+        "hedged": bool(stats.get("hedged")),
+        "hedge_won": bool(stats.get("hedge_won")),
+        "follow_up": stats.get("follow_up"),
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "load_seconds": _seconds(stats.get("load_duration")),
+        "prefill_seconds": prefill_seconds,
+        "decode_seconds": decode_seconds,
+        "server_seconds": _seconds(stats.get("total_duration")),
+        "wall_seconds": wall_seconds,
+        "limiter_wait_seconds": stats.get("limiter_wait") or 0.0,
+        "prefill_tokens_per_sec": _rate(prompt_tokens, prefill_seconds),
+        "decode_tokens_per_sec": _rate(output_tokens, decode_seconds),
+    }
+
+
+class MetricsRecorder:
+    """
+    Records per-call inference metrics for a run
+
+    Each call is appended as one line to a JSONL file, and running totals
+    per step and model are rewritten to a Prometheus text-format file
+    (suitable for node_exporter's textfile collector) after every call.
+    """
+
+    def __init__(
+        self,
+        jsonl_path: str,
+        prometheus_path: Optional[str] = None,
+        run_id: Optional[str] = None,
+    ):
+        """
+        Initialize metrics recorder
+
+        Args:
+            jsonl_path: File receiving one JSON record per call
+            prometheus_path: Optional Prometheus text-format file
+            run_id: Optional run identifier added to every record and label set
+        """
+        self.jsonl_path = Path(jsonl_path)
+        self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+        self.prometheus_path = Path(prometheus_path) if prometheus_path else None
+        if self.prometheus_path is not None:
+            self.prometheus_path.parent.mkdir(parents=True, exist_ok=True)
+        self.run_id = run_id
+
+        # (step, model) -> field -> total
+        self._totals: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._lock = threading.Lock()
+
+        logger.info(f"MetricsRecorder initialized: {self.jsonl_path}")
+
+    def record(self, record: Dict[str, Any]) -> None:
+        """
+        Store a call record
+
+        Args:
+            record: Record built by build_call_record
+        """
+        if self.run_id is not None:
+            record = {"run_id": self.run_id, **record}
+
+        with self._lock:
+            try:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.error(f"Failed to write metrics record: {e}")
+
+            totals = self._totals[(record["step"], record.get("model") or "")]
+            status = "cached" if record["cached"] else ("success" if record["success"] else "failure")
+            totals[f"calls_{status}"] += 1
+            for _, field, _ in _COUNTERS:
+                totals[field] += record.get(field) or 0
+
+            if self.prometheus_path is not None:
+                self._write_prometheus()
+
+    def _write_prometheus(self) -> None:
+        """Rewrite the Prometheus text file (caller holds the lock)"""
+        run_label = f',run_id="{_label(self.run_id)}"' if self.run_id is not None else ""
+        lines: List[str] = [
+            "# HELP ollama_calls_total Generate calls by outcome",
+            "# TYPE ollama_calls_total counter",
+        ]
+        for (step, model), totals in sorted(self._totals.items()):
+            for status in ("success", "failure", "cached"):
+                lines.append(
+                    f'ollama_calls_total{{step="{_label(step)}",model="{_label(model)}",status="{status}"{run_label}}} '
+                    f"{totals.get(f'calls_{status}', 0):g}"
+                )
+
+        for name, field, help_text in _COUNTERS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (step, model), totals in sorted(self._totals.items()):
+                lines.append(
+                    f'{name}{{step="{_label(step)}",model="{_label(model)}"{run_label}}} {totals.get(field, 0):g}'
+                )
+
+        temp_path = self.prometheus_path.with_suffix(".tmp")
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(temp_path, self.prometheus_path)
+        except OSError as e:
+            logger.error(f"Failed to write Prometheus metrics: {e}")
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get run totals across all steps
+
+        Returns:
+            Dictionary with call counts, hedge counts, token totals and
+            seconds spent loading, in prefill, in decode and waiting for
+            the rate limiter
+        """
+        with self._lock:
+            summary: Dict[str, float] = defaultdict(float)
+            for totals in self._totals.values():
+                for field, value in totals.items():
+                    summary[field] += value
+
+        calls = sum(summary.get(f"calls_{status}", 0) for status in ("success", "failure", "cached"))
+        return {
+            "calls": int(calls),
+            "cached_calls": int(summary.get("calls_cached", 0)),
+            "failed_calls": int(summary.get("calls_failure", 0)),
+            "retries": int(summary.get("retries", 0)),
+            "hedged_calls": int(summary.get("hedged", 0)),
+            "hedge_wins": int(summary.get("hedge_won", 0)),
+            "prompt_tokens": int(summary.get("prompt_tokens", 0)),
+            "output_tokens": int(summary.get("output_tokens", 0)),
+            "load_seconds": summary.get("load_seconds", 0.0),
+            "prefill_seconds": summary.get("prefill_seconds", 0.0),
+            "decode_seconds": summary.get("decode_seconds", 0.0),
+            "wall_seconds": summary.get("wall_seconds", 0.0),
+            "limiter_wait_seconds": summary.get("limiter_wait_seconds", 0.0),
+        }
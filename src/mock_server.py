@@ -0,0 +1,618 @@
+"""
+Mock Server Module
+Local stand-in for the Ollama API for offline development and benchmarking
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from loguru import logger
+
+from .json_repair import repair_json
+from .utils import load_prompts
+
+
+# Template placeholders such as {user_context} (but not escaped {{ }})
+_PLACEHOLDER_PATTERN = re.compile(r"(?<!\{)\{[a-z_]+\}(?!\})")
+
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+# The mock's tokenizer: a fixed number of characters per token, so timings
+# and /api/tokenize stay stable whatever the pipeline's own estimate is
+_CHARS_PER_TOKEN = 4
+
+_SAMPLE_SENTENCES = [
+    "霧の向こうで、街の灯りがゆっくりと瞬いていた。",
+    "彼女は手のひらの端末に、誰にも届かない言葉を打ち込んだ。",
+    "古い記録媒体は、失われた季節の匂いをまだ覚えている。",
+    "機械たちの囁きが、夜明け前の広場に満ちていった。",
+    "その選択が世界を変えることを、まだ誰も知らなかった。",
+]
+
+
+def parse_keep_alive(value: Any, default: float) -> Optional[float]:
+    """
+    Convert an Ollama keep_alive value to seconds
+
+    Args:
+        value: Seconds, a duration string ("30m", "1h", "300s") or a negative
+            number for "keep loaded indefinitely"
+        default: Seconds to use when value is None or unparseable
+
+    Returns:
+        Seconds to keep the model loaded, or None for indefinitely
+    """
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return None if value < 0 else float(value)
+
+    match = re.fullmatch(r"\s*(-?\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*", str(value))
+    if not match:
+        return default
+    amount = float(match.group(1))
+    if amount < 0:
+        return None
+    return amount * _DURATION_UNITS[match.group(2) or "s"]
+
+
+def mock_tokens(text: str) -> int:
+    """Token count of text under the mock's fixed characters-per-token model"""
+    return len(text) // _CHARS_PER_TOKEN
+
+
+def sample_from_schema(schema: Dict[str, Any], name: str = "value", index: int = 0, array_items: int = 10) -> Any:
+    """
+    Build a value that satisfies a JSON Schema
+
+    Args:
+        schema: JSON Schema (the subset used in config/prompts/*.yaml)
+        name: Property name the value belongs to (used in sample strings)
+        index: Position of the value within its array
+        array_items: Number of items to generate for arrays without bounds
+
+    Returns:
+        Sample value
+    """
+    if "enum" in schema:
+        return schema["enum"][index % len(schema["enum"])]
+
+    expected = schema.get("type", "string")
+    if isinstance(expected, list):
+        expected = expected[0]
+
+    if expected == "object":
+        return {
+            key: sample_from_schema(subschema, key, index, array_items)
+            for key, subschema in schema.get("properties", {}).items()
+        }
+    if expected == "array":
+        count = max(schema.get("minItems", 0), array_items)
+        if "maxItems" in schema:
+            count = min(count, schema["maxItems"])
+        item_schema = schema.get("items", {"type": "string"})
+        return [sample_from_schema(item_schema, name, i, array_items) for i in range(count)]
+    if expected in ("integer", "number"):
+        return index + 1
+    if expected == "boolean":
+        return True
+    if expected == "null":
+        return None
+    return f"{name}のサンプル{index + 1}"
+
+
+class PromptMatcher:
+    """
+    Identifies which prompt template a rendered prompt came from
+
+    Each template is split at its placeholders into literal lines; the
+    template with the largest share of its lines present in the prompt
+    wins (ties go to the template matching more text).
+    """
+
+    def __init__(self, prompts: Dict[str, Dict[str, Any]]):
+        """
+        Initialize prompt matcher
+
+        Args:
+            prompts: Prompt templates as loaded by load_prompts
+        """
+        self.prompts = prompts
+        self._segments: Dict[str, List[str]] = {}
+        for key, prompt in prompts.items():
+            template = prompt.get("user", "") if isinstance(prompt, dict) else ""
+            segments = []
+            for part in _PLACEHOLDER_PATTERN.split(template):
+                part = part.replace("{{", "{").replace("}}", "}")
+                segments.extend(line.strip() for line in part.splitlines() if line.strip())
+            self._segments[key] = segments
+
+    def match(self, prompt: str) -> Optional[str]:
+        """
+        Find the prompt key for a rendered prompt
+
+        Args:
+            prompt: Prompt text sent to the model
+
+        Returns:
+            Prompt key, or None if no template matches
+        """
+        best_key, best_score = None, (0.0, 0)
+        for key, segments in self._segments.items():
+            total = sum(len(segment) for segment in segments)
+            found = sum(len(segment) for segment in segments if segment in prompt)
+            if total == 0 or found == 0:
+                continue
+            score = (found / total, found)
+            if score > best_score:
+                best_key, best_score = key, score
+        return best_key
+
+
+class MockOllamaServer:
+    """
+    In-process HTTP server speaking the subset of the Ollama API the client uses
+
+    Serves /api/tags, /api/ps, /api/pull, /api/generate and /api/chat
+    (streaming and non-streaming). JSON requests get canned output that
+    satisfies the prompt's schema; free-text requests get filler prose.
+    Latency is simulated as model load time (when the model is not
+    resident) plus prompt and output tokens at fixed tokens/sec rates,
+    with at most `concurrency` requests processed at once.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        prompts_dir: str = "config/prompts",
+        models: Optional[List[str]] = None,
+        load_time: float = 0.0,
+        tokens_per_second: float = 0.0,
+        prompt_tokens_per_second: float = 0.0,
+        concurrency: int = 1,
+        keep_alive: float = 300.0,
+        text_tokens: int = 600,
+        array_items: int = 10,
+        error_rate: float = 0.0,
+        straggler_rate: float = 0.0,
+        straggler_factor: float = 5.0,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize mock server
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            prompts_dir: Directory with the prompt templates to serve canned output for
+            models: Model names reported as installed (any model if None)
+            load_time: Seconds to load a model that is not resident
+            tokens_per_second: Simulated decode rate (0 for no delay)
+            prompt_tokens_per_second: Simulated prefill rate (0 for no delay)
+            concurrency: Requests processed in parallel (OLLAMA_NUM_PARALLEL)
+            keep_alive: Default seconds a model stays resident after a request
+            text_tokens: Length of free-text responses in tokens (capped by num_predict)
+            array_items: Number of items in generated JSON arrays
+            error_rate: Fraction of generate/chat requests answered with HTTP 503
+            straggler_rate: Fraction of generate/chat requests served slower
+            straggler_factor: How many times slower a straggler's prefill and decode are
+            seed: Optional random seed for error and straggler injection
+        """
+        self.host = host
+        self.port = port
+        self.models = models
+        self.load_time = load_time
+        self.tokens_per_second = tokens_per_second
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.concurrency = max(1, int(concurrency))
+        self.keep_alive = keep_alive
+        self.text_tokens = text_tokens
+        self.array_items = array_items
+        self.error_rate = error_rate
+        self.straggler_rate = straggler_rate
+        self.straggler_factor = straggler_factor
+
+        self.prompts = load_prompts(prompts_dir)
+        self.matcher = PromptMatcher(self.prompts)
+
+        self._random = random.Random(seed)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # model -> expiry (time.time(), None for indefinitely)
+        self._resident: Dict[str, Optional[float]] = {}
+
+        # Request counters
+        self.requests = 0
+        self.loads = 0
+        self.errors = 0
+        self.stragglers = 0
+
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """Server base URL (e.g. "http://127.0.0.1:54321")"""
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> str:
+        """
+        Start serving in a background thread
+
+        Returns:
+            Server base URL
+        """
+        self._server = ThreadingHTTPServer((self.host, self.port), _MockHandler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Mock Ollama server listening on {self.base_url}")
+        return self.base_url
+
+    def stop(self) -> None:
+        """Stop the server"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            logger.info("Mock Ollama server stopped")
+
+    def __enter__(self) -> "MockOllamaServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def has_model(self, model: str) -> bool:
+        """Check whether a model is reported as installed"""
+        return self.models is None or model in self.models
+
+    def installed_models(self) -> List[Dict[str, Any]]:
+        """Build the /api/tags model list"""
+        with self._lock:
+            names = self.models if self.models is not None else sorted(self._resident) or ["gpt-oss:20b"]
+        return [{"name": name, "model": name, "size": 0} for name in names]
+
+    def running_models(self) -> List[Dict[str, Any]]:
+        """Build the /api/ps model list (expired models are unloaded first)"""
+        now = time.time()
+        with self._lock:
+            for model, expires_at in list(self._resident.items()):
+                if expires_at is not None and expires_at <= now:
+                    del self._resident[model]
+            return [
+                {
+                    "name": model,
+                    "model": model,
+                    "expires_at": (
+                        datetime.fromtimestamp(expires_at, timezone.utc).isoformat()
+                        if expires_at is not None else "2318-01-01T00:00:00Z"
+                    ),
+                }
+                for model, expires_at in self._resident.items()
+            ]
+
+    def _load_model(self, model: str, keep_alive: Any) -> float:
+        """
+        Make a model resident, simulating load time if it was not
+
+        Args:
+            model: Model name
+            keep_alive: keep_alive value from the request
+
+        Returns:
+            Seconds spent loading
+        """
+        seconds = parse_keep_alive(keep_alive, self.keep_alive)
+        load_seconds = 0.0
+
+        # Concurrent requests for a model that is not resident wait for one load
+        with self._load_lock:
+            with self._lock:
+                expires_at = self._resident.get(model, 0)
+                resident = model in self._resident and (expires_at is None or expires_at > time.time())
+                if not resident:
+                    self.loads += 1
+
+            if not resident and self.load_time > 0:
+                load_seconds = self.load_time
+                time.sleep(load_seconds)
+
+            with self._lock:
+                if seconds == 0:
+                    self._resident.pop(model, None)
+                else:
+                    self._resident[model] = None if seconds is None else time.time() + seconds
+        return load_seconds
+
+    def canned_output(self, prompt: str, format: Any, num_predict: int) -> Tuple[str, str]:
+        """
+        Build the response for a prompt
+
+        Args:
+            prompt: Prompt text
+            format: Requested format (JSON schema, "json" or "")
+            num_predict: Output token limit
+
+        Returns:
+            Tuple of response text and done_reason ("stop" or "length")
+        """
+        key = self.matcher.match(prompt)
+
+        if format:
+            schema = format if isinstance(format, dict) else self.prompts.get(key, {}).get("schema")
+            if schema:
+                data = sample_from_schema(schema, array_items=self.array_items)
+            else:
+                data = self._example_output(prompt)
+            text = json.dumps(data, ensure_ascii=False)
+        else:
+            title = f"# {key}\n\n" if key and key.startswith("reference_") else ""
+            sentences = []
+            while mock_tokens("".join(sentences)) < self.text_tokens:
+                sentences.append(_SAMPLE_SENTENCES[len(sentences) % len(_SAMPLE_SENTENCES)])
+            text = title + "".join(sentences)
+
+        if num_predict and num_predict > 0 and mock_tokens(text) > num_predict:
+            return text[: num_predict * _CHARS_PER_TOKEN], "length"
+        return text, "stop"
+
+    @staticmethod
+    def _example_output(prompt: str) -> Any:
+        """
+        Build JSON output from the example in the prompt's output-format section
+
+        Used for prompts without a schema (e.g. extract_chapter, whose key
+        depends on the chapter number).
+
+        Args:
+            prompt: Prompt text
+
+        Returns:
+            Parsed example, or an empty object
+        """
+        marker = prompt.rfind("出力形式")
+        data, _ = repair_json(prompt[marker:] if marker >= 0 else prompt)
+        return data if data is not None else {}
+
+    def generate(self, payload: Dict[str, Any], chat: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Produce response messages for a generate or chat request
+
+        Args:
+            payload: Request body
+            chat: Whether this is an /api/chat request
+
+        Yields:
+            Response messages as Ollama sends them (the last one has done=True)
+        """
+        model = payload.get("model", "")
+        options = payload.get("options") or {}
+
+        if chat:
+            messages = payload.get("messages") or []
+            prompt = "\n\n".join(message.get("content", "") for message in messages)
+        else:
+            prompt = payload.get("prompt", "")
+
+        start_time = time.perf_counter()
+        with self._slots:
+            load_seconds = self._load_model(model, payload.get("keep_alive"))
+
+            if not prompt:
+                # Load/unload request (e.g. OllamaClient.warm_up)
+                done_reason = "unload" if parse_keep_alive(payload.get("keep_alive"), 1) == 0 else "load"
+                yield self._message(model, "", chat, done=True, done_reason=done_reason,
+                                    load_duration=int(load_seconds * 1e9),
+                                    total_duration=int((time.perf_counter() - start_time) * 1e9))
+                return
+
+            text, done_reason = self.canned_output(prompt, payload.get("format"), options.get("num_predict", -1))
+            slowdown = self.straggler_factor if self.should_straggle() else 1.0
+
+            prompt_tokens = max(1, mock_tokens(prompt))
+            prefill_seconds = prompt_tokens / self.prompt_tokens_per_second if self.prompt_tokens_per_second else 0.0
+            prefill_seconds *= slowdown
+            if prefill_seconds:
+                time.sleep(prefill_seconds)
+
+            # Stream roughly one chunk per 8 tokens
+            chunk_size = 32
+            chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)] or [""]
+            decode_start = time.perf_counter()
+            for chunk in chunks:
+                if self.tokens_per_second:
+                    time.sleep(max(1, mock_tokens(chunk)) * slowdown / self.tokens_per_second)
+                yield self._message(model, chunk, chat, done=False)
+            decode_seconds = time.perf_counter() - decode_start
+
+            yield self._message(
+                model, "", chat,
+                done=True,
+                done_reason=done_reason,
+                total_duration=int((time.perf_counter() - start_time) * 1e9),
+                load_duration=int(load_seconds * 1e9),
+                prompt_eval_count=prompt_tokens,
+                prompt_eval_duration=int(prefill_seconds * 1e9),
+                eval_count=max(1, mock_tokens(text)),
+                eval_duration=int(decode_seconds * 1e9),
+            )
+
+    @staticmethod
+    def _message(model: str, text: str, chat: bool, done: bool, **fields) -> Dict[str, Any]:
+        """Build a single /api/generate or /api/chat response message"""
+        message = {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": done,
+        }
+        if chat:
+            message["message"] = {"role": "assistant", "content": text}
+        else:
+            message["response"] = text
+        message.update(fields)
+        return message
+
+    def should_straggle(self) -> bool:
+        """Decide whether the current request is served slowly"""
+        with self._lock:
+            if self.straggler_rate and self._random.random() < self.straggler_rate:
+                self.stragglers += 1
+                return True
+            return False
+
+    def should_fail(self) -> bool:
+        """Decide whether to inject an error into the next request"""
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return True
+            return False
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """HTTP handler delegating to the MockOllamaServer on self.server.mock"""
+
+    protocol_version = "HTTP/1.1"
+    # Small NDJSON writes must not wait for delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(f"Mock Ollama: {format % args}")
+
+    def _send_json(self, data: Dict[str, Any], status: int = 200) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"{}")
+        except json.JSONDecodeError:
+            return {}
+
+    def do_GET(self):
+        mock: MockOllamaServer = self.server.mock
+        if self.path == "/api/tags":
+            self._send_json({"models": mock.installed_models()})
+        elif self.path == "/api/ps":
+            self._send_json({"models": mock.running_models()})
+        elif self.path in ("/", "/api/version"):
+            self._send_json({"version": "mock"})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        mock: MockOllamaServer = self.server.mock
+        payload = self._read_json()
+
+        if self.path == "/api/pull":
+            self._send_json({"status": "success"})
+            return
+        if self.path == "/api/tokenize":
+            # Token ids are meaningless here; only their number matters
+            self._send_json({"tokens": list(range(mock_tokens(payload.get("content", ""))))})
+            return
+        if self.path not in ("/api/generate", "/api/chat"):
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        model = payload.get("model", "")
+        if not mock.has_model(model):
+            self._send_json({"error": f"model '{model}' not found"}, status=404)
+            return
+        if mock.should_fail():
+            self._send_json({"error": "server busy (injected by mock)"}, status=503)
+            return
+
+        chat = self.path == "/api/chat"
+        messages = mock.generate(payload, chat=chat)
+
+        if payload.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for message in messages:
+                    line = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+                    self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client went away (e.g. a cancelled hedge request): stop generating like Ollama
+                logger.debug("Mock Ollama: client disconnected, generation cancelled")
+                self.close_connection = True
+            finally:
+                # Release the request slot even if the client disconnected
+                messages.close()
+            return
+
+        text_parts = []
+        final: Dict[str, Any] = {}
+        for message in messages:
+            text_parts.append(message["message"]["content"] if chat else message["response"])
+            final = message
+        if chat:
+            final["message"] = {"role": "assistant", "content": "".join(text_parts)}
+        else:
+            final["response"] = "".join(text_parts)
+        self._send_json(final)
+
+
+def main() -> None:
+    """Run the mock server from the command line"""
+    parser = argparse.ArgumentParser(description="Mock Ollama server for offline development")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--prompts-dir", default="config/prompts")
+    parser.add_argument("--model", action="append", dest="models", help="Installed model (repeatable)")
+    parser.add_argument("--load-time", type=float, default=0.0, help="Model load time in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Decode rate (0 = instant)")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=0.0, help="Prefill rate (0 = instant)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Parallel request slots")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 503")
+    parser.add_argument("--straggler-rate", type=float, default=0.0, help="Fraction of requests served slowly")
+    parser.add_argument("--straggler-factor", type=float, default=5.0, help="Slowdown of straggling requests")
+    args = parser.parse_args()
+
+    server = MockOllamaServer(
+        host=args.host,
+        port=args.port,
+        prompts_dir=args.prompts_dir,
+        models=args.models,
+        load_time=args.load_time,
+        tokens_per_second=args.tokens_per_second,
+        prompt_tokens_per_second=args.prompt_tokens_per_second,
+        concurrency=args.concurrency,
+        error_rate=args.error_rate,
+        straggler_rate=args.straggler_rate,
+        straggler_factor=args.straggler_factor,
+    )
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
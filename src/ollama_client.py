@@ -4,11 +4,70 @@ Handles all interactions with Ollama API
 """
 
 import json
+import queue
+import threading
 import time
-from typing import Optional, Dict, Any, List
+from contextlib import nullcontext
+from typing import Optional, Dict, Any, List, Tuple, Iterator, Callable
 import requests
+from requests.adapters import HTTPAdapter
 from loguru import logger
 
+from .response_cache import ResponseCache
+from .load_balancer import HostPool
+from .rate_limiter import RateLimiter
+from .schema import validate_json_schema
+from .json_repair import merge_continuation, repair_json
+from .metrics import TIMING_FIELDS, MetricsRecorder, build_call_record
+from .hedging import HedgePolicy
+from .output_budget import OutputBudget
+from .resilience import (
+    FatalRequestError,
+    RetryBudget,
+    backoff_delay,
+    describe_error,
+    get_circuit_breaker,
+    is_retryable_error,
+    is_server_failure,
+)
+
+
+# Process-wide pooled sessions, keyed by pool size
+_shared_sessions: Dict[int, requests.Session] = {}
+_shared_sessions_lock = threading.Lock()
+
+
+def get_shared_session(pool_size: int = 10) -> requests.Session:
+    """
+    Get the process-wide keep-alive session for a given pool size
+
+    Every OllamaClient created with the same pool size reuses the same
+    connection pool, so multiple Pipeline instances in one process do not
+    open a new TCP connection per request.
+
+    Args:
+        pool_size: Maximum number of pooled connections per host
+
+    Returns:
+        Shared requests.Session with a pooled HTTPAdapter mounted
+    """
+    pool_size = max(1, int(pool_size))
+
+    with _shared_sessions_lock:
+        session = _shared_sessions.get(pool_size)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=10,  # Number of distinct hosts to keep pools for
+                pool_maxsize=pool_size,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _shared_sessions[pool_size] = session
+            logger.debug(f"Created shared HTTP session (pool size: {pool_size})")
+
+        return session
+
 
 class OllamaClient:
     """Client for interacting with Ollama API"""
@@ -21,6 +80,27 @@ class OllamaClient:
         timeout: int = 300,
         max_retries: int = 3,
         retry_delay: int = 5,
+        connect_timeout: float = 10,
+        pool_size: int = 10,
+        session: Optional[requests.Session] = None,
+        cache: Optional[ResponseCache] = None,
+        max_retry_delay: float = 60,
+        retry_budget: Optional[RetryBudget] = None,
+        circuit_failure_threshold: int = 5,
+        circuit_reset_timeout: float = 30,
+        hosts: Optional[List[str]] = None,
+        host_pool: Optional[HostPool] = None,
+        health_check_interval: float = 30,
+        affinity_key: Optional[str] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        request_class: str = "default",
+        keep_alive: Optional[Any] = None,
+        max_validation_retries: int = 2,
+        max_continuations: int = 2,
+        metrics: Optional[MetricsRecorder] = None,
+        hedging: Optional[HedgePolicy] = None,
+        output_budget: Optional[OutputBudget] = None,
+        context_length: Optional[int] = None,
     ):
         """
         Initialize Ollama client
@@ -29,48 +109,151 @@ class OllamaClient:
             host: Ollama server host
             port: Ollama server port
             model: Model name to use
-            timeout: Request timeout in seconds
+            timeout: Read timeout in seconds
             max_retries: Maximum number of retries on failure
-            retry_delay: Delay between retries in seconds
+            retry_delay: Base delay for jittered exponential backoff in seconds
+            connect_timeout: Connection timeout in seconds
+            pool_size: Keep-alive connection pool size
+                (usually performance.max_parallel_requests)
+            session: Optional requests session (shared pooled session if None)
+            cache: Optional response cache for non-streaming generation
+            max_retry_delay: Upper bound for a single backoff delay in seconds
+            retry_budget: Optional retry budget shared across calls in a run
+            circuit_failure_threshold: Consecutive server failures before
+                the host's circuit breaker opens
+            circuit_reset_timeout: Seconds before an open circuit is probed again
+            hosts: Optional list of server base URLs to balance requests across
+                (overrides host/port; e.g. ["http://gpu1:11434", "http://gpu2:11434"])
+            host_pool: Optional existing HostPool to share with another client
+            health_check_interval: Seconds before a failed host is probed again
+            affinity_key: Optional key pinning this client's requests to one host
+            rate_limiter: Optional token-bucket rate limiter (safety.rate_limit)
+            request_class: Default rate limit request class for this client
+            keep_alive: How long Ollama keeps the model loaded after a request
+                (e.g. "30m", seconds, or -1 for indefinitely; server default if None)
+            max_validation_retries: How many times generate_json re-asks the model
+                after an unparseable or schema-violating response
+            max_continuations: How many times generate_json asks for the missing
+                tail of a JSON response cut off at max_tokens
+            metrics: Optional recorder receiving per-call inference metrics
+            hedging: Optional hedge policy for calls made with hedge=True
+            output_budget: Optional learned num_predict limits for generate_json
+                calls that name a step
+            context_length: Optional context window sent as num_ctx
+                (performance.max_context_length; server default if None)
         """
-        self.base_url = f"{host}:{port}"
+        self.hosts = list(host_pool.nodes) if host_pool is not None else list(hosts or [])
+        if not self.hosts:
+            self.hosts = [f"{host}:{port}"]
+        self.base_url = self.hosts[0]
         self.model = model
         self.timeout = timeout
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.connect_timeout = connect_timeout
+        self.pool_size = pool_size
+        self.session = session if session is not None else get_shared_session(pool_size)
+        self.cache = cache
+        self.max_retry_delay = max_retry_delay
+        self.retry_budget = retry_budget if retry_budget is not None else RetryBudget()
+        self.circuit_failure_threshold = circuit_failure_threshold
+        self.circuit_reset_timeout = circuit_reset_timeout
+        self.circuit_breaker = self._circuit_breaker(self.base_url)
 
-        logger.info(f"Initialized OllamaClient: {self.base_url}, model: {self.model}")
+        self.rate_limiter = rate_limiter
+        self.request_class = request_class
+        self.keep_alive = keep_alive
+        self.max_validation_retries = max_validation_retries
+        self.max_continuations = max_continuations
+        self.metrics = metrics
+        self.hedging = hedging
+        self.output_budget = output_budget
+        self.context_length = context_length
 
-    def check_server(self) -> bool:
+        # Load balancing is only needed with more than one host
+        self.affinity_key = affinity_key
+        self.host_pool = host_pool
+        if self.host_pool is None and len(self.hosts) > 1:
+            self.host_pool = HostPool(
+                self.hosts,
+                probe=self.check_server,
+                health_check_interval=health_check_interval,
+            )
+
+        logger.info(f"Initialized OllamaClient: {', '.join(self.hosts)}, model: {self.model}")
+
+    def _timeouts(self, read_timeout: Optional[float] = None) -> Tuple[float, float]:
+        """
+        Build a (connect, read) timeout tuple for requests
+
+        Args:
+            read_timeout: Read timeout in seconds (uses self.timeout if None)
+
+        Returns:
+            Tuple of connect and read timeouts
+        """
+        if read_timeout is None:
+            read_timeout = self.timeout
+        return (self.connect_timeout, read_timeout)
+
+    def _circuit_breaker(self, base_url: str):
+        """Get the shared circuit breaker for a host"""
+        return get_circuit_breaker(
+            base_url,
+            failure_threshold=self.circuit_failure_threshold,
+            reset_timeout=self.circuit_reset_timeout,
+        )
+
+    def check_server(self, base_url: Optional[str] = None) -> bool:
         """
         Check if Ollama server is running
 
+        Args:
+            base_url: Host to check (if None, checks every configured host)
+
         Returns:
-            True if server is accessible, False otherwise
+            True if server is accessible (any host, when checking all), False otherwise
         """
+        if base_url is None:
+            if self.host_pool is not None:
+                healthy = self.host_pool.probe_all()
+                logger.info(f"{len(healthy)}/{len(self.hosts)} Ollama hosts are running")
+                return bool(healthy)
+            base_url = self.base_url
+
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.session.get(
+                f"{base_url}/api/tags",
+                timeout=self._timeouts(5),
+            )
             if response.status_code == 200:
-                logger.info("Ollama server is running")
+                logger.info(f"Ollama server is running ({base_url})")
                 return True
             logger.warning(f"Ollama server returned status {response.status_code}")
             return False
         except requests.exceptions.ConnectionError:
-            logger.error("Cannot connect to Ollama server")
+            logger.error(f"Cannot connect to Ollama server ({base_url})")
             return False
         except Exception as e:
             logger.error(f"Error checking Ollama server: {e}")
             return False
 
-    def list_models(self) -> List[Dict[str, Any]]:
+    def list_models(self, base_url: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         List available models
 
+        Args:
+            base_url: Host to query (uses the primary host if None)
+
         Returns:
             List of model information dictionaries
         """
+        base_url = base_url or self.base_url
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=10)
+            response = self.session.get(
+                f"{base_url}/api/tags",
+                timeout=self._timeouts(10),
+            )
             response.raise_for_status()
             data = response.json()
             models = data.get("models", [])
@@ -80,12 +263,17 @@ class OllamaClient:
             logger.error(f"Error listing models: {e}")
             return []
 
-    def check_model_available(self, model_name: Optional[str] = None) -> bool:
+    def check_model_available(
+        self,
+        model_name: Optional[str] = None,
+        base_url: Optional[str] = None,
+    ) -> bool:
         """
         Check if a specific model is available
 
         Args:
             model_name: Model name to check (uses self.model if None)
+            base_url: Host to check (uses the primary host if None)
 
         Returns:
             True if model is available, False otherwise
@@ -93,7 +281,7 @@ class OllamaClient:
         if model_name is None:
             model_name = self.model
 
-        models = self.list_models()
+        models = self.list_models(base_url)
         model_names = [m.get("name", "") for m in models]
 
         if model_name in model_names:
@@ -103,37 +291,44 @@ class OllamaClient:
         logger.warning(f"Model {model_name} is not available")
         return False
 
-    def pull_model(self, model_name: Optional[str] = None) -> bool:
+    def pull_model(
+        self,
+        model_name: Optional[str] = None,
+        base_url: Optional[str] = None,
+    ) -> bool:
         """
         Pull (download) a model from Ollama registry
 
         Args:
             model_name: Model name to pull (uses self.model if None)
+            base_url: Host to pull on (uses the primary host if None)
 
         Returns:
             True if successful, False otherwise
         """
         if model_name is None:
             model_name = self.model
+        base_url = base_url or self.base_url
 
         logger.info(f"Pulling model: {model_name}")
 
         try:
-            response = requests.post(
-                f"{self.base_url}/api/pull",
+            # Closing the streamed response returns its connection to the shared pool
+            with self.session.post(
+                f"{base_url}/api/pull",
                 json={"name": model_name},
                 stream=True,
-                timeout=self.timeout,
-            )
-            response.raise_for_status()
+                timeout=self._timeouts(),
+            ) as response:
+                response.raise_for_status()
 
-            # Stream progress updates
-            for line in response.iter_lines():
-                if line:
-                    data = json.loads(line)
-                    status = data.get("status", "")
-                    if status:
-                        logger.info(f"Pull status: {status}")
+                # Stream progress updates
+                for line in response.iter_lines():
+                    if line:
+                        data = json.loads(line)
+                        status = data.get("status", "")
+                        if status:
+                            logger.info(f"Pull status: {status}")
 
             logger.info(f"Model {model_name} pulled successfully")
             return True
@@ -142,31 +337,179 @@ class OllamaClient:
             logger.error(f"Error pulling model {model_name}: {e}")
             return False
 
-    def ensure_model_ready(self) -> bool:
+    def ensure_model_ready(self, model_name: Optional[str] = None) -> bool:
         """
         Ensure the configured model is ready to use
         Downloads it if not available
 
+        With several hosts, the model is checked (and pulled) on every
+        healthy host.
+
+        Args:
+            model_name: Model name to check (uses self.model if None)
+
         Returns:
             True if model is ready, False otherwise
         """
-        if self.check_model_available():
-            return True
+        model_name = model_name or self.model
 
-        logger.info(f"Model {self.model} not found, attempting to pull...")
-        return self.pull_model()
+        if self.host_pool is not None:
+            hosts = self.host_pool.healthy_hosts()
+        else:
+            hosts = [self.base_url]
 
-    def generate(
+        ready = bool(hosts)
+        for base_url in hosts:
+            if self.check_model_available(model_name, base_url=base_url):
+                continue
+
+            logger.info(f"Model {model_name} not found on {base_url}, attempting to pull...")
+            if not self.pull_model(model_name, base_url=base_url):
+                ready = False
+
+        return ready
+
+    def tokenize(self, text: str, model: Optional[str] = None, base_url: Optional[str] = None) -> Optional[List[int]]:
+        """
+        Tokenize text with the model's tokenizer (/api/tokenize)
+
+        Args:
+            text: Text to tokenize
+            model: Model whose tokenizer to use (uses self.model if None)
+            base_url: Host to query (uses the primary host if None)
+
+        Returns:
+            List of token ids, or None if the server has no tokenize
+            endpoint or the request failed
+        """
+        base_url = base_url or self.base_url
+        try:
+            response = self.session.post(
+                f"{base_url}/api/tokenize",
+                json={"model": model or self.model, "content": text},
+                timeout=self._timeouts(10),
+            )
+            response.raise_for_status()
+            tokens = response.json().get("tokens")
+            return tokens if isinstance(tokens, list) else None
+        except Exception as e:
+            logger.debug(f"Tokenize request failed: {e}")
+            return None
+
+    def list_running_models(self, base_url: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        List models currently loaded in memory (/api/ps)
+
+        Args:
+            base_url: Host to query (uses the primary host if None)
+
+        Returns:
+            List of running model information dictionaries
+            (name, size_vram, expires_at, ...)
+        """
+        base_url = base_url or self.base_url
+        try:
+            response = self.session.get(
+                f"{base_url}/api/ps",
+                timeout=self._timeouts(10),
+            )
+            response.raise_for_status()
+            return response.json().get("models", [])
+        except Exception as e:
+            logger.error(f"Error listing running models: {e}")
+            return []
+
+    def resident_models(self, base_url: Optional[str] = None) -> List[str]:
+        """
+        Get the names of models currently loaded in memory
+
+        Args:
+            base_url: Host to query (uses the primary host if None)
+
+        Returns:
+            List of model names
+        """
+        return [m.get("name", "") for m in self.list_running_models(base_url)]
+
+    def warm_up(self, model_name: Optional[str] = None) -> bool:
+        """
+        Load a model into memory before the first real request
+
+        Sends an empty prompt, which makes Ollama load the model (and apply
+        keep_alive) without generating any tokens.
+
+        Args:
+            model_name: Model to load (uses self.model if None)
+
+        Returns:
+            True if the model was loaded, False otherwise
+        """
+        model_name = model_name or self.model
+        base_url = self._select_host()
+        if base_url is None:
+            return False
+
+        payload: Dict[str, Any] = {"model": model_name, "prompt": "", "stream": False}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
+        logger.info(f"Warming up model {model_name} on {base_url}...")
+        start_time = time.perf_counter()
+        try:
+            response = self.session.post(
+                f"{base_url}/api/generate",
+                json=payload,
+                timeout=self._timeouts(),
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.error(f"Error warming up model {model_name}: {describe_error(e)}")
+            return False
+
+        logger.info(f"Model {model_name} loaded in {time.perf_counter() - start_time:.1f}s")
+        return True
+
+    def order_by_model(
+        self,
+        items: List[Any],
+        model_of: Callable[[Any], str],
+    ) -> List[Any]:
+        """
+        Order independent calls to minimize model swaps
+
+        Calls are grouped by model; groups for models that are already
+        resident come first, and the original order is kept within a group.
+
+        Args:
+            items: Calls to order
+            model_of: Function returning the model a call uses
+
+        Returns:
+            Reordered list of calls
+        """
+        groups: Dict[str, List[Any]] = {}
+        for item in items:
+            groups.setdefault(model_of(item) or self.model, []).append(item)
+
+        if len(groups) <= 1:
+            return list(items)
+
+        resident = set(self.resident_models())
+        ordered_models = sorted(groups, key=lambda name: name not in resident)
+        return [item for name in ordered_models for item in groups[name]]
+
+    def _build_payload(
         self,
         prompt: str,
         format: str = "",
         temperature: float = 0.7,
         max_tokens: int = 4096,
         system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
         **kwargs,
-    ) -> Optional[str]:
+    ) -> Dict[str, Any]:
         """
-        Generate text using Ollama API
+        Build the /api/generate request payload
 
         Args:
             prompt: Input prompt
@@ -174,10 +517,11 @@ class OllamaClient:
             temperature: Generation temperature (0.0-2.0)
             max_tokens: Maximum tokens to generate
             system_prompt: Optional system prompt
+            model: Model to use (uses self.model if None)
             **kwargs: Additional options to pass to Ollama
 
         Returns:
-            Generated text, or None on failure
+            Request payload dictionary
         """
         # Combine system prompt with user prompt if provided
         if system_prompt:
@@ -186,7 +530,7 @@ class OllamaClient:
             full_prompt = prompt
 
         payload = {
-            "model": self.model,
+            "model": model or self.model,
             "prompt": full_prompt,
             "stream": False,
             "options": {
@@ -196,46 +540,820 @@ class OllamaClient:
             },
         }
 
+        # Without num_ctx the server's default window silently cuts long prompts
+        if self.context_length:
+            payload["options"].setdefault("num_ctx", self.context_length)
+
         # Add format if specified
         if format:
             payload["format"] = format
 
+        # Keep the model loaded between (slow) pipeline phases
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
+        return payload
+
+    def _cache_key(
+        self,
+        payload: Dict[str, Any],
+        system_prompt: Optional[str],
+        use_cache: bool,
+    ) -> Optional[str]:
+        """
+        Get the response cache key for a request
+
+        Args:
+            payload: Request payload
+            system_prompt: System prompt used to build the payload
+            use_cache: Whether caching is requested for this call
+
+        Returns:
+            Cache key, or None if caching is disabled
+        """
+        if not use_cache or self.cache is None:
+            return None
+
+        return ResponseCache.make_key(
+            model=payload["model"],
+            prompt=payload["prompt"],
+            system_prompt=system_prompt,
+            format=payload.get("format", ""),
+            options=payload["options"],
+        )
+
+    def _select_host(self, exclude: Optional[List[str]] = None) -> Optional[str]:
+        """
+        Choose the host for the next request
+
+        Args:
+            exclude: Hosts to avoid
+
+        Returns:
+            Base URL, or None if no host is available
+        """
+        if self.host_pool is None:
+            return self.base_url
+
+        base_url = self.host_pool.select(self.affinity_key, exclude=exclude)
+        if base_url is None:
+            logger.error("No healthy Ollama hosts available")
+        return base_url
+
+    def _throttle(self, base_url: str, request_class: Optional[str] = None) -> float:
+        """
+        Wait for the rate limiter before sending a request
+
+        Args:
+            base_url: Host the request goes to
+            request_class: Request class (client default if None)
+
+        Returns:
+            Seconds spent waiting
+        """
+        if self.rate_limiter is None:
+            return 0.0
+        return self.rate_limiter.acquire(base_url, request_class or self.request_class)
+
+    def _lease(self, base_url: str):
+        """Track an in-flight request on a host (no-op with a single host)"""
+        if self.host_pool is None:
+            return nullcontext(base_url)
+        return self.host_pool.lease(base_url)
+
+    def _handle_request_error(
+        self,
+        error: Exception,
+        attempt: int,
+        base_url: Optional[str] = None,
+    ) -> None:
+        """
+        Log a failed attempt and update the host's circuit breaker
+
+        Args:
+            error: Exception raised by the attempt
+            attempt: Zero-based attempt number
+            base_url: Host that served the attempt
+
+        Raises:
+            FatalRequestError: If the error cannot be fixed by retrying
+        """
+        if isinstance(error, requests.exceptions.Timeout):
+            logger.warning(f"Request timeout (attempt {attempt + 1})")
+        elif isinstance(error, requests.exceptions.RequestException):
+            logger.error(f"Request error: {describe_error(error)}")
+        elif isinstance(error, json.JSONDecodeError):
+            logger.error(f"JSON decode error: {error}")
+        else:
+            logger.error(f"Unexpected error: {error}")
+
+        if is_server_failure(error):
+            base_url = base_url or self.base_url
+            self._circuit_breaker(base_url).record_failure()
+            if self.host_pool is not None:
+                # Fail over to another host on the next attempt
+                self.host_pool.mark_failed(base_url)
+
+        if not is_retryable_error(error):
+            raise FatalRequestError(describe_error(error)) from error
+
+    def _check_circuit(self, base_url: Optional[str] = None) -> bool:
+        """
+        Check whether the host's circuit breaker allows a request
+
+        Args:
+            base_url: Host to check (uses the primary host if None)
+
+        Returns:
+            True if the request may be sent, False to fail fast
+        """
+        base_url = base_url or self.base_url
+        if self._circuit_breaker(base_url).allow_request():
+            return True
+        logger.error(f"Circuit open for {base_url}, failing fast")
+        return False
+
+    def _next_retry_delay(self, attempt: int) -> Optional[float]:
+        """
+        Get the backoff delay before the next attempt
+
+        Args:
+            attempt: Zero-based attempt number that just failed
+
+        Returns:
+            Delay in seconds, or None if no retry should be made
+        """
+        if attempt >= self.max_retries - 1:
+            return None
+        if not self.retry_budget.try_consume():
+            logger.error("Retry budget exhausted, giving up")
+            return None
+        return backoff_delay(attempt, self.retry_delay, self.max_retry_delay)
+
+    def _attempt_generate(
+        self,
+        payload: Dict[str, Any],
+        attempt: int,
+        base_url: Optional[str] = None,
+        stats: Optional[Dict[str, Any]] = None,
+    ) -> Optional[str]:
+        """
+        Send a single /api/generate request
+
+        Args:
+            payload: Request payload
+            attempt: Zero-based attempt number (for logging)
+            base_url: Host to send the request to (uses the primary host if None)
+            stats: Optional dictionary updated with the host, done_reason and
+                Ollama's timing fields (eval_count, eval_duration, ...)
+
+        Returns:
+            Generated text, or None if this attempt failed
+
+        Raises:
+            FatalRequestError: If the request failed with a non-retryable error
+        """
+        base_url = base_url or self.base_url
+        if stats is not None:
+            stats["host"] = base_url
+        try:
+            logger.debug(f"Generating (attempt {attempt + 1}/{self.max_retries})")
+
+            response = self.session.post(
+                f"{base_url}/api/generate",
+                json=payload,
+                timeout=self._timeouts(),
+            )
+            response.raise_for_status()
+
+            data = response.json()
+            self._circuit_breaker(base_url).record_success()
+            generated_text = data.get("response", "")
+            if stats is not None:
+                stats["done_reason"] = data.get("done_reason")
+                stats.update({field: data.get(field) for field in TIMING_FIELDS})
+
+            if generated_text:
+                logger.debug(f"Generated {len(generated_text)} characters")
+                return generated_text
+
+            logger.warning("Empty response from Ollama")
+
+        except Exception as e:
+            self._handle_request_error(e, attempt, base_url)
+
+        return None
+
+    def _send_attempt(
+        self,
+        payload: Dict[str, Any],
+        attempt: int,
+        base_url: str,
+        stats: Dict[str, Any],
+        request_class: Optional[str] = None,
+        hedge_key: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Send one attempt, hedged when a hedge key and policy are set
+
+        Args:
+            payload: Request payload
+            attempt: Zero-based attempt number
+            base_url: Host to send the request to
+            stats: Call statistics to update
+            request_class: Rate limit request class (for a hedge request)
+            hedge_key: Request kind for hedging, or None
+
+        Returns:
+            Generated text, or None if this attempt failed
+
+        Raises:
+            FatalRequestError: If the request failed with a non-retryable error
+        """
+        if hedge_key is None or self.hedging is None:
+            return self._attempt_generate(payload, attempt, base_url, stats)
+        return self._hedged_attempt(payload, attempt, base_url, stats, request_class, hedge_key)
+
+    def _hedged_attempt(
+        self,
+        payload: Dict[str, Any],
+        attempt: int,
+        base_url: str,
+        stats: Dict[str, Any],
+        request_class: Optional[str],
+        hedge_key: str,
+    ) -> Optional[str]:
+        """
+        Send one attempt, duplicating it if it is slower than usual
+
+        Both requests are streamed so the loser can be cancelled: closing
+        its connection makes Ollama stop generating and free the slot.
+
+        Args:
+            payload: Request payload
+            attempt: Zero-based attempt number
+            base_url: Host to send the request to
+            stats: Call statistics to update (hedged, hedge_won, host, timings)
+            request_class: Rate limit request class (for the hedge request)
+            hedge_key: Request kind whose latency history sets the hedge delay
+
+        Returns:
+            Text of whichever request answered first, or None if both failed
+
+        Raises:
+            FatalRequestError: If no request succeeded and one failed with a
+                non-retryable error
+        """
+        start_time = time.perf_counter()
+        self.hedging.start_call()
+        delay = self.hedging.delay(hedge_key)
+        if delay is None:
+            # Not enough history yet: send normally and learn from it
+            generated_text = self._attempt_generate(payload, attempt, base_url, stats)
+            if generated_text:
+                self.hedging.record_latency(hedge_key, time.perf_counter() - start_time)
+            return generated_text
+
+        cancel = threading.Event()
+        results: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._start_racer(payload, base_url, cancel, results, hedge=False)
+        racers = 1
+
+        finished: List[Dict[str, Any]] = []
+        hedge_url = None
+        try:
+            try:
+                finished.append(results.get(timeout=delay))
+            except queue.Empty:
+                # Reserve the hedge budget before the circuit, so a refused hedge holds no probe slot
+                if self.hedging.try_hedge():
+                    hedge_url = self._hedge_host(base_url)
+                    if self._check_circuit(hedge_url):
+                        logger.info(f"No response after {delay:.1f}s, sending hedge request to {hedge_url}")
+                        stats["limiter_wait"] += self._throttle(hedge_url, request_class)
+                        self._start_racer(payload, hedge_url, cancel, results, hedge=True)
+                        racers += 1
+                        stats["hedged"] = True
+                    else:
+                        self.hedging.cancel_hedge()
+                        hedge_url = None
+
+            winner = None
+            while True:
+                winner = next((result for result in finished if result["text"]), None)
+                if winner is not None or len(finished) == racers:
+                    break
+                finished.append(results.get())
+            cancel.set()
+
+            fatal = None
+            for result in finished:
+                if result["error"] is not None:
+                    try:
+                        self._handle_request_error(result["error"], attempt, result["base_url"])
+                    except FatalRequestError as e:
+                        fatal = e
+        finally:
+            if hedge_url is not None:
+                self._circuit_breaker(hedge_url).release_probe()
+
+        if winner is None:
+            if fatal is not None:
+                raise fatal
+            return None
+
+        # Censored at the hedge's finish when the original was still running
+        self.hedging.record_latency(hedge_key, time.perf_counter() - start_time)
+        if winner["hedge"]:
+            self.hedging.record_win()
+            stats["hedge_won"] = True
+        stats["host"] = winner["base_url"]
+        stats["done_reason"] = winner["stats"].get("done_reason")
+        stats.update({field: winner["stats"].get(field) for field in TIMING_FIELDS})
+        return winner["text"]
+
+    def _start_racer(
+        self,
+        payload: Dict[str, Any],
+        base_url: str,
+        cancel: threading.Event,
+        results: "queue.Queue[Dict[str, Any]]",
+        hedge: bool,
+    ) -> None:
+        """
+        Stream a request in a background thread, stopping when cancel is set
+
+        Args:
+            payload: Request payload
+            base_url: Host to send the request to
+            cancel: Event set once another request has won
+            results: Queue receiving a dict with base_url, hedge, text
+                (None unless complete), stats and error
+            hedge: Whether this is the duplicate request (leases its host)
+        """
+        def race() -> None:
+            race_stats: Dict[str, Any] = {"chunks": 0, "characters": 0, "time_to_first_token": None, "done": False}
+            chunks: List[str] = []
+            error = None
+            try:
+                with self._lease(base_url) if hedge else nullcontext(base_url):
+                    for chunk in self._iter_stream(payload, race_stats, base_url):
+                        if cancel.is_set():
+                            break  # closing the stream cancels generation
+                        chunks.append(chunk)
+            except Exception as e:
+                error = e
+
+            text = "".join(chunks) if race_stats["done"] else None
+            if race_stats["done"] and not text:
+                logger.warning("Empty response from Ollama")
+            results.put({
+                "base_url": base_url,
+                "hedge": hedge,
+                "text": text or None,
+                "stats": race_stats,
+                "error": error,
+            })
+
+        threading.Thread(target=race, daemon=True).start()
+
+    def _hedge_host(self, base_url: str) -> str:
+        """
+        Choose where a hedge request goes
+
+        Args:
+            base_url: Host serving the original request
+
+        Returns:
+            Another healthy host, else the same host (another server slot)
+        """
+        if self.host_pool is not None:
+            return self.host_pool.select(exclude=[base_url]) or base_url
+        return base_url
+
+    @staticmethod
+    def _reset_stats(stats: Dict[str, Any]) -> None:
+        """
+        Clear per-call statistics before a request
+
+        Args:
+            stats: Statistics dictionary to reset
+        """
+        stats.update(
+            cached=False, success=False, attempts=0, host=None, done_reason=None,
+            hedged=False, hedge_won=False, follow_up=None, limiter_wait=0.0,
+        )
+        stats.update({field: None for field in TIMING_FIELDS})
+
+    def _record_call(
+        self,
+        step: Optional[str],
+        payload: Dict[str, Any],
+        stats: Dict[str, Any],
+        start_time: float,
+        streaming: bool = False,
+    ) -> None:
+        """
+        Send a finished call to the metrics recorder (if configured)
+
+        Args:
+            step: Pipeline step name
+            payload: Request payload
+            stats: Call statistics
+            start_time: time.perf_counter() value when the call started
+            streaming: Whether the response was streamed
+        """
+        if self.metrics is None:
+            return
+        self.metrics.record(
+            build_call_record(
+                stats,
+                step=step,
+                model=payload.get("model"),
+                wall_seconds=time.perf_counter() - start_time,
+                streaming=streaming,
+            )
+        )
+
+    def generate(
+        self,
+        prompt: str,
+        format: str = "",
+        temperature: float = 0.7,
+        max_tokens: int = 4096,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        request_class: Optional[str] = None,
+        stats: Optional[Dict[str, Any]] = None,
+        step: Optional[str] = None,
+        hedge: bool = False,
+        budget_tokens: Optional[int] = None,
+        follow_up: Optional[str] = None,
+        **kwargs,
+    ) -> Optional[str]:
+        """
+        Generate text using Ollama API
+
+        Args:
+            prompt: Input prompt
+            format: Output format ("json" or "" for free text)
+            temperature: Generation temperature (0.0-2.0)
+            max_tokens: Maximum tokens to generate
+            system_prompt: Optional system prompt
+            model: Model to use (uses self.model if None)
+            use_cache: Whether to use the response cache (if configured)
+            request_class: Rate limit request class (client default if None)
+            stats: Optional dictionary filled with cached, attempts, host,
+                done_reason ("length" means max_tokens was hit) and Ollama's
+                timing fields
+            step: Pipeline step name recorded with the call metrics
+            hedge: Whether a slow call may be duplicated (needs a hedge policy)
+            budget_tokens: Optional smaller num_predict actually sent (the
+                cache key keeps max_tokens, so answers stay shared across budgets)
+            follow_up: "continuation" or "repair" if the call only finishes or
+                fixes an earlier answer (recorded with the call metrics, so
+                output budgets do not learn from it)
+            **kwargs: Additional options to pass to Ollama
+
+        Returns:
+            Generated text, or None on failure
+        """
+        payload = self._build_payload(
+            prompt,
+            format=format,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            system_prompt=system_prompt,
+            model=model,
+            **kwargs,
+        )
+
+        if stats is None:
+            stats = {}
+        self._reset_stats(stats)
+        stats["follow_up"] = follow_up
+
+        hedge_key = self.hedging.key_for(step) if hedge and self.hedging is not None else None
+        start_time = time.perf_counter()
+        send_payload = payload
+        if budget_tokens is not None:
+            send_payload = {**payload, "options": {**payload["options"], "num_predict": budget_tokens}}
+
+        generated_text = self._generate_payload(
+            send_payload, system_prompt, use_cache, request_class, stats, hedge_key, cache_payload=payload
+        )
+        stats["success"] = generated_text is not None
+        self._record_call(step, payload, stats, start_time)
+        return generated_text
+
+    def _generate_payload(
+        self,
+        payload: Dict[str, Any],
+        system_prompt: Optional[str],
+        use_cache: bool,
+        request_class: Optional[str],
+        stats: Dict[str, Any],
+        hedge_key: Optional[str] = None,
+        cache_payload: Optional[Dict[str, Any]] = None,
+    ) -> Optional[str]:
+        """
+        Serve a payload from the cache or send it with retries
+
+        Args:
+            payload: Request payload
+            system_prompt: System prompt (part of the cache key)
+            use_cache: Whether to use the response cache (if configured)
+            request_class: Rate limit request class (client default if None)
+            stats: Call statistics to update
+            hedge_key: Request kind for hedging, or None to send attempts as-is
+            cache_payload: Payload the cache key is built from (payload if None)
+
+        Returns:
+            Generated text, or None on failure
+        """
+        cache_key = self._cache_key(cache_payload or payload, system_prompt, use_cache)
+        if cache_key is not None:
+            cached_text = self.cache.get(cache_key)
+            if cached_text:
+                stats["cached"] = True
+                return cached_text
+
         for attempt in range(self.max_retries):
+            base_url = self._select_host()
+            if base_url is None or not self._check_circuit(base_url):
+                return None
+
+            stats["attempts"] = attempt + 1
             try:
-                logger.debug(f"Generating (attempt {attempt + 1}/{self.max_retries})")
+                stats["limiter_wait"] += self._throttle(base_url, request_class)
+                with self._lease(base_url):
+                    generated_text = self._send_attempt(
+                        payload, attempt, base_url, stats, request_class, hedge_key
+                    )
+            except FatalRequestError as e:
+                logger.error(f"Non-retryable error, giving up: {e}")
+                return None
+            finally:
+                # A probe that got neither a success nor a server failure must not hold the slot
+                self._circuit_breaker(base_url).release_probe()
 
-                response = requests.post(
-                    f"{self.base_url}/api/generate",
-                    json=payload,
-                    timeout=self.timeout,
-                )
-                response.raise_for_status()
+            if generated_text:
+                # Output cut off at a smaller budget is not the answer to the cached request
+                budget_cut = cache_payload not in (None, payload) and stats.get("done_reason") == "length"
+                if cache_key is not None and not budget_cut:
+                    self.cache.set(cache_key, generated_text)
+                return generated_text
+
+            # Wait before retry
+            delay = self._next_retry_delay(attempt)
+            if delay is None:
+                break
+            logger.info(f"Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
+
+        logger.error("All retry attempts failed")
+        return None
+
+    def _iter_stream(
+        self,
+        payload: Dict[str, Any],
+        stats: Dict[str, Any],
+        base_url: Optional[str] = None,
+    ) -> Iterator[str]:
+        """
+        Send a single streaming /api/generate request and yield text chunks
+
+        Args:
+            payload: Request payload (stream flag is forced on)
+            stats: Dictionary updated with timing and completion information
+            base_url: Host to send the request to (uses the primary host if None)
+
+        Yields:
+            Response text chunks as NDJSON lines arrive
+        """
+        base_url = base_url or self.base_url
+        stats["host"] = base_url
+        start_time = time.perf_counter()
+        response = self.session.post(
+            f"{base_url}/api/generate",
+            json={**payload, "stream": True},
+            stream=True,
+            timeout=self._timeouts(),
+        )
+        try:
+            response.raise_for_status()
+            self._circuit_breaker(base_url).record_success()
+
+            for line in response.iter_lines():
+                if not line:
+                    continue
+
+                data = json.loads(line)
+                if "error" in data:
+                    raise requests.exceptions.RequestException(data["error"])
+
+                chunk = data.get("response", "")
+                if chunk:
+                    if stats.get("time_to_first_token") is None:
+                        stats["time_to_first_token"] = time.perf_counter() - start_time
+                        logger.debug(
+                            f"Time to first token: {stats['time_to_first_token']:.2f}s"
+                        )
+                    stats["chunks"] += 1
+                    stats["characters"] += len(chunk)
+                    yield chunk
+
+                if data.get("done"):
+                    stats["done"] = True
+                    stats["done_reason"] = data.get("done_reason")
+                    stats.update({field: data.get(field) for field in TIMING_FIELDS})
+                    break
+        finally:
+            stats["total_time"] = time.perf_counter() - start_time
+            response.close()
 
-                data = response.json()
-                generated_text = data.get("response", "")
+    def generate_stream(
+        self,
+        prompt: str,
+        format: str = "",
+        temperature: float = 0.7,
+        max_tokens: int = 4096,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        on_chunk: Optional[Callable[[str], None]] = None,
+        stats: Optional[Dict[str, Any]] = None,
+        request_class: Optional[str] = None,
+        step: Optional[str] = None,
+        **kwargs,
+    ) -> Iterator[str]:
+        """
+        Generate text using Ollama API, yielding chunks as they are produced
 
-                if generated_text:
-                    logger.debug(f"Generated {len(generated_text)} characters")
-                    return generated_text
+        Failed attempts are retried only until the first chunk has been
+        yielded; a connection lost mid-stream ends the stream with
+        stats["done"] left False.
+
+        Args:
+            prompt: Input prompt
+            format: Output format ("json" or "" for free text)
+            temperature: Generation temperature (0.0-2.0)
+            max_tokens: Maximum tokens to generate
+            system_prompt: Optional system prompt
+            model: Model to use (uses self.model if None)
+            on_chunk: Optional callback invoked with each chunk
+            stats: Optional dictionary filled with time_to_first_token,
+                total_time, chunks, characters, done, done_reason and
+                Ollama's timing fields
+            request_class: Rate limit request class (client default if None)
+            step: Pipeline step name recorded with the call metrics
+            **kwargs: Additional options to pass to Ollama
+
+        Yields:
+            Generated text chunks
+        """
+        payload = self._build_payload(
+            prompt,
+            format=format,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            system_prompt=system_prompt,
+            model=model,
+            **kwargs,
+        )
+        if stats is None:
+            stats = {}
+        self._reset_stats(stats)
+
+        start_time = time.perf_counter()
+        try:
+            yield from self._stream_payload(payload, on_chunk, stats, request_class)
+        finally:
+            stats["success"] = bool(stats.get("done"))
+            self._record_call(step, payload, stats, start_time, streaming=True)
+
+    def _stream_payload(
+        self,
+        payload: Dict[str, Any],
+        on_chunk: Optional[Callable[[str], None]],
+        stats: Dict[str, Any],
+        request_class: Optional[str],
+    ) -> Iterator[str]:
+        """
+        Stream a payload with retries until the first chunk
+
+        Args:
+            payload: Request payload
+            on_chunk: Optional callback invoked with each chunk
+            stats: Streaming statistics to update
+            request_class: Rate limit request class (client default if None)
+
+        Yields:
+            Generated text chunks
+        """
+        for attempt in range(self.max_retries):
+            base_url = self._select_host()
+            if base_url is None or not self._check_circuit(base_url):
+                return
+
+            stats["attempts"] = attempt + 1
+            stats.update(
+                time_to_first_token=None,
+                total_time=None,
+                chunks=0,
+                characters=0,
+                done=False,
+                done_reason=None,
+            )
+
+            try:
+                logger.debug(f"Streaming (attempt {attempt + 1}/{self.max_retries})")
+
+                try:
+                    stats["limiter_wait"] += self._throttle(base_url, request_class)
+                    with self._lease(base_url):
+                        for chunk in self._iter_stream(payload, stats, base_url):
+                            if on_chunk is not None:
+                                on_chunk(chunk)
+                            yield chunk
+                finally:
+                    self._circuit_breaker(base_url).release_probe()
+
+                if stats["chunks"] > 0:
+                    if not stats["done"]:
+                        logger.warning("Stream ended before completion")
+                    logger.debug(
+                        f"Streamed {stats['characters']} characters in {stats['total_time']:.2f}s"
+                    )
+                    return
 
                 logger.warning("Empty response from Ollama")
 
-            except requests.exceptions.Timeout:
-                logger.warning(f"Request timeout (attempt {attempt + 1})")
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Request error: {e}")
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error: {e}")
             except Exception as e:
-                logger.error(f"Unexpected error: {e}")
+                try:
+                    self._handle_request_error(e, attempt, base_url)
+                except FatalRequestError as fatal:
+                    logger.error(f"Non-retryable error, giving up: {fatal}")
+                    return
+
+            if stats["chunks"] > 0:
+                # Chunks already reached the caller, so the stream cannot be replayed
+                logger.error("Stream interrupted after partial output")
+                return
 
             # Wait before retry
-            if attempt < self.max_retries - 1:
-                logger.info(f"Retrying in {self.retry_delay} seconds...")
-                time.sleep(self.retry_delay)
+            delay = self._next_retry_delay(attempt)
+            if delay is None:
+                break
+            logger.info(f"Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
 
         logger.error("All retry attempts failed")
-        return None
+
+    @staticmethod
+    def _prepare_json_prompt(prompt: str) -> str:
+        """
+        Ensure prompt explicitly requests JSON
+
+        Args:
+            prompt: Input prompt
+
+        Returns:
+            Prompt with a JSON instruction appended if missing
+        """
+        if "JSON" not in prompt and "json" not in prompt:
+            prompt = f"{prompt}\n\n重要: 必ず有効なJSON形式で出力してください。"
+        return prompt
+
+    @staticmethod
+    def _parse_json_response(response: str, validate: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Parse a JSON response, repairing common formatting issues
+
+        Args:
+            response: Raw response text
+            validate: Whether to attempt repair if parsing fails
+
+        Returns:
+            Parsed JSON dictionary, or None on failure
+        """
+        try:
+            data = json.loads(response)
+            logger.debug("Successfully parsed JSON")
+            return data
+        except json.JSONDecodeError as e:
+            logger.warning(f"JSON parse error: {e}")
+
+        if not validate:
+            return None
+
+        data, fixes = repair_json(response)
+        if data is None:
+            logger.error("Failed to repair JSON response")
+            return None
+
+        logger.info(f"Repaired JSON response ({', '.join(fixes) or 'extracted from surrounding text'})")
+        return data
 
     def generate_json(
         self,
@@ -243,66 +1361,311 @@ class OllamaClient:
         temperature: float = 0.7,
         max_tokens: int = 4096,
         system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
         validate: bool = True,
+        use_cache: bool = True,
+        request_class: Optional[str] = None,
+        schema: Optional[Dict[str, Any]] = None,
+        step: Optional[str] = None,
+        hedge: bool = False,
+        output_format: Optional[Dict[str, Any]] = None,
     ) -> Optional[Dict[str, Any]]:
         """
         Generate JSON output
 
+        When a schema is given it is sent as the Ollama "format" payload
+        (structured outputs) and the parsed result is validated against it.
+        Output cut off at max_tokens is completed by asking only for the
+        missing tail, and malformed JSON is repaired locally. Output that is
+        still unparseable or invalid is re-requested up to
+        max_validation_retries times, with the problems listed in the prompt.
+
         Args:
             prompt: Input prompt
             temperature: Generation temperature
             max_tokens: Maximum tokens to generate
             system_prompt: Optional system prompt
+            model: Model to use (uses self.model if None)
             validate: Whether to validate JSON output
+            use_cache: Whether to use the response cache (if configured)
+            request_class: Rate limit request class (client default if None)
+            schema: Optional JSON Schema the output must satisfy
+            step: Pipeline step name recorded with the call metrics
+            hedge: Whether slow calls may be duplicated (see HedgePolicy)
+            output_format: Optional JSON Schema sent as the Ollama format
+                instead of schema (e.g. a stricter schema checked by the caller)
 
         Returns:
             Parsed JSON dictionary, or None on failure
         """
-        # Ensure prompt explicitly requests JSON
-        if "JSON" not in prompt and "json" not in prompt:
-            prompt = f"{prompt}\n\n重要: 必ず有効なJSON形式で出力してください。"
+        prompt = self._prepare_json_prompt(prompt)
+        attempts = 1 + (self.max_validation_retries if validate else 0)
+        request_prompt = prompt
+        budget_key = self.output_budget.key_for(step) if step and self.output_budget is not None else None
 
-        response = self.generate(
-            prompt=prompt,
-            format="json",
-            temperature=temperature,
-            max_tokens=max_tokens,
-            system_prompt=system_prompt,
-        )
+        for attempt in range(attempts):
+            payload_args = dict(
+                prompt=request_prompt,
+                format=output_format or schema or "json",
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_prompt=system_prompt,
+                model=model,
+            )
+            budget_tokens = self.output_budget.budget(budget_key, max_tokens) if budget_key else None
+            follow_up = "repair" if attempt else None
+            stats: Dict[str, Any] = {}
+            response = self.generate(
+                **payload_args,
+                use_cache=use_cache,
+                request_class=request_class,
+                stats=stats,
+                step=step,
+                hedge=hedge,
+                budget_tokens=budget_tokens,
+                follow_up=follow_up,
+            )
 
-        if response is None:
-            return None
+            if response is None:
+                return None
 
-        # Try to parse JSON
-        for attempt in range(3 if validate else 1):
-            try:
-                data = json.loads(response)
-                logger.debug("Successfully parsed JSON")
+            if budget_tokens is not None and stats.get("done_reason") == "length":
+                response, stats = self._retry_over_budget(
+                    response, stats, budget_tokens, payload_args, use_cache, request_class, step, follow_up
+                )
+            if budget_key:
+                self.output_budget.record(budget_key, stats)
+
+            if stats.get("done_reason") == "length":
+                response = self._complete_truncated(
+                    response, payload_args, use_cache, request_class, step
+                )
+
+            data, problems = self._check_json_response(response, schema, validate)
+            if not problems:
                 return data
-            except json.JSONDecodeError as e:
-                logger.warning(f"JSON parse error (attempt {attempt + 1}): {e}")
-
-                if validate and attempt < 2:
-                    # Try to fix common JSON issues
-                    response = response.strip()
-                    if not response.startswith("{") and not response.startswith("["):
-                        # Try to extract JSON from markdown code blocks
-                        if "```json" in response:
-                            response = response.split("```json")[1].split("```")[0]
-                        elif "```" in response:
-                            response = response.split("```")[1].split("```")[0]
-                else:
-                    break
 
-        logger.error("Failed to parse JSON after all attempts")
+            logger.warning(
+                f"Invalid JSON output (attempt {attempt + 1}/{attempts}): {'; '.join(problems[:3])}"
+            )
+            self._invalidate_cached(use_cache, **payload_args)
+            request_prompt = self._reask_prompt(prompt, problems)
+
+        logger.error("Failed to generate valid JSON after all attempts")
         return None
 
+    def _retry_over_budget(
+        self,
+        response: str,
+        stats: Dict[str, Any],
+        budget_tokens: int,
+        payload_args: Dict[str, Any],
+        use_cache: bool,
+        request_class: Optional[str],
+        step: Optional[str] = None,
+        follow_up: Optional[str] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Resend a call that hit its learned output budget with a larger one
+
+        The budget grows up to max_tokens; output still cut off there is
+        left to _complete_truncated as before.
+
+        Args:
+            response: Response cut off at the budget
+            stats: Statistics of that call
+            budget_tokens: Budget the call was sent with
+            payload_args: Arguments the original request payload was built from
+            use_cache: Whether caching was requested for the call
+            request_class: Rate limit request class
+            step: Pipeline step name recorded with the call metrics
+            follow_up: Follow-up kind of the call being retried (see generate)
+
+        Returns:
+            Tuple of the best response obtained and its call statistics
+        """
+        max_tokens = payload_args["max_tokens"]
+        while stats.get("done_reason") == "length" and budget_tokens < max_tokens:
+            budget_tokens = self.output_budget.grow(budget_tokens, max_tokens)
+            logger.info(f"Output hit its learned budget, retrying with num_predict={budget_tokens}")
+            retry_stats: Dict[str, Any] = {}
+            retry = self.generate(
+                **payload_args,
+                use_cache=False,
+                request_class=request_class,
+                stats=retry_stats,
+                step=step,
+                budget_tokens=budget_tokens if budget_tokens < max_tokens else None,
+                follow_up=follow_up,
+            )
+            if retry is None:
+                break
+            response, stats = retry, retry_stats
+
+        # Output still cut off is cached once _complete_truncated has finished it
+        if stats.get("done_reason") != "length":
+            self._cache_response(use_cache, response, **payload_args)
+        return response, stats
+
+    def _complete_truncated(
+        self,
+        response: str,
+        payload_args: Dict[str, Any],
+        use_cache: bool,
+        request_class: Optional[str],
+        step: Optional[str] = None,
+    ) -> str:
+        """
+        Ask for the rest of a response that was cut off at max_tokens
+
+        Args:
+            response: Truncated response
+            payload_args: Arguments the original request payload was built from
+            use_cache: Whether caching was requested for the call
+            request_class: Rate limit request class
+            step: Pipeline step name recorded with the call metrics
+
+        Returns:
+            Response with the continuation appended (as far as it could be obtained)
+        """
+        complete = False
+        for _ in range(self.max_continuations):
+            logger.info(
+                f"Output truncated at {payload_args['max_tokens']} tokens "
+                f"({len(response)} characters), requesting the rest"
+            )
+            stats: Dict[str, Any] = {}
+            continuation = self.generate(
+                **self._continuation_args(payload_args, response),
+                use_cache=False,
+                request_class=request_class,
+                stats=stats,
+                step=step,
+                follow_up="continuation",
+            )
+            if not continuation:
+                break
+            response = merge_continuation(response, continuation)
+            if stats.get("done_reason") != "length":
+                complete = True
+                break
+
+        # Replace the truncated cache entry with the completed response; a still
+        # truncated one is dropped, or a later run would get it as a clean hit
+        if complete:
+            self._cache_response(use_cache, response, **payload_args)
+        else:
+            self._invalidate_cached(use_cache, **payload_args)
+        return response
+
+    @staticmethod
+    def _continuation_args(
+        payload_args: Dict[str, Any],
+        response: str,
+        tail_characters: int = 1000,
+    ) -> Dict[str, Any]:
+        """
+        Build request arguments asking the model to continue a truncated response
+
+        Args:
+            payload_args: Arguments the original request payload was built from
+            response: Truncated response
+            tail_characters: How much of the response end to quote in the prompt
+
+        Returns:
+            Arguments for generate (free-text format, since the tail alone is not valid JSON)
+        """
+        prompt = (
+            f"{payload_args['prompt']}\n\n"
+            f"注意: 前回の出力は長さの上限で途中で切れました。以下は出力済みの末尾です。"
+            f"この続きだけを、出力済みの部分を繰り返さずに出力してください。\n\n"
+            f"出力済みの末尾:\n{response[-tail_characters:]}"
+        )
+        return {**payload_args, "prompt": prompt, "format": ""}
+
+    def _check_json_response(
+        self,
+        response: str,
+        schema: Optional[Dict[str, Any]],
+        validate: bool,
+    ) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        """
+        Parse a JSON response and validate it against a schema
+
+        Args:
+            response: Raw model output
+            schema: Optional JSON Schema the output must satisfy
+            validate: Whether to repair and validate the output
+
+        Returns:
+            Tuple of parsed data (or None) and a list of problems (empty if valid)
+        """
+        data = self._parse_json_response(response, validate)
+        if data is None:
+            return None, ["出力が有効なJSONではありません"]
+        if schema and validate:
+            return data, validate_json_schema(data, schema)
+        return data, []
+
+    @staticmethod
+    def _reask_prompt(prompt: str, problems: List[str]) -> str:
+        """
+        Build a prompt asking the model to fix its previous output
+
+        Args:
+            prompt: Original prompt
+            problems: Problems found in the previous output
+
+        Returns:
+            Prompt with the problems appended
+        """
+        problem_lines = "\n".join(f"- {problem}" for problem in problems[:5])
+        return (
+            f"{prompt}\n\n"
+            f"注意: 前回の出力には以下の問題がありました。修正した有効なJSONのみを出力してください。\n"
+            f"{problem_lines}"
+        )
+
+    def _invalidate_cached(self, use_cache: bool, **payload_args) -> None:
+        """
+        Drop a cached response that turned out to be unusable
+
+        Args:
+            use_cache: Whether caching was requested for the call
+            **payload_args: Arguments the request payload was built from
+        """
+        payload = self._build_payload(**payload_args)
+        cache_key = self._cache_key(payload, payload_args.get("system_prompt"), use_cache)
+        if cache_key is not None:
+            self.cache.delete(cache_key)
+
+    def _cache_response(self, use_cache: bool, response: str, **payload_args) -> None:
+        """
+        Store a response under the cache key of the request it answers
+
+        Args:
+            use_cache: Whether caching was requested for the call
+            response: Response text to cache
+            **payload_args: Arguments the request payload was built from
+        """
+        payload = self._build_payload(**payload_args)
+        cache_key = self._cache_key(payload, payload_args.get("system_prompt"), use_cache)
+        if cache_key is not None:
+            self.cache.set(cache_key, response)
+
     def generate_text(
         self,
         prompt: str,
         temperature: float = 1.0,
         max_tokens: int = 4096,
         system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        stream: bool = False,
+        on_chunk: Optional[Callable[[str], None]] = None,
+        stats: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+        request_class: Optional[str] = None,
+        step: Optional[str] = None,
     ) -> Optional[str]:
         """
         Generate free-form text (for novels, references)
@@ -312,14 +1675,46 @@ class OllamaClient:
             temperature: Generation temperature (higher = more creative)
             max_tokens: Maximum tokens to generate
             system_prompt: Optional system prompt
+            model: Model to use (uses self.model if None)
+            stream: Whether to stream the response (see generate_stream)
+            on_chunk: Optional callback invoked with each streamed chunk
+            stats: Optional dictionary filled with streaming statistics
+            use_cache: Whether to use the response cache (non-streaming only)
+            request_class: Rate limit request class (client default if None)
+            step: Pipeline step name recorded with the call metrics
 
         Returns:
-            Generated text, or None on failure
+            Generated text, or None on failure (including an interrupted stream)
         """
+        if stream:
+            if stats is None:
+                stats = {}
+            chunks = list(
+                self.generate_stream(
+                    prompt=prompt,
+                    format="",  # Free text
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    system_prompt=system_prompt,
+                    model=model,
+                    on_chunk=on_chunk,
+                    stats=stats,
+                    request_class=request_class,
+                    step=step,
+                )
+            )
+            if not stats.get("done"):
+                return None
+            return "".join(chunks)
+
         return self.generate(
             prompt=prompt,
             format="",  # Free text
             temperature=temperature,
             max_tokens=max_tokens,
             system_prompt=system_prompt,
+            model=model,
+            use_cache=use_cache,
+            request_class=request_class,
+            step=step,
         )
@@ -0,0 +1,181 @@
+"""
+Output Budget Module
+Learned per-step num_predict limits from historical output lengths
+"""
+
+import json
+import math
+import threading
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Deque, Dict, Any, Iterable, Optional, Union
+from loguru import logger
+
+from .hedging import HedgePolicy
+
+
+class OutputBudget:
+    """
+    Sizes num_predict from the output lengths a step has produced before
+
+    eval_count of completed (not truncated) calls is kept per request kind.
+    Once a kind has min_samples observations, its calls are sent with
+    num_predict = percentile(eval_count) * margin instead of the caller's
+    flat max_tokens, which stays the upper bound. Oversized limits make
+    the server reserve KV cache and keep slots busy for output that never
+    comes; a call that still stops with done_reason "length" is retried
+    with a larger budget.
+    """
+
+    key_for = staticmethod(HedgePolicy.key_for)
+
+    def __init__(
+        self,
+        percentile: float = 99.0,
+        margin: float = 1.25,
+        min_samples: int = 5,
+        min_tokens: int = 256,
+        growth: float = 2.0,
+        window: int = 500,
+    ):
+        """
+        Initialize output budget
+
+        Args:
+            percentile: Output length percentile the budget is based on
+            margin: Factor applied on top of the percentile
+            min_samples: Observations needed before a kind gets a learned budget
+            min_tokens: Lower bound for a learned budget
+            growth: Factor the budget grows by when a call hits it
+            window: Latest output lengths kept per request kind
+        """
+        self.percentile = percentile
+        self.margin = margin
+        self.min_samples = max(1, int(min_samples))
+        self.min_tokens = min_tokens
+        self.growth = max(1.1, growth)
+
+        self._lengths: Dict[str, Deque[int]] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+        # Counters
+        self.budgeted = 0
+        self.retries = 0
+
+        logger.info(f"OutputBudget initialized: p{percentile:g} x {margin:g} of recorded output lengths")
+
+    def budget(self, key: str, ceiling: int) -> Optional[int]:
+        """
+        Get the num_predict to send for a request kind
+
+        Args:
+            key: Request kind
+            ceiling: Largest allowed limit (the caller's max_tokens)
+
+        Returns:
+            Learned limit below ceiling, or None to send the ceiling as-is
+        """
+        with self._lock:
+            samples = sorted(self._lengths[key])
+        if len(samples) < self.min_samples:
+            return None
+
+        # Nearest-rank percentile
+        rank = max(1, math.ceil(self.percentile / 100 * len(samples)))
+        budget = max(self.min_tokens, math.ceil(samples[rank - 1] * self.margin))
+        if budget >= ceiling:
+            return None
+
+        with self._lock:
+            self.budgeted += 1
+        return budget
+
+    def grow(self, budget: int, ceiling: int) -> int:
+        """
+        Get the next limit for a call that stopped at its budget
+
+        Args:
+            budget: Limit the call was cut off at
+            ceiling: Largest allowed limit (the caller's max_tokens)
+
+        Returns:
+            Larger limit, at most ceiling
+        """
+        with self._lock:
+            self.retries += 1
+        return min(ceiling, max(budget + 1, math.ceil(budget * self.growth)))
+
+    def record(self, key: str, stats: Dict[str, Any]) -> bool:
+        """
+        Add a call's output length to the history
+
+        Cached and truncated calls are ignored, and so are continuation and
+        repair calls: they say nothing about how long a complete answer is.
+
+        Args:
+            key: Request kind
+            stats: Call statistics as filled in by OllamaClient.generate
+
+        Returns:
+            True if the output length was added
+        """
+        eval_count = stats.get("eval_count")
+        if stats.get("cached") or stats.get("follow_up") or stats.get("done_reason") == "length" or not eval_count:
+            return False
+        with self._lock:
+            self._lengths[key].append(int(eval_count))
+        return True
+
+    def load_history(self, paths: Iterable[Union[str, Path]]) -> int:
+        """
+        Seed the history from metrics JSONL files of earlier runs
+
+        Args:
+            paths: Files written by MetricsRecorder (calls_<run_id>.jsonl)
+
+        Returns:
+            Number of output lengths loaded
+        """
+        loaded = 0
+        for path in paths:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+            except OSError as e:
+                logger.warning(f"Failed to read metrics file {path}: {e}")
+                continue
+
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not record.get("success") or record.get("streaming"):
+                    continue
+                loaded += self.record(
+                    self.key_for(record.get("step")),
+                    {
+                        "cached": record.get("cached"),
+                        "follow_up": record.get("follow_up"),
+                        "done_reason": record.get("done_reason"),
+                        "eval_count": record.get("output_tokens"),
+                    },
+                )
+
+        logger.info(f"Loaded {loaded} recorded output length(s) for output budgets")
+        return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get output budget statistics
+
+        Returns:
+            Dictionary with calls sent with a learned budget, retries after
+            a budget was hit and the number of request kinds with history
+        """
+        with self._lock:
+            return {
+                "budgeted": self.budgeted,
+                "retries": self.retries,
+                "kinds": sum(1 for lengths in self._lengths.values() if len(lengths) >= self.min_samples),
+            }
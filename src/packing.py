@@ -0,0 +1,343 @@
+"""
+Packing Module
+Combines several small same-shaped requests into one prompt with keyed output slots
+"""
+
+from typing import Dict, Any, Callable, List, Optional
+from loguru import logger
+
+from .ollama_client import OllamaClient
+from .prompt_budget import PromptBudgeter
+from .schema import validate_json_schema
+from .token_counter import local_token_estimate
+from .utils import format_prompt
+
+
+# Placeholder substituted for shared variables inside each packed task
+SHARED_REFERENCE = "（共通データ「{name}」を参照）"
+
+# Slot schema for free-text (Markdown) outputs
+TEXT_SLOT_SCHEMA = {"type": "string", "minLength": 1}
+
+
+def build_packed_prompt(
+    template: str,
+    items: Dict[str, Dict[str, Any]],
+    shared: Optional[Dict[str, Any]] = None,
+    text_output: bool = False,
+) -> str:
+    """
+    Render several requests from one template as a single prompt
+
+    Shared variables (e.g. the whole plot) are included once at the top
+    and referenced from each task, so the model prefills them only once.
+
+    Args:
+        template: Prompt template (as in config/prompts)
+        items: Slot key -> template variables for that request
+        shared: Template variables common to every request
+        text_output: Whether each answer is free text (Markdown) rather than JSON
+
+    Returns:
+        Packed prompt asking for one JSON object keyed by slot
+    """
+    shared = shared or {}
+    references = {name: SHARED_REFERENCE.format(name=name) for name in shared}
+
+    sections = [f"以下の{len(items)}件のタスクに、それぞれ独立して回答してください。"]
+    if shared:
+        sections.append("## 共通データ")
+        for name, value in shared.items():
+            sections.append(f"### {name}\n{value}")
+
+    for slot, variables in items.items():
+        task = format_prompt(template, **{**references, **variables}).strip()
+        sections.append(f"## タスク {slot}\n{task}")
+
+    answer = "Markdown形式の文字列" if text_output else "そのタスクで指定されたJSON"
+    example = ", ".join(f'"{slot}": <タスク {slot} の回答>' for slot in items)
+    sections.append(
+        "## 出力形式\n"
+        f"各タスクの回答（{answer}）を、タスク名をキーとする1つのJSONオブジェクトにまとめてください。\n"
+        f"{{{example}}}"
+    )
+    return "\n\n".join(sections) + "\n"
+
+
+def packed_schema(slot_schemas: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build the JSON Schema of a packed response
+
+    Args:
+        slot_schemas: Slot key -> schema of that slot's answer
+
+    Returns:
+        Object schema with one required property per slot
+    """
+    return {
+        "type": "object",
+        "properties": dict(slot_schemas),
+        "required": list(slot_schemas),
+    }
+
+
+class PromptPacker:
+    """
+    Sends same-shaped requests as packed prompts with keyed output slots
+
+    Each pack is one request; its answer is split by slot and every slot is
+    validated on its own. Slots that are missing or invalid fall back to a
+    separate request with the ordinary prompt, so a bad slot never costs
+    more than the unpacked call would have. A pack asks for every slot's
+    max_tokens at once, so it is closed early when the prompt and those
+    answers together would not fit the context window.
+    """
+
+    def __init__(
+        self,
+        client: OllamaClient,
+        pack_size: int = 10,
+        budgeter: Optional[PromptBudgeter] = None,
+        context_length: Optional[int] = None,
+    ):
+        """
+        Initialize prompt packer
+
+        Args:
+            client: Client used for packed and fallback requests
+            pack_size: Maximum requests combined into one prompt
+            budgeter: Optional context window budget; packs are closed early
+                so their prompt fits, and separate requests are fitted to it
+            context_length: Context window in tokens used without a budgeter
+                (the client's num_ctx; packed output is not capped if None)
+        """
+        self.client = client
+        self.pack_size = max(1, int(pack_size))
+        self.budgeter = budgeter
+        self.context_length = budgeter.max_context_length if budgeter is not None else context_length
+
+        # Counters
+        self.packed_requests = 0
+        self.packed_slots = 0
+        self.fallbacks = 0
+
+    def _packs(
+        self,
+        template: str,
+        items: Dict[str, Dict[str, Any]],
+        shared: Optional[Dict[str, Any]],
+        system_prompt: Optional[str],
+        text_output: bool,
+        max_tokens: int,
+    ) -> List[Dict[str, Dict[str, Any]]]:
+        """Split items into groups of at most pack_size whose prompt fits the context window"""
+        packs: List[Dict[str, Dict[str, Any]]] = []
+        pack: Dict[str, Dict[str, Any]] = {}
+        for slot, variables in items.items():
+            candidate = {**pack, slot: variables}
+            too_long = False
+            if pack:
+                prompt = build_packed_prompt(template, candidate, shared, text_output)
+                output_tokens = max_tokens * len(candidate)
+                too_long = self._pack_tokens(prompt, len(candidate), system_prompt, max_tokens) < output_tokens or (
+                    self.budgeter is not None and not self.budgeter.fits(prompt, output_tokens, system_prompt)
+                )
+            if len(pack) >= self.pack_size or too_long:
+                packs.append(pack)
+                candidate = {slot: variables}
+            pack = candidate
+        if pack:
+            packs.append(pack)
+        return packs
+
+    def _pack_tokens(self, prompt: str, slots: int, system_prompt: Optional[str], max_tokens: int) -> int:
+        """Get a pack's num_predict: max_tokens per slot, capped at what the context window leaves after the prompt"""
+        output_tokens = max_tokens * slots
+        if not self.context_length:
+            return output_tokens
+        count = self.budgeter.counter.count if self.budgeter is not None else local_token_estimate
+        prompt_tokens = count(prompt) + (count(system_prompt) if system_prompt else 0)
+        return max(1, min(output_tokens, self.context_length - prompt_tokens))
+
+    def _render(self, template: str, variables: Dict[str, Any], system_prompt: Optional[str], max_tokens: int) -> str:
+        """Fill the ordinary (unpacked) prompt of one request"""
+        if self.budgeter is None:
+            return format_prompt(template, **variables)
+        return self.budgeter.fit(template, variables, output_tokens=max_tokens, system_prompt=system_prompt)
+
+    def generate_json(
+        self,
+        template: str,
+        items: Dict[str, Dict[str, Any]],
+        shared: Optional[Dict[str, Any]] = None,
+        system_prompt: Optional[str] = None,
+        schema: Optional[Dict[str, Any]] = None,
+        item_schemas: Optional[Dict[str, Dict[str, Any]]] = None,
+        step: Optional[str] = None,
+        max_tokens: int = 4096,
+        **kwargs,
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Generate JSON for several requests built from one template
+
+        Args:
+            template: Prompt template
+            items: Slot key -> template variables for that request
+            shared: Template variables common to every request
+            system_prompt: Optional system prompt
+            schema: JSON Schema of each answer
+            item_schemas: Optional per-slot schemas overriding schema
+            step: Step name prefix (packs are recorded as "<step>.packed",
+                fallbacks as "<step>.<slot>")
+            max_tokens: Output token limit of a single (unpacked) answer
+            **kwargs: Further arguments for OllamaClient.generate_json
+                (temperature, model, use_cache, ...)
+
+        Returns:
+            Slot key -> parsed answer, or None where even the fallback failed
+        """
+        item_schemas = item_schemas or {}
+        slot_schemas = {
+            slot: item_schemas.get(slot) or schema or {"type": "object"}
+            for slot in items
+        }
+
+        def fallback(slot: str) -> Optional[Dict[str, Any]]:
+            return self.client.generate_json(
+                self._render(template, {**(shared or {}), **items[slot]}, system_prompt, max_tokens),
+                system_prompt=system_prompt,
+                schema=item_schemas.get(slot) or schema,
+                max_tokens=max_tokens,
+                step=f"{step}.{slot}" if step else None,
+                **kwargs,
+            )
+
+        return self._run(template, items, shared, system_prompt, slot_schemas, False, fallback, step, max_tokens, kwargs)
+
+    def generate_text(
+        self,
+        template: str,
+        items: Dict[str, Dict[str, Any]],
+        shared: Optional[Dict[str, Any]] = None,
+        system_prompt: Optional[str] = None,
+        step: Optional[str] = None,
+        max_tokens: int = 4096,
+        **kwargs,
+    ) -> Dict[str, Optional[str]]:
+        """
+        Generate free text for several requests built from one template
+
+        Args:
+            template: Prompt template
+            items: Slot key -> template variables for that request
+            shared: Template variables common to every request
+            system_prompt: Optional system prompt
+            step: Step name prefix (packs are recorded as "<step>.packed",
+                fallbacks as "<step>.<slot>")
+            max_tokens: Output token limit of a single (unpacked) answer
+            **kwargs: Further arguments for OllamaClient.generate_text
+                (temperature, model, use_cache, ...)
+
+        Returns:
+            Slot key -> generated text, or None where even the fallback failed
+        """
+        slot_schemas = {slot: TEXT_SLOT_SCHEMA for slot in items}
+
+        def fallback(slot: str) -> Optional[str]:
+            return self.client.generate_text(
+                self._render(template, {**(shared or {}), **items[slot]}, system_prompt, max_tokens),
+                system_prompt=system_prompt,
+                max_tokens=max_tokens,
+                step=f"{step}.{slot}" if step else None,
+                **kwargs,
+            )
+
+        return self._run(template, items, shared, system_prompt, slot_schemas, True, fallback, step, max_tokens, kwargs)
+
+    def _run(
+        self,
+        template: str,
+        items: Dict[str, Dict[str, Any]],
+        shared: Optional[Dict[str, Any]],
+        system_prompt: Optional[str],
+        slot_schemas: Dict[str, Dict[str, Any]],
+        text_output: bool,
+        fallback: Callable[[str], Any],
+        step: Optional[str],
+        max_tokens: int,
+        kwargs: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """
+        Send packs, split their answers and fall back for failed slots
+
+        Args:
+            template: Prompt template
+            items: Slot key -> template variables
+            shared: Shared template variables
+            system_prompt: Optional system prompt
+            slot_schemas: Slot key -> schema of that slot's answer
+            text_output: Whether answers are free text
+            fallback: Callable sending one slot as a separate request
+            step: Step name prefix
+            max_tokens: Output token limit of a single answer
+            kwargs: Further generate arguments (temperature, model, ...)
+
+        Returns:
+            Slot key -> answer (None where the fallback failed too)
+        """
+        results: Dict[str, Any] = {}
+        json_kwargs = {key: value for key, value in kwargs.items() if key in ("temperature", "model", "use_cache", "request_class")}
+
+        packs = self._packs(template, items, shared, system_prompt, text_output, max_tokens)
+        for pack in packs:
+            answers: Dict[str, Any] = {}
+            if len(pack) > 1:
+                schemas = {slot: slot_schemas[slot] for slot in pack}
+                prompt = build_packed_prompt(template, pack, shared, text_output)
+                data = self.client.generate_json(
+                    prompt,
+                    system_prompt=system_prompt,
+                    schema={"type": "object"},
+                    output_format=packed_schema(schemas),
+                    max_tokens=self._pack_tokens(prompt, len(pack), system_prompt, max_tokens),
+                    step=f"{step}.packed" if step else None,
+                    **json_kwargs,
+                )
+                self.packed_requests += 1
+                if isinstance(data, dict):
+                    for slot in pack:
+                        value = data.get(slot)
+                        problems = validate_json_schema(value, schemas[slot]) if value is not None else ["missing"]
+                        if problems:
+                            logger.warning(f"Packed slot {slot} unusable ({'; '.join(problems[:2])}), sending separately")
+                        else:
+                            answers[slot] = value
+                self.packed_slots += len(answers)
+
+            for slot in pack:
+                if slot in answers:
+                    results[slot] = answers[slot]
+                else:
+                    if len(pack) > 1:
+                        self.fallbacks += 1
+                    results[slot] = fallback(slot)
+
+        logger.info(
+            f"Packed {len(items)} request(s) into {len(packs)} prompt(s) "
+            f"({sum(1 for slot in items if results.get(slot) is not None)} answered)"
+        )
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get packing statistics
+
+        Returns:
+            Dictionary with packed requests sent, slots answered from packs
+            and slots that needed a separate request
+        """
+        return {
+            "packed_requests": self.packed_requests,
+            "packed_slots": self.packed_slots,
+            "fallbacks": self.fallbacks,
+        }
@@ -3,14 +3,34 @@ Pipeline Module
 Main pipeline orchestration for 100 TIMES AI WORLD BUILDING
 """
 
+import asyncio
+import os
 import random
-from typing import Dict, Any, Optional
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Dict, Any, Awaitable, Callable, Iterable, List, Optional, Tuple
 
 import yaml as yaml_lib
 from loguru import logger
 from tqdm import tqdm
 
 from .ollama_client import OllamaClient
+from .async_ollama_client import AsyncOllamaClient
+from .response_cache import ResponseCache
+from .resilience import RetryBudget
+from .rate_limiter import RateLimiter
+from .metrics import MetricsRecorder
+from .hedging import HedgePolicy
+from .output_budget import OutputBudget
+from .mock_server import MockOllamaServer
+from .packing import PromptPacker
+from .token_counter import TokenCounter
+from .prompt_budget import PromptBudgeter
+from .step_graph import StepGraph
+from .incremental import StepFingerprints
 from .checkpoint_manager import CheckpointManager
 from .utils import (
     load_config,
@@ -18,10 +38,90 @@ from .utils import (
     format_prompt,
     dict_to_yaml,
     save_yaml,
+    load_yaml,
     save_text,
+    load_text,
 )
 
 
+# World elements generated in Phase 3 (in order): element -> {prompt variable: element it reads}
+WORLD_ELEMENTS = [
+    ("events", {}),
+    ("observation", {"events": "events"}),
+    ("interpretation", {"events": "events", "observation": "observation"}),
+    ("media", {"events": "events", "observation": "observation", "interpretation": "interpretation"}),
+    ("important_past_events", {"events": "events", "observation": "observation", "interpretation": "interpretation", "media": "media"}),
+    ("social_structure", {"events": "events", "observation": "observation", "interpretation": "interpretation", "media": "media", "important_past_events": "important_past_events"}),
+    ("living_environment", {"social_structure": "social_structure"}),
+    ("social_groups", {"social_structure": "social_structure", "living_environment": "living_environment"}),
+    ("people_list", {"social_structure": "social_structure", "living_environment": "living_environment", "social_groups": "social_groups"}),
+    ("future_scenarios", {"events": "events", "observation": "observation", "interpretation": "interpretation", "media": "media", "important_past_events": "important_past_events", "social_structure": "social_structure", "living_environment": "living_environment", "social_groups": "social_groups", "people_list": "people_list"}),
+]
+
+
+# Slot priority of each phase's steps in the full-pipeline graph (higher first)
+# 3: Phase 1-3, which feed the long Phase 3 chain
+# 2: Phase 5, so a chapter's novel starts as soon as its references exist
+# 1: Phase 4 chapter chains, which run ahead only while no chapter is waiting
+# 0: Phase 6 references, which nothing reads
+PHASE_PRIORITIES = {"phase1": 3, "phase2": 3, "phase3": 3, "phase4": 1, "phase5": 2, "phase6": 0}
+
+
+# Phase 1 lists (in order): (prompt key, intermediate file, whether the prompt reads the user context)
+EXPANSION_LISTS = [
+    ("desire_list", "01_desire_list", True),
+    ("ability_list", "02_ability_list", True),
+    ("role_list", "03_role_list", True),
+    ("plottype_list", "04_plottype_list", False),
+]
+
+
+# Fields of one chapter in the plot, as returned by extract_chapter
+CHAPTER_FIELDS = [
+    "situation",
+    "events",
+    "protagonist_emotions",
+    "protagonist_actions",
+    "situation_change",
+    "foreshadowing",
+]
+
+
+# Per-chapter Phase 4 steps (in order): (prompt key, plot_data prefix of the
+# chapter's input (None = the whole plot), plot_data prefix of its output, file number offset)
+CHAPTER_STEPS = [
+    ("extract_chapter", None, "plot", 20),
+    ("extract_keywords", "plot", "plot_keywords", 30),
+    ("search_references", "plot_keywords", "plot_reference", 40),
+]
+
+
+def chapter_extract_schema(chapter_num: int) -> Dict[str, Any]:
+    """
+    Get the JSON Schema of an extract_chapter response
+
+    The prompt file cannot hold this schema because its key contains the
+    chapter number.
+
+    Args:
+        chapter_num: Chapter number
+
+    Returns:
+        Schema of {"chapter_<n>": {situation, events, ...}}
+    """
+    return {
+        "type": "object",
+        "properties": {
+            f"chapter_{chapter_num}": {
+                "type": "object",
+                "properties": {field: {"type": "string"} for field in CHAPTER_FIELDS},
+                "required": CHAPTER_FIELDS[:5],
+            },
+        },
+        "required": [f"chapter_{chapter_num}"],
+    }
+
+
 class Pipeline:
     """Main pipeline for AI world building"""
 
@@ -39,10 +139,98 @@ class Pipeline:
         """
         # Load configuration
         self.config = load_config(config_path)
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
 
         # Initialize components
         server_config = self.config.get("server", {})
         model_config = self.config.get("model", {})
+        performance_config = self.config.get("performance", {})
+
+        max_parallel_requests = performance_config.get("max_parallel_requests", 3)
+
+        # Bundled stand-in server instead of Ollama (development.mock_api_calls)
+        development_config = self.config.get("development", {})
+        self.mock_server = None
+        if development_config.get("mock_api_calls", False):
+            mock_config = development_config.get("mock_server", {})
+            self.mock_server = MockOllamaServer(
+                prompts_dir=prompts_dir,
+                load_time=mock_config.get("load_time", 0.0),
+                tokens_per_second=mock_config.get("tokens_per_second", 0.0),
+                prompt_tokens_per_second=mock_config.get("prompt_tokens_per_second", 0.0),
+                concurrency=mock_config.get("concurrency", 1),
+                error_rate=mock_config.get("error_rate", 0.0),
+                straggler_rate=mock_config.get("straggler_rate", 0.0),
+                straggler_factor=mock_config.get("straggler_factor", 5.0),
+                seed=mock_config.get("seed"),
+            )
+            mock_host, mock_port = self.mock_server.start().rsplit(":", 1)
+            server_config = {**server_config, "host": mock_host, "port": int(mock_port), "hosts": None}
+            logger.warning(f"Mock API calls enabled: using {self.mock_server.base_url}")
+
+        # Persistent response cache (bypassed per phase with phases.<phase>.cache: false)
+        self.response_cache = None
+        if performance_config.get("use_context_cache", False):
+            self.response_cache = ResponseCache(
+                cache_dir=performance_config.get("cache_dir", "./output/cache/responses"),
+                ttl=performance_config.get("cache_ttl", 3600),
+                max_size_mb=performance_config.get("cache_max_size_mb", 512),
+            )
+
+        # Retry budget shared by every call in a run (reset in run_full_pipeline)
+        self.retry_budget = RetryBudget(server_config.get("retry_budget"))
+        circuit_config = server_config.get("circuit_breaker", {})
+
+        # Token-bucket rate limiting (safety.rate_limit), shared by both clients
+        rate_limit_config = self.config.get("safety", {}).get("rate_limit", {})
+        self.rate_limiter = None
+        if rate_limit_config.get("enabled", False):
+            self.rate_limiter = RateLimiter(
+                max_requests_per_minute=rate_limit_config.get("max_requests_per_minute", 20),
+                burst=rate_limit_config.get("burst", 1),
+                per_host=rate_limit_config.get("per_host"),
+                per_class=rate_limit_config.get("per_class"),
+            )
+
+        # Per-call inference metrics (JSONL per run + Prometheus text file)
+        metrics_config = self.config.get("metrics", {})
+        self.metrics = None
+        if metrics_config.get("enabled", False):
+            metrics_dir = metrics_config.get("dir", "./output/metrics")
+            self.metrics = MetricsRecorder(
+                jsonl_path=f"{metrics_dir}/calls_{self.run_id}.jsonl",
+                prometheus_path=metrics_config.get("prometheus_file"),
+                run_id=self.run_id,
+            )
+
+        # Learned num_predict for JSON calls, seeded from earlier runs' metrics
+        budget_config = performance_config.get("output_budget", {})
+        self.output_budget = None
+        if budget_config.get("enabled", False):
+            self.output_budget = OutputBudget(
+                percentile=budget_config.get("percentile", 99),
+                margin=budget_config.get("margin", 1.25),
+                min_samples=budget_config.get("min_samples", 5),
+                min_tokens=budget_config.get("min_tokens", 256),
+                growth=budget_config.get("growth", 2.0),
+            )
+            if budget_config.get("use_history", True):
+                metrics_dir = Path(metrics_config.get("dir", "./output/metrics"))
+                self.output_budget.load_history(sorted(metrics_dir.glob("calls_*.jsonl")))
+
+        # Hedged requests for the short JSON prompts listed in performance.hedging.prompts
+        hedging_config = performance_config.get("hedging", {})
+        self.hedging = None
+        self.hedge_prompts = set()
+        if hedging_config.get("enabled", False):
+            self.hedging = HedgePolicy(
+                percentile=hedging_config.get("percentile", 95),
+                min_samples=hedging_config.get("min_samples", 5),
+                min_delay=hedging_config.get("min_delay", 0.5),
+                max_delay=hedging_config.get("max_delay"),
+                max_hedge_ratio=hedging_config.get("max_hedge_ratio", 0.1),
+            )
+            self.hedge_prompts = set(hedging_config.get("prompts", []))
 
         self.client = OllamaClient(
             host=server_config.get("host", "http://localhost"),
@@ -51,7 +239,45 @@ class Pipeline:
             timeout=server_config.get("timeout", 300),
             max_retries=server_config.get("max_retries", 3),
             retry_delay=server_config.get("retry_delay", 5),
+            connect_timeout=server_config.get("connect_timeout", 10),
+            pool_size=max_parallel_requests,
+            cache=self.response_cache,
+            max_retry_delay=server_config.get("max_retry_delay", 60),
+            retry_budget=self.retry_budget,
+            circuit_failure_threshold=circuit_config.get("failure_threshold", 5),
+            circuit_reset_timeout=circuit_config.get("reset_timeout", 30),
+            hosts=server_config.get("hosts") or None,
+            health_check_interval=server_config.get("health_check_interval", 30),
+            affinity_key=self.run_id,  # keep this run on one host while it is healthy
+            rate_limiter=self.rate_limiter,
+            request_class=rate_limit_config.get("request_class", "default"),
+            keep_alive=model_config.get("keep_alive"),
+            max_validation_retries=self.config.get("safety", {}).get("max_validation_retries", 2),
+            max_continuations=self.config.get("safety", {}).get("max_continuations", 2),
+            metrics=self.metrics,
+            hedging=self.hedging,
+            output_budget=self.output_budget,
+            context_length=performance_config.get("max_context_length"),
+        )
+
+        # Token counts (server tokenizer where available) for fitting prompts into the window
+        token_config = performance_config.get("token_counter", {})
+        self.token_counter = TokenCounter(
+            self.client,
+            use_server=token_config.get("use_server", True),
+            cache_size=token_config.get("cache_size", 4096),
         )
+        # Cutting prompts to fit the window is opt-in; otherwise templates are filled as written
+        self.prompt_budgeter = None
+        if performance_config.get("prompt_budget", {}).get("enabled", False):
+            self.prompt_budgeter = PromptBudgeter(
+                self.token_counter,
+                max_context_length=performance_config.get("max_context_length", 8192),
+                strategy=performance_config.get("truncate_strategy", "sliding_window"),
+            )
+
+        # Async front end for phases that issue concurrent requests
+        self.async_client = AsyncOllamaClient(self.client, max_parallel_requests=max_parallel_requests)
 
         checkpoint_config = self.config.get("checkpointing", {})
         self.checkpoint_manager = CheckpointManager(
@@ -67,8 +293,25 @@ class Pipeline:
         self.output_config = self.config.get("output", {})
         self.base_dir = self.output_config.get("base_dir", "./output")
 
+        # Incremental rebuilds: steps whose inputs did not change reuse their saved output
+        incremental_config = self.config.get("incremental", {})
+        self.fingerprints = StepFingerprints(
+            f"{self.base_dir}/intermediate/fingerprints",
+            enabled=incremental_config.get("enabled", False),
+        )
+        self.sample_seed = incremental_config.get("seed", 0)
+
+        # Steps that bounded the last run_full_pipeline (see StepGraph.critical_path)
+        self.critical_path: List[str] = []
+
         logger.info("Pipeline initialized")
 
+    def close(self) -> None:
+        """Release resources held by the pipeline (stops the mock server if running)"""
+        if self.mock_server is not None:
+            self.mock_server.stop()
+            self.mock_server = None
+
     def check_prerequisites(self) -> bool:
         """
         Check if all prerequisites are met
@@ -83,14 +326,109 @@ class Pipeline:
             logger.error("Ollama server is not running. Please start it with: ollama serve")
             return False
 
-        # Check model availability
-        if not self.client.ensure_model_ready():
-            logger.error("Model is not available and could not be downloaded")
-            return False
+        # Check model availability (primary model and any per-phase/per-prompt overrides)
+        for model_name in self._models_in_use():
+            if not self.client.ensure_model_ready(model_name):
+                logger.error(f"Model {model_name} is not available and could not be downloaded")
+                return False
+
+        # Load the primary model now so the first phase does not pay for it
+        if self.config.get("model", {}).get("warm_up", False):
+            self.client.warm_up()
+            resident = self.client.resident_models()
+            logger.info(f"Resident models: {', '.join(resident) if resident else '(none)'}")
 
         logger.info("✓ All prerequisites met")
         return True
 
+    def _fit_prompt(self, prompt_def: Dict[str, Any], max_tokens: int = 4096, **variables) -> str:
+        """
+        Fill a prompt template so that it fits the context window
+        (filled as written unless performance.prompt_budget is enabled)
+
+        Args:
+            prompt_def: Prompt definition (user template, system prompt and
+                optional context_priority, most important variable first)
+            max_tokens: num_predict of the call (reserved for the output)
+            **variables: Template variables
+
+        Returns:
+            Prompt text
+        """
+        if self.prompt_budgeter is None:
+            return format_prompt(prompt_def.get("user", ""), **variables)
+        return self.prompt_budgeter.fit(
+            prompt_def.get("user", ""),
+            variables,
+            output_tokens=max_tokens,
+            system_prompt=prompt_def.get("system"),
+            priority=prompt_def.get("context_priority"),
+        )
+
+    def _check_step(self, step: str, prompt: str, options: Dict[str, Any]) -> Tuple[str, bool]:
+        """
+        Fingerprint a step's request and check whether it must be rebuilt
+
+        Args:
+            step: Step name (as recorded in the call metrics)
+            prompt: Rendered prompt (or packed inputs)
+            options: Model, system prompt, schema and generation options of the call
+
+        Returns:
+            The fingerprint, and whether the step's saved output is up to date
+        """
+        fingerprint = StepFingerprints.fingerprint(
+            prompt=prompt, **{**options, "model": options.get("model") or self.client.model}
+        )
+        return fingerprint, self.fingerprints.is_current(step, fingerprint)
+
+    def _run_graph(self, graph: StepGraph) -> None:
+        """
+        Run a step graph to completion from synchronous code
+
+        asyncio.run cannot be called while an event loop is running in this
+        thread (e.g. in a Jupyter notebook); the graph then runs on its own
+        loop in a worker thread and this call blocks until it is done.
+
+        Args:
+            graph: Step graph to run
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(graph.run())
+            return
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(lambda: asyncio.run(graph.run())).result()
+
+    def _model_for(self, phase_config: Dict[str, Any], prompt_key: str) -> Optional[str]:
+        """
+        Get the model for a prompt
+
+        Args:
+            phase_config: Phase configuration
+            prompt_key: Prompt template key
+
+        Returns:
+            Model name from phases.<phase>.models.<prompt_key> or
+            phases.<phase>.model, or None for the client's default model
+        """
+        return phase_config.get("models", {}).get(prompt_key) or phase_config.get("model")
+
+    def _models_in_use(self) -> List[str]:
+        """
+        Get every model the configured pipeline uses
+
+        Returns:
+            Distinct model names, primary model first
+        """
+        models = [self.client.model]
+        for phase_config in self.config.get("phases", {}).values():
+            for model_name in [phase_config.get("model"), *phase_config.get("models", {}).values()]:
+                if model_name and model_name not in models:
+                    models.append(model_name)
+        return models
+
     def run_phase0_context_extraction(self) -> str:
         """
         Phase 0: User context extraction
@@ -145,64 +483,24 @@ class Pipeline:
         phase_config = self.config.get("phases", {}).get("phase1_expansion", {})
         results = {}
 
-        # 1-3. Generate desire, ability, and role lists
-        list_definitions = [
-            ("desire_list", "01_desire_list"),
-            ("ability_list", "02_ability_list"),
-            ("role_list", "03_role_list"),
-        ]
-
-        for prompt_key, filename in list_definitions:
-            logger.info(f"Generating {prompt_key}...")
-            list_prompt = self.prompts.get(prompt_key, {})
-            if list_prompt:
-                prompt = format_prompt(
-                    list_prompt.get("user", ""),
-                    user_context=user_context
-                )
-                response = self.client.generate_json(
-                    prompt,
-                    temperature=phase_config.get("temperature", 0.8),
-                    max_tokens=phase_config.get("num_predict", 4096),
-                    system_prompt=list_prompt.get("system", None),
-                )
-                if response:
-                    results[prompt_key] = dict_to_yaml(response)
-                    save_yaml(response, f"{self.base_dir}/intermediate/{filename}.yaml")
-
-        # 4. Plot type list
-        logger.info("Generating plot type list...")
-        plottype_list_prompt = self.prompts.get("plottype_list", {})
-        if plottype_list_prompt:
-            prompt = plottype_list_prompt.get("user", "")
-            response = self.client.generate_json(
-                prompt,
-                temperature=phase_config.get("temperature", 0.8),
-                max_tokens=phase_config.get("num_predict", 4096),
-                system_prompt=plottype_list_prompt.get("system", None),
-            )
+        # 1-4. Generate desire, ability, role and plot type lists
+        for prompt_key, filename, reads_context in EXPANSION_LISTS:
+            variables = {"user_context": user_context} if reads_context else {}
+            response = self._expand(prompt_key, filename, phase_config, **variables)
             if response:
-                results["plottype_list"] = dict_to_yaml(response)
-                save_yaml(response, f"{self.base_dir}/intermediate/04_plottype_list.yaml")
+                results[prompt_key] = response
 
         # 5. Select plot type
-        logger.info("Selecting plot type...")
-        plottype_selection_prompt = self.prompts.get("plottype_selection", {})
-        if plottype_selection_prompt and "plottype_list" in results:
-            prompt = format_prompt(
-                plottype_selection_prompt.get("user", ""),
+        if "plottype_list" in results:
+            response = self._expand(
+                "plottype_selection",
+                "05_plottype",
+                phase_config,
                 user_context=user_context,
-                plottype_list=results["plottype_list"]
-            )
-            response = self.client.generate_json(
-                prompt,
-                temperature=phase_config.get("temperature", 0.8),
-                max_tokens=phase_config.get("num_predict", 4096),
-                system_prompt=plottype_selection_prompt.get("system", None),
+                plottype_list=results["plottype_list"],
             )
             if response:
-                results["plottype"] = dict_to_yaml(response)
-                save_yaml(response, f"{self.base_dir}/intermediate/05_plottype.yaml")
+                results["plottype"] = response
 
         # Save checkpoint
         self.checkpoint_manager.save_checkpoint("phase1_expansion", results)
@@ -210,6 +508,50 @@ class Pipeline:
         logger.info("✓ Phase 1 completed")
         return results
 
+    def _expand(self, prompt_key: str, filename: str, phase_config: Dict[str, Any], **variables) -> Optional[str]:
+        """
+        Generate one Phase 1 list (a single prompt call)
+
+        Args:
+            prompt_key: Prompt template key
+            filename: Intermediate file name (without extension)
+            phase_config: Phase 1 configuration
+            **variables: Template variables (a template without variables is sent as written)
+
+        Returns:
+            Generated list as YAML string, or None on failure
+        """
+        list_prompt = self.prompts.get(prompt_key, {})
+        if not list_prompt:
+            return None
+
+        if variables:
+            prompt = self._fit_prompt(list_prompt, phase_config.get("num_predict", 4096), **variables)
+        else:
+            prompt = list_prompt.get("user", "")
+
+        step = f"phase1.{prompt_key}"
+        path = f"{self.base_dir}/intermediate/{filename}.yaml"
+        options = dict(
+            temperature=phase_config.get("temperature", 0.8),
+            max_tokens=phase_config.get("num_predict", 4096),
+            system_prompt=list_prompt.get("system", None),
+            schema=list_prompt.get("schema"),
+            model=self._model_for(phase_config, prompt_key),
+        )
+        fingerprint, current = self._check_step(step, prompt, options)
+        if current:
+            return dict_to_yaml(load_yaml(path))
+
+        logger.info(f"Generating {prompt_key}...")
+        response = self.client.generate_json(prompt, use_cache=phase_config.get("cache", True), step=step, **options)
+        if not response:
+            return None
+
+        save_yaml(response, path)
+        self.fingerprints.record(step, fingerprint, [path])
+        return dict_to_yaml(response)
+
     def run_phase2_characters(self, user_context: str, phase1_results: Dict[str, str]) -> str:
         """
         Phase 2: Character generation
@@ -231,29 +573,48 @@ class Pipeline:
         ability_data = yaml_lib.safe_load(phase1_results.get("ability_list", "abilities: []"))
         role_data = yaml_lib.safe_load(phase1_results.get("role_list", "roles: []"))
 
-        desire_sample = random.sample(desire_data.get("desires", []), min(10, len(desire_data.get("desires", []))))
-        ability_sample = random.sample(ability_data.get("abilities", []), min(10, len(ability_data.get("abilities", []))))
-        role_sample = random.sample(role_data.get("roles", []), min(10, len(role_data.get("roles", []))))
+        # Incremental runs draw the same sample from the same lists, so the step can be skipped
+        sampler = random
+        if self.fingerprints.enabled:
+            sampler = random.Random(StepFingerprints.fingerprint(
+                seed=self.sample_seed, desire_data=desire_data, ability_data=ability_data, role_data=role_data
+            ))
+
+        desire_sample = sampler.sample(desire_data.get("desires", []), min(10, len(desire_data.get("desires", []))))
+        ability_sample = sampler.sample(ability_data.get("abilities", []), min(10, len(ability_data.get("abilities", []))))
+        role_sample = sampler.sample(role_data.get("roles", []), min(10, len(role_data.get("roles", []))))
 
         characters_prompt = self.prompts.get("characters", {})
         if characters_prompt:
-            prompt = format_prompt(
-                characters_prompt.get("user", ""),
+            prompt = self._fit_prompt(
+                characters_prompt,
+                phase_config.get("num_predict", 2048),
                 user_context=user_context,
                 plottype=phase1_results.get("plottype", ""),
                 desire_sample=str(desire_sample),
                 ability_sample=str(ability_sample),
                 role_sample=str(role_sample)
             )
-            response = self.client.generate_json(
-                prompt,
+            path = f"{self.base_dir}/intermediate/06_characters_list.yaml"
+            options = dict(
                 temperature=phase_config.get("temperature", 0.9),
                 max_tokens=phase_config.get("num_predict", 2048),
                 system_prompt=characters_prompt.get("system", None),
+                schema=characters_prompt.get("schema"),
+                model=self._model_for(phase_config, "characters"),
             )
+            fingerprint, current = self._check_step("phase2.characters", prompt, options)
+            if current:
+                response = load_yaml(path)
+            else:
+                response = self.client.generate_json(
+                    prompt, use_cache=phase_config.get("cache", True), step="phase2.characters", **options
+                )
+                if response:
+                    save_yaml(response, path)
+                    self.fingerprints.record("phase2.characters", fingerprint, [path])
             if response:
                 characters_yaml = dict_to_yaml(response)
-                save_yaml(response, f"{self.base_dir}/intermediate/06_characters_list.yaml")
                 self.checkpoint_manager.save_checkpoint("phase2_characters", {"characters_list": characters_yaml})
                 logger.info("✓ Phase 2 completed")
                 return characters_yaml
@@ -266,6 +627,10 @@ class Pipeline:
         Phase 3: World building
         Generate all world setting elements
 
+        Elements (and digests) run as a step graph: each starts as soon as
+        the elements it reads exist, up to phases.phase3_world.max_concurrency
+        at a time.
+
         Args:
             phase1_results: Results from Phase 1
 
@@ -277,55 +642,259 @@ class Pipeline:
         phase_config = self.config.get("phases", {}).get("phase3_world", {})
         world_data = {}
 
-        # List of world elements to generate (in order)
-        elements = [
-            ("events", {}),
-            ("observation", {"events": "events"}),
-            ("interpretation", {"events": "events", "observation": "observation"}),
-            ("media", {"events": "events", "observation": "observation", "interpretation": "interpretation"}),
-            ("important_past_events", {"events": "events", "observation": "observation", "interpretation": "interpretation", "media": "media"}),
-            ("social_structure", {"events": "events", "observation": "observation", "interpretation": "interpretation", "media": "media", "important_past_events": "important_past_events"}),
-            ("living_environment", {"social_structure": "social_structure"}),
-            ("social_groups", {"social_structure": "social_structure", "living_environment": "living_environment"}),
-            ("people_list", {"social_structure": "social_structure", "living_environment": "living_environment", "social_groups": "social_groups"}),
-            ("future_scenarios", {"events": "events", "observation": "observation", "interpretation": "interpretation", "media": "media", "important_past_events": "important_past_events", "social_structure": "social_structure", "living_environment": "living_environment", "social_groups": "social_groups", "people_list": "people_list"}),
-        ]
+        graph = StepGraph(max_concurrency=phase_config.get("max_concurrency") or self.async_client.max_parallel_requests)
+        self._add_world_steps(graph, phase1_results, world_data)
+        self._run_graph(graph)
+
+        world_data = self._finish_world(world_data)
+        logger.info("✓ Phase 3 completed")
+        return world_data
 
-        for i, (element_name, dependencies) in enumerate(elements, start=10):
-            logger.info(f"Generating {element_name}...")
+    async def run_phase3_world_building_async(self, phase1_results: Dict[str, str]) -> Dict[str, str]:
+        """
+        Phase 3 for callers inside an event loop (runs in a worker thread)
+
+        Args:
+            phase1_results: Results from Phase 1
 
-            element_prompt = self.prompts.get(element_name, {})
-            if not element_prompt:
-                logger.warning(f"No prompt found for {element_name}")
-                continue
+        Returns:
+            Dictionary of world settings
+        """
+        return await asyncio.to_thread(self.run_phase3_world_building, phase1_results)
 
-            # Build prompt with dependencies
-            prompt_vars = {"plottype": phase1_results.get("plottype", "")}
-            for dep_key, dep_value in dependencies.items():
-                prompt_vars[dep_key] = world_data.get(dep_value, "")
+    def _add_world_steps(
+        self,
+        graph: StepGraph,
+        phase1_results: Dict[str, str],
+        world_data: Dict[str, str],
+        after: Iterable[str] = (),
+        priority: int = 0,
+    ) -> List[str]:
+        """
+        Add the Phase 3 elements (and digests) to a step graph
 
-            prompt = format_prompt(element_prompt.get("user", ""), **prompt_vars)
+        Steps are named like their call metrics ("phase3.events",
+        "phase3.digest.events").
 
-            response = self.client.generate_json(
-                prompt,
-                temperature=phase_config.get("temperature", 0.7),
-                max_tokens=phase_config.get("num_predict", 4096),
-                system_prompt=element_prompt.get("system", None),
+        Args:
+            graph: Step graph
+            phase1_results: Results from Phase 1 (read when the steps run)
+            world_data: World settings, filled in by the steps
+            after: Steps every element waits for besides the elements it reads
+            priority: Slot priority of the steps
+
+        Returns:
+            Names of the added steps
+        """
+        phase_config = self.config.get("phases", {}).get("phase3_world", {})
+
+        # Opt-in: earlier elements are passed as short digests except where listed as verbatim
+        digest_config = phase_config.get("digests", {})
+        digests = {} if digest_config.get("enabled", False) else None
+        verbatim = digest_config.get("verbatim", {})
+
+        # A digest costs one call, so only summarize elements that several later elements read
+        readers = Counter(
+            dep
+            for element, deps in WORLD_ELEMENTS if self.prompts.get(element)
+            for dep in deps.values() if dep not in verbatim.get(element, [])
+        )
+        min_readers = digest_config.get("min_readers", 2)
+
+        steps = []
+        for i, (element_name, dependencies) in enumerate(WORLD_ELEMENTS, start=10):
+            # Dependency -> whether it is read as a digest
+            summarized = {
+                dep: (
+                    digests is not None and bool(self.prompts.get(element_name))
+                    and dep not in verbatim.get(element_name, []) and readers[dep] >= min_readers
+                )
+                for dep in dependencies.values()
+            }
+            for dep in summarized:
+                if summarized[dep] and f"phase3.digest.{dep}" not in steps:
+                    graph.add(
+                        f"phase3.digest.{dep}",
+                        partial(self._world_digest, dep, world_data, digests, phase_config),
+                        [f"phase3.{dep}"],
+                        priority=priority,
+                    )
+                    steps.append(f"phase3.digest.{dep}")
+
+            graph.add(
+                f"phase3.{element_name}",
+                partial(
+                    self._generate_world_element,
+                    i, element_name, dependencies, summarized, phase1_results, world_data, digests, phase_config,
+                ),
+                list(after) + [f"phase3.digest.{dep}" if summarized[dep] else f"phase3.{dep}" for dep in summarized],
+                priority=priority,
             )
+            steps.append(f"phase3.{element_name}")
+        return steps
 
-            if response:
-                world_data[element_name] = dict_to_yaml(response)
-                save_yaml(response, f"{self.base_dir}/intermediate/{i:02d}_{element_name}.yaml")
+    @staticmethod
+    def _ordered_world(world_data: Dict[str, str]) -> Dict[str, str]:
+        """
+        Get world settings in the serial element order
 
-        # Save checkpoint
-        self.checkpoint_manager.save_checkpoint("phase3_world", world_data)
-        logger.info("✓ Phase 3 completed")
-        return world_data
+        Later phases serialize world_data as a whole, so its order must not
+        depend on which element finished first.
+
+        Args:
+            world_data: World settings, in any order
+
+        Returns:
+            A copy of world_data in WORLD_ELEMENTS order
+        """
+        return {element: world_data[element] for element, _ in WORLD_ELEMENTS if element in world_data}
+
+    def _finish_world(self, world_data: Dict[str, str]) -> Dict[str, str]:
+        """
+        Save the Phase 3 checkpoint in the serial element order
+
+        world_data itself is left as is: in the full pipeline graph this
+        runs while Phase 4-6 steps may already be reading it.
+
+        Args:
+            world_data: World settings
+
+        Returns:
+            The saved, ordered copy of world_data
+        """
+        ordered = self._ordered_world(world_data)
+        self.checkpoint_manager.save_checkpoint("phase3_world", ordered)
+        return ordered
+
+    async def _generate_world_element(
+        self,
+        index: int,
+        element_name: str,
+        dependencies: Dict[str, str],
+        summarized: Dict[str, bool],
+        phase1_results: Dict[str, str],
+        world_data: Dict[str, str],
+        digests: Optional[Dict[str, str]],
+        phase_config: Dict[str, Any],
+    ) -> None:
+        """
+        Generate one world element (a Phase 3 step)
+
+        Args:
+            index: File number of the element ({index:02d}_{element}.yaml)
+            element_name: World element to generate
+            dependencies: Prompt variable -> element it reads
+            summarized: Element it reads -> whether its digest is used
+            phase1_results: Results from Phase 1
+            world_data: World settings generated so far (updated)
+            digests: Digests generated so far, or None if digests are off
+            phase_config: Phase 3 configuration
+        """
+        element_prompt = self.prompts.get(element_name, {})
+        if not element_prompt:
+            logger.warning(f"No prompt found for {element_name}")
+            return
+
+        logger.info(f"Generating {element_name}...")
+
+        # Build prompt with dependencies
+        prompt_vars = {"plottype": phase1_results.get("plottype", "")}
+        for dep_key, dep_value in dependencies.items():
+            source = digests if summarized[dep_value] else world_data
+            prompt_vars[dep_key] = source.get(dep_value, "")
+
+        prompt = await asyncio.to_thread(
+            self._fit_prompt, element_prompt, phase_config.get("num_predict", 4096), **prompt_vars
+        )
+
+        step = f"phase3.{element_name}"
+        path = f"{self.base_dir}/intermediate/{index:02d}_{element_name}.yaml"
+        options = dict(
+            temperature=phase_config.get("temperature", 0.7),
+            max_tokens=phase_config.get("num_predict", 4096),
+            system_prompt=element_prompt.get("system", None),
+            schema=element_prompt.get("schema"),
+            model=self._model_for(phase_config, element_name),
+        )
+        fingerprint, current = self._check_step(step, prompt, options)
+        if current:
+            world_data[element_name] = dict_to_yaml(load_yaml(path))
+            return
+
+        response = await self.async_client.generate_json(
+            prompt, use_cache=phase_config.get("cache", True), step=step, **options
+        )
+
+        if response:
+            world_data[element_name] = dict_to_yaml(response)
+            save_yaml(response, path)
+            self.fingerprints.record(step, fingerprint, [path])
+
+    async def _world_digest(
+        self,
+        element_name: str,
+        world_data: Dict[str, str],
+        digests: Dict[str, str],
+        phase_config: Dict[str, Any],
+    ) -> None:
+        """
+        Summarize a finished world element (a Phase 3 step)
+
+        Args:
+            element_name: World element to summarize
+            world_data: World settings generated so far
+            digests: Digests generated so far (updated with this element's
+                digest, or its full YAML if no shorter digest could be made)
+            phase_config: Phase 3 configuration
+        """
+        element_data = world_data.get(element_name, "")
+        digest_config = phase_config.get("digests", {})
+        digest_prompt = self.prompts.get("world_digest", {})
+        max_tokens = digest_config.get("num_predict", 1024)
+
+        step = f"phase3.digest.{element_name}"
+        path = f"{self.base_dir}/intermediate/digests/{element_name}.md"
+
+        digest = None
+        if element_data and digest_prompt:
+            prompt = await asyncio.to_thread(
+                self._fit_prompt, digest_prompt, max_tokens, element_name=element_name, element_data=element_data
+            )
+            options = dict(
+                temperature=digest_config.get("temperature", 0.3),
+                max_tokens=max_tokens,
+                system_prompt=digest_prompt.get("system", None),
+                model=self._model_for(phase_config, "world_digest"),
+            )
+            fingerprint, current = self._check_step(step, prompt, options)
+            if current:
+                # No saved digest means the last one was not shorter than the element
+                digests[element_name] = load_text(path) if os.path.exists(path) else element_data
+                return
+
+            logger.info(f"Summarizing {element_name}...")
+            digest = await self.async_client.generate_text(
+                prompt, use_cache=phase_config.get("cache", True), step=step, **options
+            )
+
+        # A digest is only worth using if it is actually shorter
+        if digest and self.token_counter.count(digest) < self.token_counter.count(element_data):
+            save_text(digest, path)
+            self.fingerprints.record(step, fingerprint, [path])
+        else:
+            if digest:
+                self.fingerprints.record(step, fingerprint, [])
+            digest = element_data
+        digests[element_name] = digest
 
     def run_full_pipeline(self, user_context: Optional[str] = None) -> Dict[str, Any]:
         """
         Run the complete pipeline
 
+        Phase 1-6 run as one step graph (see _build_pipeline_graph), so
+        steps of different phases overlap; the chain of steps that bounded
+        the run is logged and kept in self.critical_path.
+
         Args:
             user_context: Optional pre-extracted user context
 
@@ -342,35 +911,91 @@ class Pipeline:
             return {}
 
         results = {}
+        self.retry_budget.reset()
 
         # Phase 0: Context extraction
         if user_context is None:
             user_context = self.run_phase0_context_extraction()
         results["user_context"] = user_context
 
-        # Phase 1: 100x expansion
-        phase1_results = self.run_phase1_expansion(user_context)
-        results.update(phase1_results)
+        # Phase 1-6 as one graph of prompt calls, each started as soon as its inputs exist
+        state = {
+            "phase1": {},
+            "characters_list": "",
+            "world_data": {},
+            "plot_data": {},
+            "novels": {},
+            "references": {},
+        }
+        graph = self._build_pipeline_graph(user_context, state)
+        self._run_graph(graph)
+        self.critical_path = graph.critical_path()
+        self._log_critical_path(graph)
+
+        # The checkpoint steps saved ordered copies; the shared dicts are reordered only now that no step reads them
+        state["world_data"] = self._ordered_world(state["world_data"])
+        state["plot_data"] = self._ordered_plot(state["plot_data"])
+
+        results.update(state["phase1"])
+        results["characters_list"] = state["characters_list"]
+        results.update(state["world_data"])
+        results.update(state["plot_data"])
+        results["novels"] = state["novels"]
+        results["references"] = state["references"]
+
+        if self.fingerprints.enabled:
+            build_stats = self.fingerprints.stats()
+            logger.info(
+                f"Incremental build: {build_stats['rebuilt']} steps rebuilt, "
+                f"{build_stats['skipped']} skipped as up to date"
+            )
+
+        if self.rate_limiter is not None:
+            limiter_stats = self.rate_limiter.stats()
+            logger.info(
+                f"Rate limiter: {limiter_stats['delayed_requests']}/{limiter_stats['requests']} "
+                f"requests delayed, {limiter_stats['total_wait_seconds']:.1f}s total wait"
+            )
 
-        # Phase 2: Character generation
-        characters_list = self.run_phase2_characters(user_context, phase1_results)
-        results["characters_list"] = characters_list
+        if self.response_cache is not None:
+            cache_stats = self.response_cache.stats()
+            logger.info(
+                f"Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                f"{cache_stats['entries']} entries"
+            )
 
-        # Phase 3: World building
-        world_data = self.run_phase3_world_building(phase1_results)
-        results.update(world_data)
+        if self.hedging is not None:
+            hedge_stats = self.hedging.stats()
+            logger.info(
+                f"Hedging: {hedge_stats['hedged']}/{hedge_stats['calls']} calls hedged "
+                f"({hedge_stats['hedge_rate']:.1%}), {hedge_stats['hedge_wins']} hedges won "
+                f"({hedge_stats['win_rate']:.1%})"
+            )
 
-        # Phase 4: Plot generation
-        plot_data = self.run_phase4_plot_generation(user_context, phase1_results, characters_list, world_data)
-        results.update(plot_data)
+        if self.prompt_budgeter is not None:
+            budgeter_stats = self.prompt_budgeter.stats()
+            if budgeter_stats["fitted"]:
+                logger.info(
+                    f"Context window: {budgeter_stats['fitted']} prompts cut to fit, "
+                    f"{budgeter_stats['overflows']} still too long"
+                )
 
-        # Phase 5: Novel generation
-        novels = self.run_phase5_novel_generation(characters_list, plot_data)
-        results["novels"] = novels
+        if self.output_budget is not None:
+            budget_stats = self.output_budget.stats()
+            logger.info(
+                f"Output budgets: {budget_stats['budgeted']} calls sent with a learned num_predict "
+                f"({budget_stats['kinds']} steps), {budget_stats['retries']} retried after hitting it"
+            )
 
-        # Phase 6: Reference material generation
-        references = self.run_phase6_reference_generation(user_context, phase1_results, characters_list, world_data, plot_data)
-        results["references"] = references
+        if self.metrics is not None:
+            metrics_summary = self.metrics.summary()
+            logger.info(
+                f"LLM calls: {metrics_summary['calls']} ({metrics_summary['cached_calls']} cached, "
+                f"{metrics_summary['retries']} retries), "
+                f"load {metrics_summary['load_seconds']:.1f}s, "
+                f"prefill {metrics_summary['prefill_seconds']:.1f}s, "
+                f"decode {metrics_summary['decode_seconds']:.1f}s"
+            )
 
         logger.info("=" * 60)
         logger.info("Pipeline Execution Complete")
@@ -378,6 +1003,210 @@ class Pipeline:
 
         return results
 
+    async def run_full_pipeline_async(self, user_context: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Run the complete pipeline from inside an event loop (runs in a worker thread)
+
+        Args:
+            user_context: Optional pre-extracted user context
+
+        Returns:
+            Dictionary of all generated content
+        """
+        return await asyncio.to_thread(self.run_full_pipeline, user_context)
+
+    def _build_pipeline_graph(self, user_context: str, state: Dict[str, Any]) -> StepGraph:
+        """
+        Build Phase 1-6 as one step graph
+
+        Every step is a single prompt call (or packed request) named like its
+        call metrics, and waits only for the steps whose output its prompt
+        reads: plottype_list needs nothing, Phase 3 needs only the selected
+        plot type, Phase 6 list references only their Phase 1 list, and each
+        Phase 5 chapter only its own Phase 4 chain. A "phaseN.checkpoint"
+        step saves each phase's checkpoint once all of its steps finished.
+
+        Free slots go to ready steps by PHASE_PRIORITIES, so the Phase 4
+        chapter chains and Phase 5 form a streaming handoff: a chapter's
+        novel takes the next free slot once its references exist, and the
+        chains only use slots no waiting novel needs (at most
+        max_parallel_requests chapters are extracted ahead of Phase 5).
+
+        Args:
+            user_context: User context from Phase 0
+            state: Results, filled in by the steps: phase1, characters_list,
+                world_data, plot_data, novels and references
+
+        Returns:
+            Step graph running up to performance.max_parallel_requests steps at once
+        """
+        phases = self.config.get("phases", {})
+        graph = StepGraph(max_concurrency=self.async_client.max_parallel_requests)
+        phase1, world_data, plot_data = state["phase1"], state["world_data"], state["plot_data"]
+        novels, references = state["novels"], state["references"]
+        selection = "phase1.plottype_selection"
+
+        def in_thread(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Callable[[], Awaitable[Any]]:
+            return partial(asyncio.to_thread, func, *args, **kwargs)
+
+        # Phase 1
+        phase1_config = phases.get("phase1_expansion", {})
+
+        async def expand(prompt_key: str, filename: str, variables: Dict[str, str]) -> None:
+            response = await asyncio.to_thread(self._expand, prompt_key, filename, phase1_config, **variables)
+            if response:
+                phase1[prompt_key] = response
+
+        async def select_plottype() -> None:
+            if "plottype_list" not in phase1:
+                return
+            response = await asyncio.to_thread(
+                self._expand, "plottype_selection", "05_plottype", phase1_config,
+                user_context=user_context, plottype_list=phase1["plottype_list"],
+            )
+            if response:
+                phase1["plottype"] = response
+
+        phase1_steps = []
+        for prompt_key, filename, reads_context in EXPANSION_LISTS:
+            variables = {"user_context": user_context} if reads_context else {}
+            graph.add(f"phase1.{prompt_key}", partial(expand, prompt_key, filename, variables), priority=PHASE_PRIORITIES["phase1"])
+            phase1_steps.append(f"phase1.{prompt_key}")
+        graph.add(selection, select_plottype, ["phase1.plottype_list"], priority=PHASE_PRIORITIES["phase1"])
+        phase1_steps.append(selection)
+        graph.add(
+            "phase1.checkpoint",
+            in_thread(self.checkpoint_manager.save_checkpoint, "phase1_expansion", phase1),
+            phase1_steps,
+            priority=PHASE_PRIORITIES["phase1"],
+        )
+
+        # Phase 2
+        async def generate_characters() -> None:
+            state["characters_list"] = await asyncio.to_thread(self.run_phase2_characters, user_context, phase1)
+
+        graph.add(
+            "phase2.characters", generate_characters, phase1_steps[:3] + [selection], priority=PHASE_PRIORITIES["phase2"]
+        )
+
+        # Phase 3 (reads only the plot type); the checkpoint step saves the elements in serial order
+        phase3_steps = self._add_world_steps(
+            graph, phase1, world_data, after=[selection], priority=PHASE_PRIORITIES["phase3"]
+        )
+        graph.add(
+            "phase3.checkpoint", in_thread(self._finish_world, world_data), phase3_steps, priority=PHASE_PRIORITIES["phase3"]
+        )
+
+        # Phase 4
+        phase4_config = phases.get("phase4_plot", {})
+
+        async def generate_plot() -> None:
+            response = await asyncio.to_thread(
+                self._generate_plot, user_context, phase1, state["characters_list"], phase4_config
+            )
+            if response:
+                plot_data["plot"] = response
+
+        graph.add("phase4.plot", generate_plot, [selection, "phase2.characters"], priority=PHASE_PRIORITIES["phase4"])
+        phase4_steps = ["phase4.plot"]
+        chapter_ends = {}
+        packer = None
+        if phase4_config.get("packing", False):
+            packer = self._make_packer(phase4_config.get("pack_size", 10))
+            for prompt_key, _, _, _ in CHAPTER_STEPS:
+                name = f"phase4.{prompt_key}.packed"
+                world_dependency = ["phase3.checkpoint"] if prompt_key == "search_references" else []
+                graph.add(
+                    name,
+                    in_thread(self._process_packed_step, packer, prompt_key, phase4_config, plot_data, world_data),
+                    [phase4_steps[-1]] + world_dependency,
+                    priority=PHASE_PRIORITIES["phase4"],
+                )
+                phase4_steps.append(name)
+            chapter_ends = {n: phase4_steps[-1] for n in range(1, 11)}
+        else:
+            chains = self._add_chapter_steps(
+                graph,
+                phase4_config,
+                plot_data,
+                world_data,
+                after=["phase4.plot"],
+                world_after=["phase3.checkpoint"],
+                priority=PHASE_PRIORITIES["phase4"],
+            )
+            for chapter_num, chain in chains.items():
+                phase4_steps += chain
+                chapter_ends[chapter_num] = chain[-1]
+
+        graph.add(
+            "phase4.checkpoint",
+            in_thread(self._finish_plot, plot_data, packer),
+            phase4_steps,
+            priority=PHASE_PRIORITIES["phase4"],
+        )
+
+        # Phase 5: each chapter needs only its own plot and references
+        phase5_config = phases.get("phase5_novel", {})
+
+        async def write_chapter(chapter_num: int) -> None:
+            await self._write_chapter_step(chapter_num, state["characters_list"], plot_data, phase5_config, novels)
+
+        phase5_steps = []
+        for chapter_num in range(1, 11):
+            name = f"phase5.chapter_{chapter_num:02d}"
+            graph.add(
+                name,
+                partial(write_chapter, chapter_num),
+                ["phase2.characters", chapter_ends[chapter_num]],
+                priority=PHASE_PRIORITIES["phase5"],
+            )
+            phase5_steps.append(name)
+        graph.add(
+            "phase5.checkpoint", in_thread(self._finish_novels, novels), phase5_steps, priority=PHASE_PRIORITIES["phase5"]
+        )
+
+        # Phase 6: each reference waits only for its own source
+        phase6_steps = self._add_reference_steps(
+            graph,
+            user_context,
+            phase1,
+            lambda: state["characters_list"],
+            world_data,
+            plot_data,
+            references,
+            elements=[element for element, _ in WORLD_ELEMENTS if self.prompts.get(element)],
+            wait_for_sources=True,
+            priority=PHASE_PRIORITIES["phase6"],
+        )
+        graph.add(
+            "phase6.checkpoint",
+            in_thread(self._finish_references, references, phase6_steps),
+            phase6_steps,
+            priority=PHASE_PRIORITIES["phase6"],
+        )
+        return graph
+
+    def _log_critical_path(self, graph: StepGraph) -> None:
+        """
+        Log the chain of steps that bounded a graph run's wall time
+
+        Args:
+            graph: Step graph after run()
+        """
+        path = graph.critical_path()
+        if not path:
+            return
+
+        durations = {name: graph.timings[name][1] - graph.timings[name][0] for name in path}
+        total = graph.timings[path[-1]][1]
+        slowest = max(path, key=durations.get)
+        logger.info(
+            f"Critical path: {len(path)} steps, {total:.1f}s "
+            f"({total - sum(durations.values()):.1f}s waiting for a free slot), "
+            f"slowest step {slowest} ({durations[slowest]:.1f}s)"
+        )
+        logger.info("  " + " -> ".join(f"{name} {durations[name]:.1f}s" for name in path))
+
     def run_phase4_plot_generation(
         self,
         user_context: str,
@@ -389,6 +1218,10 @@ class Pipeline:
         Phase 4: Plot generation
         Generate 10-chapter plot and extract keywords/references
 
+        Unless packed, each chapter's extract -> keywords -> references
+        chain runs on its own, up to phases.phase4_plot.max_concurrency
+        chains' steps at a time; a failed step only stops its own chapter.
+
         Args:
             user_context: User context
             phase1_results: Phase 1 results
@@ -404,131 +1237,619 @@ class Pipeline:
         plot_data = {}
 
         # Generate main plot
-        logger.info("Generating main plot...")
-        plot_prompt = self.prompts.get("plot", {})
-        if plot_prompt:
-            prompt = format_prompt(
-                plot_prompt.get("user", ""),
-                user_context=user_context,
-                plottype=phase1_results.get("plottype", ""),
-                characters_list=characters_list
-            )
-            response = self.client.generate_json(
-                prompt,
-                temperature=phase_config.get("temperature", 0.8),
-                max_tokens=phase_config.get("num_predict", 3072),
-                system_prompt=plot_prompt.get("system", None),
-            )
-            if response:
-                plot_data["plot"] = dict_to_yaml(response)
-                save_yaml(response, f"{self.base_dir}/intermediate/20_plot.yaml")
+        plot = self._generate_plot(user_context, phase1_results, characters_list, phase_config)
+        if plot:
+            plot_data["plot"] = plot
 
         # Extract and process each chapter
         logger.info("Processing chapters...")
-        for chapter_num in tqdm(range(1, 11), desc="Chapters"):
-            # Extract chapter
-            extract_prompt = self.prompts.get("extract_chapter", {})
-            if extract_prompt and "plot" in plot_data:
-                prompt = format_prompt(
-                    extract_prompt.get("user", ""),
-                    plot=plot_data["plot"],
-                    chapter_number=chapter_num
-                )
-                chapter_response = self.client.generate_json(
-                    prompt,
-                    system_prompt=extract_prompt.get("system", None),
-                )
-                if chapter_response:
-                    plot_data[f"plot_{chapter_num}"] = dict_to_yaml(chapter_response)
-                    save_yaml(chapter_response, f"{self.base_dir}/intermediate/{20 + chapter_num}_plot_{chapter_num}.yaml")
-
-            # Extract keywords
-            keywords_prompt = self.prompts.get("extract_keywords", {})
-            if keywords_prompt and f"plot_{chapter_num}" in plot_data:
-                prompt = format_prompt(
-                    keywords_prompt.get("user", ""),
-                    chapter_plot=plot_data[f"plot_{chapter_num}"]
-                )
-                keywords_response = self.client.generate_json(
-                    prompt,
-                    system_prompt=keywords_prompt.get("system", None),
-                )
-                if keywords_response:
-                    plot_data[f"plot_keywords_{chapter_num}"] = dict_to_yaml(keywords_response)
-                    save_yaml(keywords_response, f"{self.base_dir}/intermediate/{30 + chapter_num}_plot_keywords_{chapter_num}.yaml")
-
-            # Search references
-            references_prompt = self.prompts.get("search_references", {})
-            if references_prompt and f"plot_keywords_{chapter_num}" in plot_data:
-                prompt = format_prompt(
-                    references_prompt.get("user", ""),
-                    keywords=plot_data[f"plot_keywords_{chapter_num}"],
-                    world_data=dict_to_yaml(world_data)[:2000]
-                )
-                references_response = self.client.generate_json(
-                    prompt,
-                    system_prompt=references_prompt.get("system", None),
-                )
-                if references_response:
-                    plot_data[f"plot_reference_{chapter_num}"] = dict_to_yaml(references_response)
-                    save_yaml(references_response, f"{self.base_dir}/intermediate/{40 + chapter_num}_plot_reference_{chapter_num}.yaml")
+        if phase_config.get("packing", False) and "plot" in plot_data:
+            self._process_chapters_packed(phase_config, plot_data, world_data)
+        else:
+            # The chapter chains are independent once the plot exists
+            graph = StepGraph(
+                max_concurrency=phase_config.get("max_concurrency") or self.async_client.max_parallel_requests
+            )
+            self._add_chapter_steps(graph, phase_config, plot_data, world_data)
+            self._run_graph(graph)
 
-        self.checkpoint_manager.save_checkpoint("phase4_plot", plot_data)
+        plot_data = self._finish_plot(plot_data)
         logger.info("✓ Phase 4 completed")
         return plot_data
 
-    def run_phase5_novel_generation(
+    async def run_phase4_plot_generation_async(
         self,
+        user_context: str,
+        phase1_results: Dict[str, str],
         characters_list: str,
-        plot_data: Dict[str, str]
+        world_data: Dict[str, str]
     ) -> Dict[str, str]:
         """
-        Phase 5: Novel generation
-        Generate novel text for all 10 chapters
+        Phase 4 for callers inside an event loop (runs in a worker thread)
 
         Args:
+            user_context: User context
+            phase1_results: Phase 1 results
             characters_list: Characters list
-            plot_data: Plot data from Phase 4
+            world_data: World building data
 
         Returns:
-            Dictionary of generated novels
+            Dictionary of plot data
         """
-        logger.info("=== Phase 5: Novel Generation ===")
+        return await asyncio.to_thread(
+            self.run_phase4_plot_generation, user_context, phase1_results, characters_list, world_data
+        )
 
-        phase_config = self.config.get("phases", {}).get("phase5_novel", {})
-        novels = {}
+    def _add_chapter_steps(
+        self,
+        graph: StepGraph,
+        phase_config: Dict[str, Any],
+        plot_data: Dict[str, str],
+        world_data: Dict[str, str],
+        after: Iterable[str] = (),
+        world_after: Iterable[str] = (),
+        priority: int = 0,
+    ) -> Dict[int, List[str]]:
+        """
+        Add one chain of Phase 4 steps per chapter to a step graph
 
-        story_prompt = self.prompts.get("story_chapter", {})
-        if not story_prompt:
-            logger.error("No story prompt found")
-            return novels
+        Each chapter runs extract_chapter -> extract_keywords ->
+        search_references on its own, so a chapter whose chain fails does
+        not hold up the others.
 
-        for chapter_num in tqdm(range(1, 11), desc="Generating novels"):
-            logger.info(f"Generating Chapter {chapter_num}...")
+        Args:
+            graph: Step graph
+            phase_config: Phase 4 configuration
+            plot_data: Plot data (read and filled in by the steps)
+            world_data: World building data
+            after: Steps that must finish before any chapter starts
+            world_after: Steps that must finish before search_references reads world_data
+            priority: Slot priority of the steps (ties go to earlier chapters)
 
-            prompt = format_prompt(
-                story_prompt.get("user", ""),
-                chapter_number=chapter_num,
-                characters_list=characters_list,
-                chapter_plot=plot_data.get(f"plot_{chapter_num}", ""),
-                chapter_references=plot_data.get(f"plot_reference_{chapter_num}", "")
-            )
+        Returns:
+            Chapter number -> names of its steps in chain order
+        """
+        chains = {}
+        for chapter_num in range(1, 11):
+            chain = []
+            for prompt_key, _, _, _ in CHAPTER_STEPS:
+                dependencies = chain[-1:] or list(after)
+                if prompt_key == "search_references":
+                    dependencies += list(world_after)
+                name = f"phase4.{prompt_key}.{chapter_num:02d}"
+                graph.add(
+                    name,
+                    partial(
+                        asyncio.to_thread,
+                        self._process_chapter_step, prompt_key, chapter_num, phase_config, plot_data, world_data,
+                    ),
+                    dependencies,
+                    priority=priority,
+                )
+                chain.append(name)
+            chains[chapter_num] = chain
+        return chains
 
-            response = self.client.generate_text(
-                prompt,
-                temperature=phase_config.get("temperature", 1.0),
-                max_tokens=phase_config.get("num_predict", 4096),
-                system_prompt=story_prompt.get("system", "")
-            )
+    @staticmethod
+    def _ordered_plot(plot_data: Dict[str, str]) -> Dict[str, str]:
+        """
+        Get plot data in the serial key order
+
+        Concurrent chapter chains finish in any order; the ordered copy is
+        the same as a chapter-by-chapter run's.
+
+        Args:
+            plot_data: Plot data, in any order
+
+        Returns:
+            A copy of plot_data: the plot, then each chapter's keys
+        """
+        order = ["plot"] + [f"{prefix}_{n}" for n in range(1, 11) for _, _, prefix, _ in CHAPTER_STEPS]
+        return {key: plot_data[key] for key in order if key in plot_data}
+
+    def _finish_plot(self, plot_data: Dict[str, str], packer: Optional[PromptPacker] = None) -> Dict[str, str]:
+        """
+        Save the Phase 4 checkpoint in the serial key order
+
+        plot_data itself is left as is: in the full pipeline graph this runs
+        while Phase 5 and Phase 6 steps may still be reading it.
+
+        Args:
+            plot_data: Plot data
+            packer: Prompt packer whose stats to log, if the chapters were packed
+
+        Returns:
+            The saved, ordered copy of plot_data
+        """
+        ordered = self._ordered_plot(plot_data)
+        if packer is not None:
+            self._log_packing(packer)
+        self.checkpoint_manager.save_checkpoint("phase4_plot", ordered)
+        return ordered
+
+    def _generate_plot(
+        self,
+        user_context: str,
+        phase1_results: Dict[str, str],
+        characters_list: str,
+        phase_config: Dict[str, Any],
+    ) -> Optional[str]:
+        """
+        Generate the main plot (a single prompt call)
+
+        Args:
+            user_context: User context
+            phase1_results: Phase 1 results
+            characters_list: Characters list
+            phase_config: Phase 4 configuration
+
+        Returns:
+            Plot as YAML string, or None on failure
+        """
+        plot_prompt = self.prompts.get("plot", {})
+        if not plot_prompt:
+            return None
+
+        logger.info("Generating main plot...")
+        prompt = self._fit_prompt(
+            plot_prompt,
+            phase_config.get("num_predict", 3072),
+            user_context=user_context,
+            plottype=phase1_results.get("plottype", ""),
+            characters_list=characters_list
+        )
+        path = f"{self.base_dir}/intermediate/20_plot.yaml"
+        options = dict(
+            temperature=phase_config.get("temperature", 0.8),
+            max_tokens=phase_config.get("num_predict", 3072),
+            system_prompt=plot_prompt.get("system", None),
+            schema=plot_prompt.get("schema"),
+            model=self._model_for(phase_config, "plot"),
+        )
+        fingerprint, current = self._check_step("phase4.plot", prompt, options)
+        if current:
+            return dict_to_yaml(load_yaml(path))
+
+        response = self.client.generate_json(
+            prompt, use_cache=phase_config.get("cache", True), step="phase4.plot", **options
+        )
+        if not response:
+            return None
+
+        save_yaml(response, path)
+        self.fingerprints.record("phase4.plot", fingerprint, [path])
+        return dict_to_yaml(response)
+
+    def _chapter_variables(
+        self,
+        prompt_key: str,
+        chapter_num: int,
+        plot_data: Dict[str, str],
+        world_data: Dict[str, str],
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Get the template variables of a per-chapter Phase 4 step
+
+        Args:
+            prompt_key: Prompt key of the step (see CHAPTER_STEPS)
+            chapter_num: Chapter number
+            plot_data: Plot data
+            world_data: World building data
+
+        Returns:
+            Variables shared by every chapter, and the chapter's own variables
+        """
+        if prompt_key == "extract_chapter":
+            return {"plot": plot_data["plot"]}, {"chapter_number": chapter_num}
+        if prompt_key == "extract_keywords":
+            return {}, {"chapter_plot": plot_data[f"plot_{chapter_num}"]}
+        world_yaml = dict_to_yaml(self._ordered_world(world_data))[:2000]
+        return {"world_data": world_yaml}, {"keywords": plot_data[f"plot_keywords_{chapter_num}"]}
+
+    def _process_chapter_step(
+        self,
+        prompt_key: str,
+        chapter_num: int,
+        phase_config: Dict[str, Any],
+        plot_data: Dict[str, str],
+        world_data: Dict[str, str],
+    ) -> None:
+        """
+        Run one per-chapter Phase 4 step (a single prompt call)
+
+        The step is skipped if its input (the plot, or the chapter's output
+        of the previous step) is missing.
+
+        Args:
+            prompt_key: Prompt key of the step (see CHAPTER_STEPS)
+            chapter_num: Chapter number
+            phase_config: Phase 4 configuration
+            plot_data: Plot data, updated with the step's output
+            world_data: World building data
+        """
+        source, prefix, offset = next(step[1:] for step in CHAPTER_STEPS if step[0] == prompt_key)
+        stage_prompt = self.prompts.get(prompt_key, {})
+        if not stage_prompt or (f"{source}_{chapter_num}" if source else "plot") not in plot_data:
+            return
+
+        shared, variables = self._chapter_variables(prompt_key, chapter_num, plot_data, world_data)
+        prompt = self._fit_prompt(stage_prompt, **shared, **variables)
+        schema = stage_prompt.get("schema")
+        if schema is None and prompt_key == "extract_chapter":
+            schema = chapter_extract_schema(chapter_num)
+
+        step = f"phase4.{prompt_key}.{chapter_num:02d}"
+        path = f"{self.base_dir}/intermediate/{offset + chapter_num}_{prefix}_{chapter_num}.yaml"
+        options = dict(
+            system_prompt=stage_prompt.get("system", None),
+            schema=schema,
+            model=self._model_for(phase_config, prompt_key),
+        )
+        fingerprint, current = self._check_step(step, prompt, options)
+        if current:
+            plot_data[f"{prefix}_{chapter_num}"] = dict_to_yaml(load_yaml(path))
+            return
+
+        response = self.client.generate_json(
+            prompt,
+            use_cache=phase_config.get("cache", True),
+            hedge=prompt_key in self.hedge_prompts,
+            step=step,
+            **options,
+        )
+        if response:
+            plot_data[f"{prefix}_{chapter_num}"] = dict_to_yaml(response)
+            save_yaml(response, path)
+            self.fingerprints.record(step, fingerprint, [path])
+
+    def _process_chapters_packed(
+        self,
+        phase_config: Dict[str, Any],
+        plot_data: Dict[str, str],
+        world_data: Dict[str, str],
+    ) -> None:
+        """
+        Extract chapters, keywords and references with packed prompts
+
+        Each step is sent for all chapters at once (phases.phase4_plot.pack_size
+        per request), so the plot and world data are prefilled once per pack
+        instead of once per chapter. Slots that fail are sent separately.
+
+        Args:
+            phase_config: Phase 4 configuration
+            plot_data: Plot data, updated with plot_<n>, plot_keywords_<n>
+                and plot_reference_<n>
+            world_data: World building data
+        """
+        packer = self._make_packer(phase_config.get("pack_size", 10))
+        for prompt_key, _, _, _ in CHAPTER_STEPS:
+            self._process_packed_step(packer, prompt_key, phase_config, plot_data, world_data)
+        self._log_packing(packer)
+
+    def _process_packed_step(
+        self,
+        packer: PromptPacker,
+        prompt_key: str,
+        phase_config: Dict[str, Any],
+        plot_data: Dict[str, str],
+        world_data: Dict[str, str],
+    ) -> None:
+        """
+        Run one Phase 4 step for every ready chapter as packed prompts
 
+        Args:
+            packer: Prompt packer
+            prompt_key: Prompt key of the step (see CHAPTER_STEPS)
+            phase_config: Phase 4 configuration
+            plot_data: Plot data, updated with the step's output
+            world_data: World building data
+        """
+        source, prefix, offset = next(step[1:] for step in CHAPTER_STEPS if step[0] == prompt_key)
+        stage_prompt = self.prompts.get(prompt_key, {})
+        if source is None:
+            ready = list(range(1, 11)) if "plot" in plot_data else []
+        else:
+            ready = [n for n in range(1, 11) if f"{source}_{n}" in plot_data]
+        if not stage_prompt or not ready:
+            return
+
+        shared = self._chapter_variables(prompt_key, ready[0], plot_data, world_data)[0]
+        items = {f"{n:02d}": self._chapter_variables(prompt_key, n, plot_data, world_data)[1] for n in ready}
+
+        step = f"phase4.{prompt_key}.packed"
+        paths = {n: f"{self.base_dir}/intermediate/{offset + n}_{prefix}_{n}.yaml" for n in ready}
+        options = dict(
+            system_prompt=stage_prompt.get("system", None),
+            schema=stage_prompt.get("schema"),
+            item_schemas=(
+                {f"{n:02d}": chapter_extract_schema(n) for n in ready}
+                if prompt_key == "extract_chapter" else None
+            ),
+            model=self._model_for(phase_config, prompt_key),
+        )
+        # The packed step is fingerprinted as a whole: its packs depend on the pack size and context window
+        fingerprint, current = self._check_step(
+            step,
+            StepFingerprints.fingerprint(template=stage_prompt.get("user", ""), items=items, shared=shared),
+            {**options, "pack_size": packer.pack_size, "context_length": packer.context_length},
+        )
+        if current:
+            for n in ready:
+                plot_data[f"{prefix}_{n}"] = dict_to_yaml(load_yaml(paths[n]))
+            return
+
+        logger.info(f"Packing {prompt_key} for {len(ready)} chapters...")
+        responses = packer.generate_json(
+            stage_prompt.get("user", ""),
+            items,
+            shared=shared,
+            use_cache=phase_config.get("cache", True),
+            hedge=prompt_key in self.hedge_prompts,
+            step=f"phase4.{prompt_key}",
+            **options,
+        )
+
+        for n in ready:
+            response = responses.get(f"{n:02d}")
             if response:
-                novels[f"story_{chapter_num}"] = response
-                save_text(response, f"{self.base_dir}/novels/chapter_{chapter_num:02d}.txt")
+                plot_data[f"{prefix}_{n}"] = dict_to_yaml(response)
+                save_yaml(response, paths[n])
+        if all(responses.get(f"{n:02d}") for n in ready):
+            self.fingerprints.record(step, fingerprint, paths.values())
 
-        self.checkpoint_manager.save_checkpoint("phase5_novels", novels)
+    def _make_packer(self, pack_size: int) -> PromptPacker:
+        """
+        Create a prompt packer sized to the client's context window
+
+        Args:
+            pack_size: Maximum requests combined into one prompt
+
+        Returns:
+            Prompt packer sending through self.client
+        """
+        return PromptPacker(
+            self.client, pack_size=pack_size, budgeter=self.prompt_budgeter, context_length=self.client.context_length
+        )
+
+    def _log_packing(self, packer: PromptPacker) -> None:
+        """
+        Log how many Phase 4 answers came from packed requests
+
+        Args:
+            packer: Prompt packer used for the phase
+        """
+        packing_stats = packer.stats()
+        logger.info(
+            f"Packing: {packing_stats['packed_slots']} answers from {packing_stats['packed_requests']} "
+            f"packed requests, {packing_stats['fallbacks']} sent separately"
+        )
+
+    def run_phase5_novel_generation(
+        self,
+        characters_list: str,
+        plot_data: Dict[str, str]
+    ) -> Dict[str, str]:
+        """
+        Phase 5: Novel generation
+        Generate novel text for all 10 chapters
+
+        Chapters are generated concurrently, up to
+        phases.phase5_novel.max_concurrency at a time, and each is written
+        to novels/chapter_NN.txt by rename once complete.
+
+        Args:
+            characters_list: Characters list
+            plot_data: Plot data from Phase 4
+
+        Returns:
+            Dictionary of generated novels
+        """
+        logger.info("=== Phase 5: Novel Generation ===")
+
+        phase_config = self.config.get("phases", {}).get("phase5_novel", {})
+        novels = {}
+
+        if not self.prompts.get("story_chapter"):
+            logger.error("No story prompt found")
+            return novels
+
+        # Chapters read only the characters and their own plot, so they are independent
+        graph = StepGraph(max_concurrency=phase_config.get("max_concurrency") or self.async_client.max_parallel_requests)
+        with tqdm(total=10, desc="Generating novels") as progress:
+            for chapter_num in range(1, 11):
+                graph.add(
+                    f"phase5.chapter_{chapter_num:02d}",
+                    partial(self._write_chapter_step, chapter_num, characters_list, plot_data, phase_config, novels, progress),
+                )
+            self._run_graph(graph)
+
+        self._finish_novels(novels)
         logger.info("✓ Phase 5 completed")
         return novels
 
+    async def run_phase5_novel_generation_async(
+        self,
+        characters_list: str,
+        plot_data: Dict[str, str]
+    ) -> Dict[str, str]:
+        """
+        Phase 5 for callers inside an event loop (runs in a worker thread)
+
+        Args:
+            characters_list: Characters list
+            plot_data: Plot data from Phase 4
+
+        Returns:
+            Dictionary of generated novels
+        """
+        return await asyncio.to_thread(self.run_phase5_novel_generation, characters_list, plot_data)
+
+    async def _write_chapter_step(
+        self,
+        chapter_num: int,
+        characters_list: str,
+        plot_data: Dict[str, str],
+        phase_config: Dict[str, Any],
+        novels: Dict[str, str],
+        progress: Optional[tqdm] = None,
+    ) -> None:
+        """
+        Generate one novel chapter (a Phase 5 step)
+
+        Args:
+            chapter_num: Chapter number
+            characters_list: Characters list
+            plot_data: Plot data from Phase 4
+            phase_config: Phase 5 configuration
+            novels: Generated chapters (updated)
+            progress: Optional progress bar advanced when the chapter is done
+        """
+        response = await asyncio.to_thread(self._write_chapter, chapter_num, characters_list, plot_data, phase_config)
+        if response:
+            novels[f"story_{chapter_num}"] = response
+        if progress is not None:
+            progress.update(1)
+        logger.info(
+            f"Chapter {chapter_num} {'done' if response else 'failed'} "
+            f"({len(novels)} of 10 chapters written)"
+        )
+
+    def _finish_novels(self, novels: Dict[str, str]) -> None:
+        """
+        Put the chapters in order and save the Phase 5 checkpoint
+
+        Args:
+            novels: Generated chapters (reordered in place)
+        """
+        ordered = {f"story_{n}": novels[f"story_{n}"] for n in range(1, 11) if f"story_{n}" in novels}
+        novels.clear()
+        novels.update(ordered)
+        self.checkpoint_manager.save_checkpoint("phase5_novels", novels)
+
+    def _write_chapter(
+        self,
+        chapter_num: int,
+        characters_list: str,
+        plot_data: Dict[str, str],
+        phase_config: Dict[str, Any],
+    ) -> Optional[str]:
+        """
+        Generate one novel chapter and save it (a single prompt call)
+
+        Args:
+            chapter_num: Chapter number
+            characters_list: Characters list
+            plot_data: Plot data from Phase 4
+            phase_config: Phase 5 configuration
+
+        Returns:
+            Chapter text, or None on failure
+        """
+        story_prompt = self.prompts.get("story_chapter", {})
+        if not story_prompt:
+            return None
+
+        logger.info(f"Generating Chapter {chapter_num}...")
+        streaming = phase_config.get("streaming", False) or self.config.get(
+            "features", {}
+        ).get("streaming_output", False)
+
+        prompt = self._fit_prompt(
+            story_prompt,
+            phase_config.get("num_predict", 4096),
+            chapter_number=chapter_num,
+            characters_list=characters_list,
+            chapter_plot=plot_data.get(f"plot_{chapter_num}", ""),
+            chapter_references=plot_data.get(f"plot_reference_{chapter_num}", "")
+        )
+        filepath = f"{self.base_dir}/novels/chapter_{chapter_num:02d}.txt"
+        step = f"phase5.chapter_{chapter_num:02d}"
+        options = dict(
+            temperature=phase_config.get("temperature", 1.0),
+            max_tokens=phase_config.get("num_predict", 4096),
+            system_prompt=story_prompt.get("system", ""),
+            model=self._model_for(phase_config, "story_chapter"),
+        )
+        fingerprint, current = self._check_step(step, prompt, options)
+        if current:
+            return load_text(filepath)
+
+        if streaming:
+            response = self._stream_text_to_file(prompt, filepath, step=step, **options)
+        else:
+            response = self.client.generate_text(
+                prompt, use_cache=phase_config.get("cache", True), step=step, **options
+            )
+            if response:
+                save_text(response, filepath)
+        if response:
+            self.fingerprints.record(step, fingerprint, [filepath])
+        return response
+
+    def _stream_text_to_file(
+        self,
+        prompt: str,
+        filepath: str,
+        temperature: float = 1.0,
+        max_tokens: int = 4096,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        step: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Stream generated text to disk as it arrives
+
+        Chunks are appended to "<filepath>.part", which is renamed to
+        filepath once the stream completes. An interrupted stream leaves
+        the partial file in place for inspection.
+
+        Args:
+            prompt: Input prompt
+            filepath: Output file path
+            temperature: Generation temperature
+            max_tokens: Maximum tokens to generate
+            system_prompt: Optional system prompt
+            model: Optional model override
+            step: Pipeline step name recorded with the call metrics
+
+        Returns:
+            Generated text, or None on failure
+        """
+        output_path = Path(filepath)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = output_path.with_name(output_path.name + ".part")
+
+        stats: Dict[str, Any] = {}
+        with open(partial_path, "w", encoding="utf-8") as f:
+            def write_chunk(chunk: str) -> None:
+                f.write(chunk)
+                f.flush()
+
+            response = self.client.generate_text(
+                prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_prompt=system_prompt,
+                model=model,
+                stream=True,
+                on_chunk=write_chunk,
+                stats=stats,
+                step=step,
+            )
+
+        if response is None:
+            logger.error(f"Streaming failed, partial output kept at {partial_path}")
+            return None
+
+        os.replace(partial_path, output_path)
+        ttft = stats.get("time_to_first_token")
+        if ttft is not None:
+            logger.info(
+                f"Saved text to {filepath} "
+                f"(first token {ttft:.2f}s, total {stats.get('total_time', 0):.2f}s)"
+            )
+        return response
+
     def run_phase6_reference_generation(
         self,
         user_context: str,
@@ -541,6 +1862,10 @@ class Pipeline:
         Phase 6: Reference material generation
         Generate detailed reference materials
 
+        The references are independent and run concurrently, up to
+        phases.phase6_references.max_concurrency at a time; each file is
+        written as soon as its reference is complete.
+
         Args:
             user_context: User context
             phase1_results: Phase 1 results
@@ -556,46 +1881,315 @@ class Pipeline:
         phase_config = self.config.get("phases", {}).get("phase6_references", {})
         references = {}
 
-        # List of references to generate
-        reference_types = [
-            ("reference_characters", "characters.md", {"characters_list": characters_list}),
-            ("reference_plot", "plot.md", {"plot": plot_data.get("plot", "")}),
-            ("reference_user_context", "user_context.md", {"user_context": user_context}),
-            ("reference_desire_list", "desire_list.md", {"desire_list": phase1_results.get("desire_list", "")}),
-            ("reference_ability_list", "ability_list.md", {"ability_list": phase1_results.get("ability_list", "")}),
-            ("reference_role_list", "role_list.md", {"role_list": phase1_results.get("role_list", "")}),
-            ("reference_plottype_list", "plottype_list.md", {"plottype_list": phase1_results.get("plottype_list", ""), "plottype": phase1_results.get("plottype", "")}),
-        ]
-
-        # Add world elements
-        for element_name in world_data.keys():
-            reference_types.append(
-                ("reference_world_element", f"{element_name}.md", {"element_name": element_name, "element_data": world_data[element_name]})
+        # Independent calls: each is saved as soon as it finishes
+        graph = StepGraph(max_concurrency=phase_config.get("max_concurrency") or self.async_client.max_parallel_requests)
+        with tqdm(total=0, desc="Generating references") as progress:
+            steps = self._add_reference_steps(
+                graph,
+                user_context,
+                phase1_results,
+                lambda: characters_list,
+                world_data,
+                plot_data,
+                references,
+                elements=list(world_data),
+                progress=progress,
             )
+            progress.total = len(steps)
+            progress.refresh()
+            self._run_graph(graph)
 
-        for prompt_name, filename, prompt_vars in tqdm(reference_types, desc="Generating references"):
-            logger.info(f"Generating {filename}...")
+        self._finish_references(references, steps)
+        logger.info("✓ Phase 6 completed")
+        return references
 
-            ref_prompt = self.prompts.get(prompt_name, {})
-            if not ref_prompt:
-                logger.warning(f"No prompt found for {prompt_name}")
-                continue
+    async def run_phase6_reference_generation_async(
+        self,
+        user_context: str,
+        phase1_results: Dict[str, str],
+        characters_list: str,
+        world_data: Dict[str, str],
+        plot_data: Dict[str, str]
+    ) -> Dict[str, str]:
+        """
+        Phase 6 for callers inside an event loop (runs in a worker thread)
 
-            prompt = format_prompt(ref_prompt.get("user", ""), **prompt_vars)
+        Args:
+            user_context: User context
+            phase1_results: Phase 1 results
+            characters_list: Characters list
+            world_data: World building data
+            plot_data: Plot data
 
-            response = self.client.generate_text(
-                prompt,
-                temperature=phase_config.get("temperature", 0.7),
-                max_tokens=phase_config.get("num_predict", 4096),
-                system_prompt=ref_prompt.get("system", "")
-            )
+        Returns:
+            Dictionary of generated references
+        """
+        return await asyncio.to_thread(
+            self.run_phase6_reference_generation,
+            user_context, phase1_results, characters_list, world_data, plot_data,
+        )
 
+    def _add_reference_steps(
+        self,
+        graph: StepGraph,
+        user_context: str,
+        phase1_results: Dict[str, str],
+        characters_list: Callable[[], str],
+        world_data: Dict[str, str],
+        plot_data: Dict[str, str],
+        references: Dict[str, str],
+        elements: Iterable[str],
+        wait_for_sources: bool = False,
+        progress: Optional[tqdm] = None,
+        priority: int = 0,
+    ) -> List[str]:
+        """
+        Add the Phase 6 references to a step graph
+
+        Each reference is one step ("phase6.<file name>", or "phase6.packed"
+        for packed world element references) that saves its file as soon as
+        it finishes. Steps are added grouped by model, so a multi-model run
+        swaps models as little as possible.
+
+        Args:
+            graph: Step graph
+            user_context: User context
+            phase1_results: Phase 1 results (read when the steps run)
+            characters_list: Returns the characters list
+            world_data: World building data (read when the steps run)
+            plot_data: Plot data (read when the steps run)
+            references: Generated references (updated)
+            elements: World elements to write references for (skipped if
+                missing from world_data when the step runs)
+            wait_for_sources: Make each step wait for the full-pipeline steps
+                producing its sources
+            progress: Optional progress bar advanced per finished step
+            priority: Slot priority of the steps
+
+        Returns:
+            Names of the added steps
+        """
+        phase_config = self.config.get("phases", {}).get("phase6_references", {})
+        packing = phase_config.get("packing", False)
+
+        def done() -> None:
+            if progress is not None:
+                progress.update(1)
+
+        async def write_reference(prompt_name: str, filename: str, variables: Dict[str, Callable[[], str]]) -> None:
+            prompt_vars = {key: source() for key, source in variables.items()}
+            response = await asyncio.to_thread(self._generate_reference, prompt_name, filename, prompt_vars, phase_config)
             if response:
                 references[filename] = response
-                save_text(response, f"{self.base_dir}/references/{filename}")
+            done()
+
+        async def write_element_reference(element_name: str) -> None:
+            if element_name not in world_data:
+                done()
+                return
+            await write_reference(
+                "reference_world_element",
+                f"{element_name}.md",
+                {"element_name": lambda: element_name, "element_data": lambda: world_data[element_name]},
+            )
+
+        async def write_packed_references() -> None:
+            world_elements = {
+                f"{element_name}.md": {"element_name": element_name, "element_data": element_data}
+                for element_name, element_data in self._ordered_world(world_data).items()
+            }
+            if world_elements:
+                references.update(
+                    await asyncio.to_thread(self._generate_packed_references, world_elements, phase_config)
+                )
+            done()
 
+        reference_steps = [
+            (f"phase6.{filename}", partial(write_reference, prompt_name, filename, variables), prompt_name, dependencies)
+            for prompt_name, filename, variables, dependencies in self._reference_sources(
+                user_context, phase1_results, characters_list, plot_data
+            )
+        ]
+        if not packing:
+            reference_steps += [
+                (
+                    f"phase6.{element_name}.md",
+                    partial(write_element_reference, element_name),
+                    "reference_world_element",
+                    [f"phase3.{element_name}"],
+                )
+                for element_name in elements
+            ]
+
+        steps = []
+        for name, func, prompt_name, dependencies in self.client.order_by_model(
+            reference_steps, lambda step: self._model_for(phase_config, step[2])
+        ):
+            graph.add(name, func, dependencies if wait_for_sources else [], priority=priority)
+            steps.append(name)
+        if packing:
+            graph.add(
+                "phase6.packed",
+                write_packed_references,
+                ["phase3.checkpoint"] if wait_for_sources else [],
+                priority=priority,
+            )
+            steps.append("phase6.packed")
+        return steps
+
+    def _finish_references(self, references: Dict[str, str], steps: List[str]) -> None:
+        """
+        Put the references in step order and save the Phase 6 checkpoint
+
+        Args:
+            references: Generated references (reordered in place)
+            steps: Names of the Phase 6 steps, as returned by _add_reference_steps
+        """
+        order = [name[len("phase6."):] for name in steps if name != "phase6.packed"]
+        ordered = {filename: references[filename] for filename in order if filename in references}
+        ordered.update((filename, text) for filename, text in references.items() if filename not in ordered)
+        references.clear()
+        references.update(ordered)
         self.checkpoint_manager.save_checkpoint("phase6_references", references)
-        logger.info("✓ Phase 6 completed")
+
+    def _reference_sources(
+        self,
+        user_context: str,
+        phase1_results: Dict[str, str],
+        characters_list: Callable[[], str],
+        plot_data: Dict[str, str],
+    ) -> List[Tuple[str, str, Dict[str, Callable[[], str]], List[str]]]:
+        """
+        Get the fixed Phase 6 references
+
+        Variables are read through callables so a step graph can build the
+        list before their sources have been generated.
+
+        Args:
+            user_context: User context
+            phase1_results: Phase 1 results
+            characters_list: Returns the characters list
+            plot_data: Plot data
+
+        Returns:
+            (prompt key, file name, variable -> source, steps producing the
+            sources) per reference
+        """
+        def phase1(key: str) -> Callable[[], str]:
+            return lambda: phase1_results.get(key, "")
+
+        return [
+            ("reference_characters", "characters.md", {"characters_list": characters_list}, ["phase2.characters"]),
+            ("reference_plot", "plot.md", {"plot": lambda: plot_data.get("plot", "")}, ["phase4.plot"]),
+            ("reference_user_context", "user_context.md", {"user_context": lambda: user_context}, []),
+            ("reference_desire_list", "desire_list.md", {"desire_list": phase1("desire_list")}, ["phase1.desire_list"]),
+            ("reference_ability_list", "ability_list.md", {"ability_list": phase1("ability_list")}, ["phase1.ability_list"]),
+            ("reference_role_list", "role_list.md", {"role_list": phase1("role_list")}, ["phase1.role_list"]),
+            (
+                "reference_plottype_list",
+                "plottype_list.md",
+                {"plottype_list": phase1("plottype_list"), "plottype": phase1("plottype")},
+                ["phase1.plottype_list", "phase1.plottype_selection"],
+            ),
+        ]
+
+    def _generate_reference(
+        self,
+        prompt_name: str,
+        filename: str,
+        prompt_vars: Dict[str, Any],
+        phase_config: Dict[str, Any],
+    ) -> Optional[str]:
+        """
+        Generate one reference document and save it (a single prompt call)
+
+        Args:
+            prompt_name: Prompt template key
+            filename: File name under references/
+            prompt_vars: Template variables
+            phase_config: Phase 6 configuration
+
+        Returns:
+            Markdown text, or None on failure
+        """
+        ref_prompt = self.prompts.get(prompt_name, {})
+        if not ref_prompt:
+            logger.warning(f"No prompt found for {prompt_name}")
+            return None
+
+        prompt = self._fit_prompt(ref_prompt, phase_config.get("num_predict", 4096), **prompt_vars)
+        step = f"phase6.{filename}"
+        path = f"{self.base_dir}/references/{filename}"
+        options = dict(
+            temperature=phase_config.get("temperature", 0.7),
+            max_tokens=phase_config.get("num_predict", 4096),
+            system_prompt=ref_prompt.get("system", ""),
+            model=self._model_for(phase_config, prompt_name),
+        )
+        fingerprint, current = self._check_step(step, prompt, options)
+        if current:
+            return load_text(path)
+
+        logger.info(f"Generating {filename}...")
+        response = self.client.generate_text(
+            prompt, use_cache=phase_config.get("cache", True), step=step, **options
+        )
+        if response:
+            save_text(response, path)
+            self.fingerprints.record(step, fingerprint, [path])
+        return response
+
+    def _generate_packed_references(
+        self,
+        world_elements: Dict[str, Dict[str, str]],
+        phase_config: Dict[str, Any],
+    ) -> Dict[str, str]:
+        """
+        Generate world element references as packed prompts and save them
+
+        Args:
+            world_elements: File name -> reference_world_element variables
+            phase_config: Phase 6 configuration
+
+        Returns:
+            File name -> Markdown text of the references generated
+        """
+        element_prompt = self.prompts.get("reference_world_element", {})
+        if not element_prompt:
+            return {}
+
+        packer = self._make_packer(phase_config.get("pack_size", 3))
+        paths = {filename: f"{self.base_dir}/references/{filename}" for filename in world_elements}
+        options = dict(
+            system_prompt=element_prompt.get("system", ""),
+            temperature=phase_config.get("temperature", 0.7),
+            max_tokens=phase_config.get("num_predict", 4096),
+            model=self._model_for(phase_config, "reference_world_element"),
+        )
+        fingerprint, current = self._check_step(
+            "phase6.packed",
+            StepFingerprints.fingerprint(template=element_prompt.get("user", ""), items=world_elements),
+            {**options, "pack_size": packer.pack_size, "context_length": packer.context_length},
+        )
+        if current:
+            return {filename: load_text(path) for filename, path in paths.items()}
+
+        logger.info(f"Generating {len(world_elements)} world element references (packed)...")
+        responses = packer.generate_text(
+            element_prompt.get("user", ""),
+            world_elements,
+            use_cache=phase_config.get("cache", True),
+            step="phase6",
+            **options,
+        )
+
+        references = {}
+        for filename, response in responses.items():
+            if response:
+                references[filename] = response
+                save_text(response, paths[filename])
+        if len(references) == len(world_elements):
+            self.fingerprints.record("phase6.packed", fingerprint, paths.values())
         return references
 
     def resume_from_checkpoint(self, phase_name: str) -> bool:
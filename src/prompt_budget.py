@@ -0,0 +1,229 @@
+"""
+Prompt Budget Module
+Fits assembled prompts into the model's context window
+"""
+
+from typing import Dict, Any, List, Optional
+from loguru import logger
+
+from .token_counter import TokenCounter
+from .utils import format_prompt
+
+
+STRATEGIES = ("sliding_window", "priority")
+
+# Markers left where a variable was cut
+HEAD_CUT_MARK = "…（前略）\n"
+TAIL_CUT_MARK = "\n…（後略）"
+
+# Tokens kept free for the chat template and special tokens
+_TEMPLATE_OVERHEAD = 64
+
+# Prompts whose approximate size is below this fraction of the limit are not counted exactly
+_SAFE_FRACTION = 0.5
+
+
+class PromptBudgeter:
+    """
+    Shrinks template variables until a prompt fits the context window
+
+    The prompt may use max_context_length minus the output reserve
+    (num_predict, but at most half the window) and the system prompt.
+    When a filled template is larger, its variables are cut:
+
+    - sliding_window: every long variable is cut to a common size, keeping
+      its end (the most recent part of accumulated context)
+    - priority: variables are cut in reverse priority order, keeping their
+      beginning; unlisted variables go first, largest first
+
+    Overflowing prompts would otherwise be cut by the server from the
+    front, silently dropping the instructions' context.
+    """
+
+    def __init__(
+        self,
+        counter: TokenCounter,
+        max_context_length: int = 8192,
+        strategy: str = "sliding_window",
+    ):
+        """
+        Initialize prompt budgeter
+
+        Args:
+            counter: Token counter
+            max_context_length: Context window in tokens (performance.max_context_length)
+            strategy: How to cut variables ("sliding_window" or "priority")
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown truncate strategy: {strategy} (expected one of {', '.join(STRATEGIES)})")
+
+        self.counter = counter
+        self.max_context_length = max_context_length
+        self.strategy = strategy
+
+        # Counters
+        self.fitted = 0
+        self.overflows = 0
+
+        logger.info(f"PromptBudgeter initialized: {max_context_length} token window, {strategy}")
+
+    def prompt_limit(self, output_tokens: int, system_prompt: Optional[str] = None) -> int:
+        """
+        Get the number of tokens the user prompt may use
+
+        Args:
+            output_tokens: num_predict of the call
+            system_prompt: Optional system prompt sent with it
+
+        Returns:
+            Token limit for the prompt
+        """
+        reserve = min(output_tokens, self.max_context_length // 2)
+        system_tokens = self.counter.count(system_prompt) if system_prompt else 0
+        return self.max_context_length - reserve - system_tokens - _TEMPLATE_OVERHEAD
+
+    def fits(self, prompt: str, output_tokens: int, system_prompt: Optional[str] = None) -> bool:
+        """
+        Check whether a prompt fits the context window
+
+        Args:
+            prompt: Complete prompt
+            output_tokens: num_predict of the call
+            system_prompt: Optional system prompt sent with it
+
+        Returns:
+            True if the prompt fits
+        """
+        limit = self.prompt_limit(output_tokens, system_prompt)
+        if self.counter.approximate(prompt) <= limit * _SAFE_FRACTION:
+            return True
+        return self.counter.count(prompt) <= limit
+
+    def fit(
+        self,
+        template: str,
+        variables: Dict[str, Any],
+        output_tokens: int = 4096,
+        system_prompt: Optional[str] = None,
+        priority: Optional[List[str]] = None,
+    ) -> str:
+        """
+        Fill a template, cutting its variables if the result is too long
+
+        Args:
+            template: Prompt template
+            variables: Template variables
+            output_tokens: num_predict of the call
+            system_prompt: Optional system prompt sent with it
+            priority: Variable names, most important first (priority strategy)
+
+        Returns:
+            Filled prompt that fits the window (as far as cutting variables allows)
+        """
+        prompt = format_prompt(template, **variables)
+        if self.fits(prompt, output_tokens, system_prompt):
+            return prompt
+
+        limit = self.prompt_limit(output_tokens, system_prompt)
+        sizes = {
+            name: self.counter.count(value)
+            for name, value in variables.items()
+            if isinstance(value, str) and value and f"{{{name}}}" in template
+        }
+
+        # Token counts of cut text are estimated, so check and cut again if needed
+        excess = self.counter.count(prompt) - limit
+        for _ in range(3):
+            targets = self._targets(sizes, excess, priority)
+            fitted = {**variables, **{name: self._cut(variables[name], sizes[name], keep) for name, keep in targets.items()}}
+            prompt = format_prompt(template, **fitted)
+            over = self.counter.count(prompt) - limit
+            if over <= 0:
+                break
+            excess += over
+
+        self.fitted += 1
+        cut = ", ".join(f"{name} {sizes[name]}->{keep}" for name, keep in targets.items())
+        if over > 0:
+            self.overflows += 1
+            logger.error(f"Prompt still exceeds the context window by {over} tokens after cutting ({cut or 'nothing to cut'})")
+        else:
+            logger.warning(f"Prompt cut to fit {self.max_context_length} token window ({self.strategy}: {cut})")
+        return prompt
+
+    def _targets(self, sizes: Dict[str, int], excess: int, priority: Optional[List[str]]) -> Dict[str, int]:
+        """
+        Decide how many tokens each variable keeps
+
+        Args:
+            sizes: Variable name -> token count
+            excess: Tokens to remove in total
+            priority: Variable names, most important first
+
+        Returns:
+            Variable name -> tokens to keep, for the variables that are cut
+        """
+        if excess <= 0 or not sizes:
+            return {}
+
+        if self.strategy == "sliding_window":
+            # Largest cap such that cutting everything above it removes enough
+            low, high = 0, max(sizes.values())
+            while low < high:
+                cap = (low + high + 1) // 2
+                if sum(max(0, size - cap) for size in sizes.values()) >= excess:
+                    low = cap
+                else:
+                    high = cap - 1
+            return {name: low for name, size in sizes.items() if size > low}
+
+        ranked = list(priority or [])
+        order = sorted((name for name in sizes if name not in ranked), key=lambda name: -sizes[name])
+        order += [name for name in reversed(ranked) if name in sizes]
+
+        targets = {}
+        for name in order:
+            if excess <= 0:
+                break
+            keep = max(0, sizes[name] - excess)
+            excess -= sizes[name] - keep
+            targets[name] = keep
+        return targets
+
+    def _cut(self, value: str, size: int, keep: int) -> str:
+        """
+        Cut a variable to about keep tokens
+
+        Args:
+            value: Variable text
+            size: Its token count
+            keep: Tokens to keep
+
+        Returns:
+            Cut text with a marker where content was dropped
+        """
+        if keep <= 0:
+            return ""
+        characters = max(1, len(value) * keep // max(1, size))
+
+        if self.strategy == "sliding_window":
+            kept = value[-characters:]
+            newline = kept.find("\n")
+            if 0 <= newline < len(kept) // 5:
+                kept = kept[newline + 1:]  # start at a line boundary
+            return HEAD_CUT_MARK + kept
+
+        kept = value[:characters]
+        newline = kept.rfind("\n")
+        if newline > len(kept) * 4 // 5:
+            kept = kept[:newline]  # end at a line boundary
+        return kept + TAIL_CUT_MARK
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get prompt budget statistics
+
+        Returns:
+            Dictionary with prompts cut to fit and prompts that still overflowed
+        """
+        return {"fitted": self.fitted, "overflows": self.overflows}
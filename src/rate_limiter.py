@@ -0,0 +1,182 @@
+"""
+Rate Limiter Module
+Token-bucket rate limiting for Ollama requests
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+from loguru import logger
+
+
+class TokenBucket:
+    """
+    Token bucket that queues callers instead of rejecting them
+
+    Each acquire reserves the next available token and returns how long the
+    caller has to wait for it, so bursts are spread out at the configured
+    rate. Reservations are made under a lock and the waiting happens outside
+    of it, which makes the bucket safe for threads and asyncio tasks alike.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        """
+        Initialize token bucket
+
+        Args:
+            rate_per_minute: Sustained request rate
+            burst: Number of requests that may be sent back to back
+        """
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Reserve one token
+
+        Returns:
+            Seconds to wait before the reserved token becomes available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated_at) * self.rate_per_second,
+            )
+            self.updated_at = now
+
+            # Tokens may go negative: each negative token is a queued caller
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate_per_second
+
+
+class RateLimiter:
+    """
+    Rate limiter with per-host and per-request-class token buckets
+
+    Every request takes a token from its host's bucket and, if the request
+    class has its own limit, from the class bucket as well.
+    """
+
+    def __init__(
+        self,
+        max_requests_per_minute: float = 20,
+        burst: int = 1,
+        per_host: Optional[Dict[str, float]] = None,
+        per_class: Optional[Dict[str, float]] = None,
+    ):
+        """
+        Initialize rate limiter
+
+        Args:
+            max_requests_per_minute: Default limit for each host
+            burst: Bucket capacity (requests allowed back to back)
+            per_host: Optional per-host limits, keyed by base URL
+            per_class: Optional per-request-class limits (e.g. {"batch": 10})
+        """
+        self.max_requests_per_minute = max_requests_per_minute
+        self.burst = burst
+        self.per_host = per_host or {}
+        self.per_class = per_class or {}
+
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+        # Wait time metrics
+        self.requests = 0
+        self.delayed_requests = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+        logger.info(f"RateLimiter initialized: {max_requests_per_minute} requests/min per host")
+
+    def _bucket(self, kind: str, name: str, rate_per_minute: float) -> TokenBucket:
+        """Get or create a bucket"""
+        with self._lock:
+            bucket = self._buckets.get((kind, name))
+            if bucket is None:
+                bucket = TokenBucket(rate_per_minute, self.burst)
+                self._buckets[(kind, name)] = bucket
+            return bucket
+
+    def _reserve(self, base_url: str, request_class: str) -> float:
+        """
+        Reserve tokens for a request
+
+        Args:
+            base_url: Host the request goes to
+            request_class: Request class name
+
+        Returns:
+            Seconds to wait before sending the request
+        """
+        host_rate = self.per_host.get(base_url, self.max_requests_per_minute)
+        wait = self._bucket("host", base_url, host_rate).reserve()
+
+        class_rate = self.per_class.get(request_class)
+        if class_rate is not None:
+            wait = max(wait, self._bucket("class", request_class, class_rate).reserve())
+
+        with self._lock:
+            self.requests += 1
+            if wait > 0:
+                self.delayed_requests += 1
+                self.total_wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+        if wait > 0:
+            logger.debug(f"Rate limited ({request_class} -> {base_url}), waiting {wait:.2f}s")
+        return wait
+
+    def acquire(self, base_url: str, request_class: str = "default") -> float:
+        """
+        Block until a request may be sent
+
+        Args:
+            base_url: Host the request goes to
+            request_class: Request class name
+
+        Returns:
+            Seconds spent waiting
+        """
+        wait = self._reserve(base_url, request_class)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, base_url: str, request_class: str = "default") -> float:
+        """
+        Wait (without blocking the event loop) until a request may be sent
+
+        Args:
+            base_url: Host the request goes to
+            request_class: Request class name
+
+        Returns:
+            Seconds spent waiting
+        """
+        wait = self._reserve(base_url, request_class)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get limiter wait time statistics
+
+        Returns:
+            Dictionary with request counts and wait times in seconds
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "delayed_requests": self.delayed_requests,
+                "total_wait_seconds": self.total_wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
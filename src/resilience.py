@@ -0,0 +1,265 @@
+"""
+Resilience Module
+Retry backoff, error classification, retry budgets and circuit breakers
+for Ollama API calls
+"""
+
+import json
+import random
+import threading
+import time
+from typing import Dict, Optional
+import requests
+from loguru import logger
+
+
+# HTTP status codes worth retrying (server overloaded, restarting or timed out)
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class FatalRequestError(Exception):
+    """Raised when a request failed in a way that retrying cannot fix"""
+
+
+def backoff_delay(
+    attempt: int,
+    base_delay: float,
+    max_delay: float = 60.0,
+) -> float:
+    """
+    Exponential backoff delay with full jitter
+
+    The delay is drawn uniformly from [0, min(max_delay, base_delay * 2**attempt)],
+    so clients that failed together do not retry in lockstep.
+
+    Args:
+        attempt: Zero-based attempt number that just failed
+        base_delay: Base delay in seconds
+        max_delay: Upper bound for the delay in seconds
+
+    Returns:
+        Delay in seconds
+    """
+    cap = min(max_delay, base_delay * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Check whether a request error is worth retrying
+
+    Connection problems, timeouts, malformed responses and overloaded-server
+    status codes are retryable; other HTTP errors (e.g. 404 for an unknown
+    model, 400 for a bad request) are fatal.
+
+    Args:
+        error: Exception raised by the request
+
+    Returns:
+        True if the request should be retried
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        if response is None:
+            return True
+        return response.status_code in RETRYABLE_STATUS_CODES
+    return True
+
+
+def is_server_failure(error: Exception) -> bool:
+    """
+    Check whether an error indicates that the server itself is unhealthy
+
+    Args:
+        error: Exception raised by the request
+
+    Returns:
+        True for connection errors, timeouts and 5xx responses
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        return response is None or response.status_code >= 500
+    return False
+
+
+class RetryBudget:
+    """Limits the total number of retries across all calls in a run"""
+
+    def __init__(self, max_retries: Optional[int] = None):
+        """
+        Initialize retry budget
+
+        Args:
+            max_retries: Maximum retries allowed (None for unlimited)
+        """
+        self.max_retries = max_retries
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def try_consume(self) -> bool:
+        """
+        Consume one retry from the budget
+
+        Returns:
+            True if a retry is allowed, False if the budget is exhausted
+        """
+        with self._lock:
+            if self.max_retries is not None and self.used >= self.max_retries:
+                return False
+            self.used += 1
+            return True
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """Number of retries left (None for unlimited)"""
+        if self.max_retries is None:
+            return None
+        return max(0, self.max_retries - self.used)
+
+    def reset(self) -> None:
+        """Restore the full budget (e.g. at the start of a run)"""
+        with self._lock:
+            self.used = 0
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker
+
+    After failure_threshold consecutive server failures the circuit opens
+    and requests fail fast. Once reset_timeout has passed a single probe
+    request is let through (half-open); its outcome closes or re-opens
+    the circuit. A probe that ends without either verdict (e.g. a 404 or
+    an unparseable body) must give its slot back with release_probe().
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize circuit breaker
+
+        Args:
+            failure_threshold: Consecutive failures before the circuit opens
+            reset_timeout: Seconds to wait before probing an open circuit
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_thread: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a request may be sent
+
+        Returns:
+            True if the request may proceed, False to fail fast
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            # Half-open: allow a single probe at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            self._probe_thread = threading.get_ident()
+            return True
+
+    def release_probe(self) -> None:
+        """
+        Give back the half-open probe slot taken by this thread, if any
+
+        Called once a request allowed by allow_request is over, whatever
+        its outcome; after record_success or record_failure it does nothing.
+        """
+        with self._lock:
+            if self._probe_in_flight and self._probe_thread == threading.get_ident():
+                self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        """Record a successful request"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Circuit closed: server is responding again")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record a server failure"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(
+                        f"Circuit opened after {self.consecutive_failures} consecutive failures"
+                    )
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+# Process-wide circuit breakers, keyed by base URL
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(
+    base_url: str,
+    failure_threshold: int = 5,
+    reset_timeout: float = 30.0,
+) -> CircuitBreaker:
+    """
+    Get the shared circuit breaker for a host
+
+    Args:
+        base_url: Server base URL
+        failure_threshold: Consecutive failures before the circuit opens
+        reset_timeout: Seconds to wait before probing an open circuit
+
+    Returns:
+        CircuitBreaker shared by all clients talking to base_url
+    """
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(base_url)
+        if breaker is None:
+            breaker = CircuitBreaker(failure_threshold, reset_timeout)
+            _circuit_breakers[base_url] = breaker
+        return breaker
+
+
+def describe_error(error: Exception) -> str:
+    """
+    Build a short description of a request error for logging
+
+    Args:
+        error: Exception raised by the request
+
+    Returns:
+        Human-readable description
+    """
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        try:
+            detail = error.response.json().get("error", "")
+        except (ValueError, AttributeError, json.JSONDecodeError):
+            detail = ""
+        if detail:
+            return f"HTTP {error.response.status_code}: {detail}"
+    return str(error)
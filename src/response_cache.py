@@ -0,0 +1,232 @@
+"""
+Response Cache Module
+Persistent content-addressed cache for LLM responses
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+from loguru import logger
+
+
+class ResponseCache:
+    """
+    Disk-backed LLM response cache with TTL expiry and LRU eviction
+
+    Each entry is stored as "<sha256>.json" in cache_dir. Entry recency is
+    tracked through the file modification time, so the LRU order survives
+    restarts.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "./output/cache/responses",
+        ttl: Optional[float] = 3600,
+        max_size_mb: float = 512,
+    ):
+        """
+        Initialize response cache
+
+        Args:
+            cache_dir: Directory to store cache entries
+            ttl: Entry lifetime in seconds (None or 0 to never expire)
+            max_size_mb: Maximum total size of cache entries in megabytes
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        # key -> entry size in bytes, least recently used first
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._load_index()
+
+        logger.info(
+            f"ResponseCache initialized: {self.cache_dir} ({len(self._index)} entries)"
+        )
+
+    @staticmethod
+    def make_key(
+        model: str,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        format: Any = "",
+        options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """
+        Build a content-addressed cache key
+
+        Args:
+            model: Model name
+            prompt: Full prompt sent to the model
+            system_prompt: System prompt
+            format: Output format (string or JSON schema)
+            options: Generation options
+
+        Returns:
+            Hex SHA-256 digest identifying the request
+        """
+        material = json.dumps(
+            {
+                "model": model,
+                "prompt": prompt,
+                "system": system_prompt or "",
+                "format": format or "",
+                "options": options or {},
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        """Get the file path for a cache key"""
+        return self.cache_dir / f"{key}.json"
+
+    def _load_index(self) -> None:
+        """Build the in-memory LRU index from entries on disk"""
+        entries = []
+        for filepath in self.cache_dir.glob("*.json"):
+            try:
+                stat = filepath.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, filepath.stem, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def _remove(self, key: str) -> None:
+        """Remove an entry from disk and index (caller holds the lock)"""
+        size = self._index.pop(key, 0)
+        self._total_bytes -= size
+        try:
+            self._entry_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached response text, or None on miss or expiry
+        """
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+
+            filepath = self._entry_path(key)
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Dropping unreadable cache entry {filepath}: {e}")
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            if self.ttl and time.time() - entry.get("created_at", 0) > self.ttl:
+                logger.debug(f"Cache entry expired: {key[:12]}")
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            # Mark as most recently used (in memory and on disk)
+            self._index.move_to_end(key)
+            try:
+                os.utime(filepath, None)
+            except OSError:
+                pass
+
+            self.hits += 1
+            logger.debug(f"Cache hit: {key[:12]}")
+            return entry.get("response")
+
+    def set(self, key: str, response: str) -> None:
+        """
+        Store a response
+
+        Args:
+            key: Cache key
+            response: Response text to cache
+        """
+        entry = json.dumps(
+            {"created_at": time.time(), "response": response},
+            ensure_ascii=False,
+        )
+        size = len(entry.encode("utf-8"))
+
+        with self._lock:
+            if key in self._index:
+                self._remove(key)
+
+            filepath = self._entry_path(key)
+            temp_path = filepath.with_suffix(".tmp")
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    f.write(entry)
+                os.replace(temp_path, filepath)
+            except OSError as e:
+                logger.error(f"Failed to write cache entry {filepath}: {e}")
+                return
+
+            self._index[key] = size
+            self._total_bytes += size
+
+            # Evict least recently used entries beyond the size limit
+            while self._total_bytes > self.max_size_bytes and len(self._index) > 1:
+                oldest_key = next(iter(self._index))
+                self._remove(oldest_key)
+                self.evictions += 1
+                logger.debug(f"Evicted cache entry: {oldest_key[:12]}")
+
+    def delete(self, key: str) -> None:
+        """
+        Remove a cached response
+
+        Args:
+            key: Cache key
+        """
+        with self._lock:
+            if key in self._index:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Remove all cached responses"""
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+        logger.info("Response cache cleared")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with hits, misses, evictions, entries and size in bytes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "size_bytes": self._total_bytes,
+            }
@@ -0,0 +1,102 @@
+"""
+Schema Module
+JSON Schema validation for structured LLM outputs
+"""
+
+from typing import Any, Dict, List
+
+try:
+    import jsonschema
+except ImportError:  # Optional dependency: fall back to the built-in subset validator
+    jsonschema = None
+
+
+_TYPE_CHECKS = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+}
+
+
+def _validate_subset(data: Any, schema: Dict[str, Any], path: str) -> List[str]:
+    """
+    Validate data against the subset of JSON Schema used by the prompt files
+
+    Supports type, enum, properties, required, additionalProperties,
+    items, minItems, maxItems and minLength.
+
+    Args:
+        data: Parsed JSON value
+        schema: JSON Schema
+        path: Location of data (for error messages)
+
+    Returns:
+        List of validation error messages
+    """
+    errors: List[str] = []
+
+    expected = schema.get("type")
+    if expected is not None:
+        types = expected if isinstance(expected, list) else [expected]
+        if not any(_TYPE_CHECKS.get(t, lambda value: True)(data) for t in types):
+            return [f"{path}: expected {' or '.join(types)}, got {type(data).__name__}"]
+
+    if "enum" in schema and data not in schema["enum"]:
+        errors.append(f"{path}: {data!r} is not one of {schema['enum']}")
+
+    if isinstance(data, dict):
+        properties = schema.get("properties", {})
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append(f"{path}: missing required property '{key}'")
+
+        additional = schema.get("additionalProperties", True)
+        for key, value in data.items():
+            if key in properties:
+                errors.extend(_validate_subset(value, properties[key], f"{path}.{key}"))
+            elif additional is False:
+                errors.append(f"{path}: unexpected property '{key}'")
+            elif isinstance(additional, dict):
+                errors.extend(_validate_subset(value, additional, f"{path}.{key}"))
+
+    if isinstance(data, list):
+        if "minItems" in schema and len(data) < schema["minItems"]:
+            errors.append(f"{path}: expected at least {schema['minItems']} items, got {len(data)}")
+        if "maxItems" in schema and len(data) > schema["maxItems"]:
+            errors.append(f"{path}: expected at most {schema['maxItems']} items, got {len(data)}")
+        if isinstance(schema.get("items"), dict):
+            for i, item in enumerate(data):
+                errors.extend(_validate_subset(item, schema["items"], f"{path}[{i}]"))
+
+    if isinstance(data, str) and "minLength" in schema and len(data) < schema["minLength"]:
+        errors.append(f"{path}: expected at least {schema['minLength']} characters")
+
+    return errors
+
+
+def validate_json_schema(data: Any, schema: Dict[str, Any]) -> List[str]:
+    """
+    Validate data against a JSON Schema
+
+    Uses the jsonschema package when installed, otherwise a built-in
+    validator covering the keywords used in config/prompts/*.yaml.
+
+    Args:
+        data: Parsed JSON value
+        schema: JSON Schema
+
+    Returns:
+        List of validation error messages (empty if valid)
+    """
+    if jsonschema is not None:
+        validator = jsonschema.Draft7Validator(schema)
+        return [
+            f"$.{'.'.join(str(p) for p in error.absolute_path)}: {error.message}".replace("$.:", "$:")
+            for error in validator.iter_errors(data)
+        ]
+
+    return _validate_subset(data, schema, "$")
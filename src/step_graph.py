@@ -0,0 +1,198 @@
+"""
+Step Graph Module
+Runs dependent pipeline steps concurrently as soon as their inputs exist
+"""
+
+import asyncio
+import heapq
+import time
+from typing import Dict, Any, Awaitable, Callable, Iterable, List, Tuple
+from loguru import logger
+
+
+class StepGraph:
+    """
+    DAG of named async steps
+
+    A step starts once every step it depends on has finished, with at most
+    max_concurrency steps running at a time. When a slot frees up, the
+    ready step with the highest priority takes it (ties in the order the
+    steps were added), so consumers given a higher priority than their
+    producers run as soon as their input exists and producers only run
+    ahead while no consumer is waiting. A step that raises is recorded as
+    failed and the steps depending on it are skipped. A step returning
+    None counts as finished, as in the serial code (its dependents see
+    missing data).
+    """
+
+    def __init__(self, max_concurrency: int = 3):
+        """
+        Initialize step graph
+
+        Args:
+            max_concurrency: Maximum steps running at once
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._steps: Dict[str, Tuple[Callable[[], Awaitable[Any]], List[str], int]] = {}
+
+        # Filled in by run()
+        self.results: Dict[str, Any] = {}
+        self.status: Dict[str, str] = {}
+        self.timings: Dict[str, Tuple[float, float]] = {}
+
+    def add(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        dependencies: Iterable[str] = (),
+        priority: int = 0,
+    ) -> None:
+        """
+        Add a step
+
+        Args:
+            name: Unique step name
+            func: Coroutine function running the step
+            dependencies: Names of the steps that must finish first
+            priority: Ready steps with a higher priority get a free slot first
+        """
+        if name in self._steps:
+            raise ValueError(f"Duplicate step: {name}")
+        self._steps[name] = (func, list(dependencies), priority)
+
+    def dependencies(self, name: str) -> List[str]:
+        """
+        Get the steps a step waits for
+
+        Args:
+            name: Step name
+
+        Returns:
+            Names of its dependencies
+        """
+        return list(self._steps[name][1])
+
+    def order(self) -> List[str]:
+        """
+        Get the steps in a dependency-respecting order
+
+        Returns:
+            Step names, every step after its dependencies
+
+        Raises:
+            ValueError: If a dependency is unknown or the steps form a cycle
+        """
+        ordered: List[str] = []
+        state: Dict[str, str] = {}
+
+        def visit(name: str, path: Tuple[str, ...]) -> None:
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + (name,))}")
+            state[name] = "visiting"
+            for dep in self._steps[name][1]:
+                if dep not in self._steps:
+                    raise ValueError(f"Step {name} depends on unknown step {dep}")
+                visit(dep, path + (name,))
+            state[name] = "done"
+            ordered.append(name)
+
+        for name in self._steps:
+            visit(name, ())
+        return ordered
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Run every step
+
+        Returns:
+            Step name -> result of the steps that finished
+        """
+        self.order()  # validate before starting anything
+        self.results, self.status, self.timings = {}, {}, {}
+
+        finished = {name: asyncio.Event() for name in self._steps}
+        index = {name: i for i, name in enumerate(self._steps)}
+        start_time = time.perf_counter()
+
+        # Free slots, and the ready steps waiting for one: (-priority, index, future)
+        free = self.max_concurrency
+        waiting: List[Tuple[int, int, asyncio.Future]] = []
+
+        async def acquire(name: str) -> None:
+            nonlocal free
+            if free > 0 and not waiting:
+                free -= 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(waiting, (-self._steps[name][2], index[name], future))
+            await future  # the slot is handed over by release()
+
+        def release() -> None:
+            nonlocal free
+            while waiting:
+                future = heapq.heappop(waiting)[2]
+                if not future.done():
+                    future.set_result(None)
+                    return
+            free += 1
+
+        async def run_step(name: str) -> None:
+            func, dependencies, _ = self._steps[name]
+            for dep in dependencies:
+                await finished[dep].wait()
+
+            try:
+                failed = [dep for dep in dependencies if self.status[dep] != "done"]
+                if failed:
+                    logger.warning(f"Skipping {name}: {', '.join(failed)} did not finish")
+                    self.status[name] = "skipped"
+                    return
+
+                await acquire(name)
+                began = time.perf_counter() - start_time
+                try:
+                    self.results[name] = await func()
+                    self.status[name] = "done"
+                except Exception as e:
+                    logger.error(f"Step {name} failed: {e}")
+                    self.status[name] = "failed"
+                self.timings[name] = (began, time.perf_counter() - start_time)
+                finished[name].set()
+                # Hand the slot on once the steps this one made ready have queued for it
+                asyncio.get_running_loop().call_soon(release)
+            finally:
+                finished[name].set()
+
+        await asyncio.gather(*(run_step(name) for name in self._steps))
+
+        counts = {state: list(self.status.values()).count(state) for state in ("done", "failed", "skipped")}
+        logger.info(
+            f"Ran {len(self._steps)} steps in {time.perf_counter() - start_time:.1f}s "
+            f"({counts['done']} done, {counts['failed']} failed, {counts['skipped']} skipped)"
+        )
+        return self.results
+
+    def critical_path(self) -> List[str]:
+        """
+        Get the chain of steps that bounded the last run's wall time
+
+        Starts at the step that finished last and repeatedly follows the
+        dependency that finished last, i.e. the one the step was waiting for.
+        Where a step started well after that dependency finished, it was
+        waiting for a free slot rather than for data.
+
+        Returns:
+            Step names from first to last (empty before run())
+        """
+        if not self.timings:
+            return []
+
+        path = [max(self.timings, key=lambda name: self.timings[name][1])]
+        while True:
+            timed = [dep for dep in self._steps[path[-1]][1] if dep in self.timings]
+            if not timed:
+                break
+            path.append(max(timed, key=lambda name: self.timings[name][1]))
+        return list(reversed(path))
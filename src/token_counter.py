@@ -0,0 +1,171 @@
+"""
+Token Counter Module
+Model-calibrated, memoized token counts for prompt budgeting
+"""
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from loguru import logger
+
+from .ollama_client import OllamaClient
+
+
+def local_token_estimate(text: str) -> int:
+    """
+    Estimate a token count without a tokenizer (uncalibrated)
+
+    Japanese characters (kana, kanji, full-width punctuation) are counted as
+    about one token each and other text as about four characters per token.
+
+    Args:
+        text: Text to estimate
+
+    Returns:
+        Estimated token count
+    """
+    wide = sum(1 for char in text if ord(char) >= 0x3000)
+    return wide + (len(text) - wide + 3) // 4
+
+
+class TokenCounter:
+    """
+    Counts tokens with the model's tokenizer where the server offers one
+
+    Counts come from /api/tokenize when the server supports it; otherwise
+    (or after the endpoint failed once) the local_token_estimate
+    approximation is used, scaled by the ratio of real to estimated counts
+    observed so far. Results are memoized by text hash, so re-counting the
+    same context for every chapter costs nothing.
+    """
+
+    def __init__(
+        self,
+        client: Optional[OllamaClient] = None,
+        model: Optional[str] = None,
+        use_server: bool = True,
+        cache_size: int = 4096,
+    ):
+        """
+        Initialize token counter
+
+        Args:
+            client: Client used for /api/tokenize (local approximation only if None)
+            model: Model whose tokenizer to use (client default if None)
+            use_server: Whether to ask the server for exact counts
+            cache_size: Number of counts memoized
+        """
+        self.client = client
+        self.model = model
+        self.use_server = use_server and client is not None
+        self.cache_size = max(1, cache_size)
+
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Calibration: real and estimated token totals of tokenized texts
+        self._real_tokens = 0
+        self._estimated_tokens = 0
+
+        # Counters
+        self.hits = 0
+        self.server_counts = 0
+        self.approximate_counts = 0
+
+    @staticmethod
+    def _key(text: str) -> str:
+        """Memoization key of a text"""
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @property
+    def ratio(self) -> float:
+        """Real tokens per estimated token (1.0 until calibrated)"""
+        with self._lock:
+            if not self._estimated_tokens:
+                return 1.0
+            return self._real_tokens / self._estimated_tokens
+
+    def calibrate(self, text: str, tokens: int) -> None:
+        """
+        Record a real token count to calibrate the approximation
+
+        Args:
+            text: Text that was tokenized (or sent as a prompt)
+            tokens: Its real token count (e.g. prompt_eval_count)
+        """
+        estimated = local_token_estimate(text)
+        if estimated <= 0 or tokens <= 0:
+            return
+        with self._lock:
+            self._real_tokens += tokens
+            self._estimated_tokens += estimated
+
+    def approximate(self, text: str) -> int:
+        """
+        Estimate tokens locally, scaled by the calibration ratio
+
+        Args:
+            text: Text to count
+
+        Returns:
+            Approximate token count
+        """
+        return math.ceil(local_token_estimate(text) * self.ratio)
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens of a text
+
+        Args:
+            text: Text to count
+
+        Returns:
+            Token count (exact if the server could tokenize it)
+        """
+        if not text:
+            return 0
+
+        key = self._key(text)
+        with self._lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                self.hits += 1
+                return self._counts[key]
+
+        tokens = None
+        if self.use_server:
+            token_ids = self.client.tokenize(text, model=self.model)
+            if token_ids is None:
+                logger.info("Server cannot tokenize, using the calibrated local approximation")
+                self.use_server = False
+            else:
+                tokens = len(token_ids)
+                self.server_counts += 1
+                self.calibrate(text, tokens)
+
+        if tokens is None:
+            tokens = self.approximate(text)
+            self.approximate_counts += 1
+
+        with self._lock:
+            self._counts[key] = tokens
+            while len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get token counter statistics
+
+        Returns:
+            Dictionary with memoized hits, exact (server) counts, approximate
+            counts and the calibration ratio
+        """
+        return {
+            "hits": self.hits,
+            "server_counts": self.server_counts,
+            "approximate_counts": self.approximate_counts,
+            "ratio": self.ratio,
+        }
@@ -3,6 +3,7 @@ Utility Functions Module
 Helper functions for configuration, data conversion, and display
 """
 
+import os
 import yaml
 import json
 from pathlib import Path
@@ -234,6 +235,9 @@ def save_text(content: str, filepath: str) -> bool:
     """
     Save text content to file
 
+    The text is written to "<filepath>.tmp" and renamed into place, so an
+    interrupted write never leaves a truncated file at filepath.
+
     Args:
         content: Text content to save
         filepath: Output file path
@@ -245,8 +249,10 @@ def save_text(content: str, filepath: str) -> bool:
         output_path = Path(filepath)
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(output_path, "w", encoding="utf-8") as f:
+        temp_path = output_path.with_name(output_path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
             f.write(content)
+        os.replace(temp_path, output_path)
 
         logger.info(f"Saved text to {filepath}")
         return True
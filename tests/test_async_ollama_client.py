@@ -0,0 +1,100 @@
+"""
+Tests for AsyncOllamaClient module
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+from unittest.mock import Mock, patch
+from src.async_ollama_client import AsyncOllamaClient
+from src.ollama_client import OllamaClient
+
+
+class TestAsyncOllamaClient:
+    """Test cases for AsyncOllamaClient"""
+
+    def test_initialization(self):
+        """Test async client initialization"""
+        client = AsyncOllamaClient(max_parallel_requests=4)
+
+        assert client.client.base_url == "http://localhost:11434"
+        assert client.max_parallel_requests == 4
+        assert client.client.pool_size == 4
+
+    def test_wraps_existing_client(self):
+        """Test that the wrapped client's generation logic is reused"""
+        sync_client = OllamaClient()
+        sync_client.generate_text = Mock(return_value="streamed")
+        client = AsyncOllamaClient(sync_client)
+
+        result = asyncio.run(client.generate_text("Prompt", stream=True, step="phase5"))
+
+        assert result == "streamed"
+        sync_client.generate_text.assert_called_once_with("Prompt", stream=True, step="phase5")
+
+    @patch('requests.Session.post')
+    def test_generate_json_success(self, mock_post):
+        """Test successful async JSON generation"""
+        client = AsyncOllamaClient()
+
+        mock_response = Mock()
+        mock_response.json.return_value = {
+            "response": '```json\n{"key": "value"}\n```'
+        }
+        mock_post.return_value = mock_response
+
+        result = asyncio.run(client.generate_json("Test prompt"))
+        assert result == {"key": "value"}
+
+    @patch('requests.Session.post')
+    def test_generate_retry_on_timeout(self, mock_post):
+        """Test async retry mechanism on timeout"""
+        client = AsyncOllamaClient(max_retries=2, retry_delay=0)
+
+        mock_response_success = Mock()
+        mock_response_success.json.return_value = {"response": "Success"}
+        mock_post.side_effect = [
+            requests.exceptions.Timeout("Connection timed out"),
+            mock_response_success,
+        ]
+
+        result = asyncio.run(client.generate_text("Test prompt"))
+        assert result == "Success"
+        assert mock_post.call_count == 2
+
+    @patch('requests.Session.post')
+    def test_concurrency_is_bounded(self, mock_post):
+        """Test that no more than max_parallel_requests are in flight"""
+        client = AsyncOllamaClient(max_parallel_requests=2)
+
+        lock = threading.Lock()
+        state = {"in_flight": 0, "peak": 0}
+
+        def slow_post(*args, **kwargs):
+            with lock:
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+            time.sleep(0.05)
+            with lock:
+                state["in_flight"] -= 1
+            response = Mock()
+            response.json.return_value = {"response": "ok"}
+            return response
+
+        mock_post.side_effect = slow_post
+
+        async def run_all():
+            return await asyncio.gather(
+                *(client.generate(f"Prompt {i}") for i in range(6))
+            )
+
+        results = asyncio.run(run_all())
+        assert results == ["ok"] * 6
+        assert state["peak"] == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,127 @@
+"""
+Tests for benchmark module
+"""
+
+import pytest
+from src.benchmark import (
+    LATENCY_PROFILES,
+    PHASES,
+    PipelineBenchmark,
+    compare_reports,
+    critical_path_seconds,
+    scale_profile,
+    step_dependencies,
+)
+from src.pipeline import Pipeline
+
+
+@pytest.fixture(scope="module")
+def dependencies():
+    """Step dependencies of the default configuration's full-pipeline graph"""
+    return step_dependencies(Pipeline())
+
+
+class TestStepDependencies:
+    """Test cases for the step dependency map"""
+
+    def test_matches_pipeline_graph(self, dependencies):
+        """Test that per-chapter steps depend on what the pipeline graph makes them wait for"""
+        assert dependencies["phase4.extract_keywords.03"] == ["phase4.extract_chapter.03"]
+        assert dependencies["phase5.chapter_07"] == ["phase2.characters", "phase4.search_references.07"]
+        assert "phase3.checkpoint" in dependencies["phase4.search_references.01"]
+        assert dependencies["phase6.media.md"] == ["phase3.media"]
+        assert dependencies["phase6.user_context.md"] == []
+
+    def test_world_elements(self, dependencies):
+        """Test that Phase 3 elements depend on the elements their prompt reads"""
+        assert dependencies["phase3.living_environment"] == [
+            "phase1.plottype_selection",
+            "phase3.social_structure",
+        ]
+
+
+class TestCriticalPath:
+    """Test cases for critical_path_seconds"""
+
+    def test_independent_steps(self, dependencies):
+        """Test that independent steps overlap completely"""
+        steps = {"phase1.desire_list": 2.0, "phase1.ability_list": 3.0, "phase1.role_list": 1.0}
+        assert critical_path_seconds(steps, dependencies) == pytest.approx(3.0)
+
+    def test_dependent_chain(self, dependencies):
+        """Test that a dependency chain adds up"""
+        steps = {
+            "phase1.plottype_list": 1.0,
+            "phase1.plottype_selection": 2.0,
+            "phase1.desire_list": 2.5,
+        }
+        assert critical_path_seconds(steps, dependencies) == pytest.approx(3.0)
+
+    def test_chain_through_checkpoint(self, dependencies):
+        """Test that a chain passing a checkpoint step (no calls) still adds up"""
+        steps = {"phase3.media": 2.0, "phase4.search_references.01": 1.0}
+        assert critical_path_seconds(steps, dependencies) == pytest.approx(3.0)
+
+    def test_packed_fallbacks_count_for_the_packed_step(self):
+        """Test that separate requests for failed slots extend their packed step"""
+        dependencies = {
+            "phase4.extract_chapter.packed": [],
+            "phase4.extract_keywords.packed": ["phase4.extract_chapter.packed"],
+        }
+        steps = {
+            "phase4.extract_chapter.packed": 2.0,
+            "phase4.extract_chapter.05": 1.0,
+            "phase4.extract_keywords.packed": 1.5,
+        }
+        assert critical_path_seconds(steps, dependencies) == pytest.approx(4.5)
+
+    def test_empty(self, dependencies):
+        """Test that no calls means no critical path"""
+        assert critical_path_seconds({}, dependencies) == 0.0
+
+
+class TestProfiles:
+    """Test cases for latency profiles"""
+
+    def test_scale_profile(self):
+        """Test that scaling divides durations and multiplies rates"""
+        scaled = scale_profile(LATENCY_PROFILES["gpu"], 10)
+        assert scaled["load_time"] == pytest.approx(LATENCY_PROFILES["gpu"]["load_time"] / 10)
+        assert scaled["tokens_per_second"] == pytest.approx(LATENCY_PROFILES["gpu"]["tokens_per_second"] * 10)
+        assert scaled["concurrency"] == LATENCY_PROFILES["gpu"]["concurrency"]
+
+    def test_unknown_profile(self):
+        """Test that an unknown profile is rejected"""
+        with pytest.raises(ValueError):
+            PipelineBenchmark(profile="quantum")
+
+
+class TestPipelineBenchmark:
+    """End-to-end benchmark runs against the mock server"""
+
+    def test_run_instant_profile(self):
+        """Test that every phase is measured"""
+        report = PipelineBenchmark(profile="instant").run(full=True)
+
+        assert list(report["phases"]) == PHASES
+        assert report["phases"]["phase0"]["llm_calls"] == 0
+        assert report["phases"]["phase3"]["llm_calls"] == 10
+        assert report["phases"]["phase5"]["bytes_written"] > 0
+        assert report["phases"]["phase1"]["peak_rss_mb"] > 0
+        assert report["phases_total"]["llm_calls"] == report["full_pipeline"]["llm_calls"]
+        assert report["full_pipeline"]["critical_path_seconds"] <= report["full_pipeline"]["wall_seconds"]
+
+    def test_compare_reports(self):
+        """Test that comparisons report the relative change per phase"""
+        baseline = {"phases": {"phase1": {"wall_seconds": 2.0, "llm_calls": 5}}}
+        current = {"phases": {"phase1": {"wall_seconds": 1.0, "llm_calls": 5}, "phase2": {"wall_seconds": 1.0}}}
+
+        comparison = compare_reports(baseline, current)
+
+        assert comparison["phase1"]["wall_seconds"] == (2.0, 1.0, -0.5)
+        assert comparison["phase1"]["llm_calls"] == (5, 5, 0.0)
+        assert "phase2" not in comparison
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,163 @@
+"""
+Tests for hedging module
+"""
+
+import pytest
+from src.hedging import HedgePolicy
+from src.mock_server import MockOllamaServer
+from src.ollama_client import OllamaClient
+from src.resilience import CircuitBreaker, get_circuit_breaker
+
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"keywords": {"type": "array", "items": {"type": "string"}}},
+    "required": ["keywords"],
+}
+
+
+class TestHedgePolicy:
+    """Test cases for HedgePolicy"""
+
+    def test_key_drops_chapter_number(self):
+        """Test that all chapters of a step share one latency history"""
+        assert HedgePolicy.key_for("phase4.extract_keywords.03") == "phase4.extract_keywords"
+        assert HedgePolicy.key_for("phase5.chapter_07") == "phase5.chapter"
+        assert HedgePolicy.key_for(None) == "unknown"
+
+    def test_no_delay_without_history(self):
+        """Test that calls are not hedged until min_samples latencies are known"""
+        policy = HedgePolicy(min_samples=3, min_delay=0.0)
+        policy.record_latency("step", 1.0)
+        policy.record_latency("step", 1.0)
+        assert policy.delay("step") is None
+
+        policy.record_latency("step", 1.0)
+        assert policy.delay("step") == pytest.approx(1.0)
+
+    def test_delay_is_percentile(self):
+        """Test that the delay is the configured latency percentile, clamped"""
+        policy = HedgePolicy(percentile=90, min_samples=1, min_delay=0.0, max_delay=50.0)
+        for seconds in range(1, 101):
+            policy.record_latency("step", float(seconds))
+        assert policy.delay("step") == pytest.approx(50.0)
+
+        policy.max_delay = None
+        assert policy.delay("step") == pytest.approx(90.0)
+
+        policy.min_delay = 200.0
+        assert policy.delay("step") == pytest.approx(200.0)
+
+    def test_hedge_budget(self):
+        """Test that hedges are capped at max_hedge_ratio of eligible calls"""
+        policy = HedgePolicy(max_hedge_ratio=0.1)
+        for _ in range(20):
+            policy.start_call()
+
+        assert policy.try_hedge()
+        assert policy.try_hedge()
+        assert not policy.try_hedge()
+
+        policy.record_win()
+        stats = policy.stats()
+        assert stats["hedge_rate"] == pytest.approx(0.1)
+        assert stats["win_rate"] == pytest.approx(0.5)
+
+
+class TestHedgedRequests:
+    """Hedged generate_json calls against mock servers"""
+
+    def _client(self, hosts, policy):
+        return OllamaClient(hosts=hosts, hedging=policy, max_retries=1, timeout=30)
+
+    def test_slow_host_is_hedged(self):
+        """Test that a duplicate to a fast host wins when the first host is slow"""
+        policy = HedgePolicy(min_samples=1, min_delay=0.05)
+        policy.record_latency("phase4.extract_keywords", 0.05)
+
+        with MockOllamaServer(prompt_tokens_per_second=20) as slow, MockOllamaServer() as fast:
+            client = self._client([slow.base_url, fast.base_url], policy)
+            stats = {}
+            response = client.generate(
+                "キーワードを抽出してください。", format=SCHEMA, stats=stats,
+                step="phase4.extract_keywords.01", hedge=True,
+            )
+
+        assert response is not None
+        assert stats["hedged"] and stats["hedge_won"]
+        assert stats["host"] == fast.base_url
+        assert stats["eval_count"] is not None
+        assert policy.stats()["hedge_wins"] == 1
+
+    def test_fast_call_is_not_hedged(self):
+        """Test that a call answering within the delay sends no duplicate"""
+        policy = HedgePolicy(min_samples=1, min_delay=5.0)
+        policy.record_latency("phase4.extract_keywords", 5.0)
+
+        with MockOllamaServer() as first, MockOllamaServer() as second:
+            client = self._client([first.base_url, second.base_url], policy)
+            data = client.generate_json(
+                "キーワードを抽出してください。", schema=SCHEMA,
+                step="phase4.extract_keywords.02", hedge=True,
+            )
+
+            assert data is not None
+            assert first.requests + second.requests == 1
+        assert policy.stats() == {"calls": 1, "hedged": 0, "hedge_wins": 0, "hedge_rate": 0.0, "win_rate": 0.0}
+
+    def _half_open_host(self, base_url):
+        """Open the circuit of a host and let its reset timeout pass"""
+        breaker = get_circuit_breaker(base_url, failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        return breaker
+
+    def test_refused_hedge_takes_no_probe_slot(self):
+        """Test that a hedge refused by the budget leaves a half-open host's probe free"""
+        policy = HedgePolicy(min_samples=1, min_delay=0.05)
+        policy.record_latency("phase4.extract_keywords", 0.05)
+        assert policy.try_hedge()  # use up the hedge budget
+        breaker = self._half_open_host("http://127.0.0.1:9")
+
+        with MockOllamaServer(prompt_tokens_per_second=20) as slow:
+            client = self._client([slow.base_url, "http://127.0.0.1:9"], policy)
+            stats = {}
+            client.generate("キーワードを抽出してください。", format=SCHEMA, stats=stats,
+                            step="phase4.extract_keywords.03", hedge=True)
+
+        assert not stats["hedged"]
+        assert breaker.allow_request()  # the probe slot is still free
+        breaker.record_success()
+
+    def test_hedge_refused_by_circuit_returns_budget(self):
+        """Test that a hedge whose host cannot take it is not counted as sent"""
+        policy = HedgePolicy(min_samples=1, min_delay=0.05)
+        policy.record_latency("phase4.extract_keywords", 0.05)
+        breaker = self._half_open_host("http://127.0.0.1:10")
+        assert breaker.allow_request()  # another request holds the probe
+
+        with MockOllamaServer(prompt_tokens_per_second=20) as slow:
+            client = self._client([slow.base_url, "http://127.0.0.1:10"], policy)
+            stats = {}
+            client.generate("キーワードを抽出してください。", format=SCHEMA, stats=stats,
+                            step="phase4.extract_keywords.04", hedge=True)
+
+        assert not stats["hedged"]
+        assert policy.stats()["hedged"] == 0
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        breaker.record_success()
+
+    def test_unhedged_calls_learn_latency(self):
+        """Test that calls without enough history are sent normally and recorded"""
+        policy = HedgePolicy(min_samples=2)
+
+        with MockOllamaServer() as server:
+            client = self._client([server.base_url], policy)
+            client.generate_json("抽出してください。", schema=SCHEMA, step="phase4.extract_chapter.01", hedge=True)
+            client.generate_json("抽出してください。", schema=SCHEMA, step="phase4.extract_chapter.02", hedge=True)
+
+        assert policy.delay("phase4.extract_chapter") is not None
+        assert policy.stats()["hedged"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,64 @@
+"""
+Tests for incremental module
+"""
+
+import pytest
+from src.incremental import StepFingerprints
+
+
+class TestStepFingerprints:
+    """Test cases for StepFingerprints"""
+
+    def test_fingerprint_is_stable(self):
+        """Test that fingerprints depend on the inputs, not their order"""
+        a = StepFingerprints.fingerprint(prompt="p", model="m", schema={"b": 1, "a": 2})
+        b = StepFingerprints.fingerprint(model="m", schema={"a": 2, "b": 1}, prompt="p")
+
+        assert a == b
+        assert a != StepFingerprints.fingerprint(prompt="p", model="other", schema={"a": 2, "b": 1})
+
+    def test_recorded_step_is_current(self, tmp_path):
+        """Test that a step built from the same inputs is skipped"""
+        artifact = tmp_path / "01_desire_list.yaml"
+        artifact.write_text("desires: []", encoding="utf-8")
+        fingerprints = StepFingerprints(str(tmp_path / "fingerprints"))
+
+        assert not fingerprints.is_current("phase1.desire_list", "abc")
+        fingerprints.record("phase1.desire_list", "abc", [str(artifact)])
+
+        assert fingerprints.is_current("phase1.desire_list", "abc")
+        assert not fingerprints.is_current("phase1.desire_list", "def")
+        assert fingerprints.stats() == {"rebuilt": 1, "skipped": 1}
+
+    def test_failed_step_is_not_counted(self, tmp_path):
+        """Test that a step counts as rebuilt only once its new fingerprint is recorded"""
+        fingerprints = StepFingerprints(str(tmp_path / "fingerprints"))
+
+        assert not fingerprints.is_current("phase4.plot", "abc")  # generation then fails: nothing recorded
+
+        assert fingerprints.stats() == {"rebuilt": 0, "skipped": 0}
+        assert not fingerprints.is_current("phase4.plot", "abc")
+
+    def test_missing_artifact_is_rebuilt(self, tmp_path):
+        """Test that a step whose output was deleted is rebuilt"""
+        artifact = tmp_path / "chapter_01.txt"
+        artifact.write_text("第一章", encoding="utf-8")
+        fingerprints = StepFingerprints(str(tmp_path / "fingerprints"))
+        fingerprints.record("phase5.chapter_01", "abc", [str(artifact)])
+
+        artifact.unlink()
+
+        assert not fingerprints.is_current("phase5.chapter_01", "abc")
+
+    def test_disabled(self, tmp_path):
+        """Test that a disabled instance neither skips nor records"""
+        fingerprints = StepFingerprints(str(tmp_path / "fingerprints"), enabled=False)
+        fingerprints.record("phase4.plot", "abc")
+
+        assert not fingerprints.is_current("phase4.plot", "abc")
+        assert not (tmp_path / "fingerprints").exists()
+        assert fingerprints.stats() == {"rebuilt": 0, "skipped": 0}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
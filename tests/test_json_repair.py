@@ -0,0 +1,85 @@
+"""
+Tests for json_repair module
+"""
+
+import pytest
+from src.json_repair import merge_continuation, repair_json
+
+
+class TestRepairJson:
+    """Test cases for repair_json"""
+
+    def test_valid_json_unchanged(self):
+        """Test that valid JSON parses without repairs"""
+        assert repair_json('{"desires": ["a", "b"]}') == ({"desires": ["a", "b"]}, [])
+
+    def test_code_fence_and_prose(self):
+        """Test that fences and surrounding text are dropped"""
+        data, _ = repair_json('結果です:\n```json\n{"key": "value"}\n```\n以上')
+        assert data == {"key": "value"}
+
+    def test_trailing_comma(self):
+        """Test that trailing commas are removed"""
+        data, fixes = repair_json('{"roles": ["a", "b",], "n": 1,}')
+        assert data == {"roles": ["a", "b"], "n": 1}
+        assert "trailing comma" in fixes
+
+    def test_truncated_array_drops_incomplete_item(self):
+        """Test that a truncated array keeps only complete items"""
+        data, fixes = repair_json('{"desires": ["願望1", "願望2", "願望')
+        assert data == {"desires": ["願望1", "願望2"]}
+        assert "truncated" in fixes
+
+    def test_truncated_object_drops_dangling_key(self):
+        """Test that a key cut off before its value is dropped"""
+        data, _ = repair_json('{"plot": {"chapters": [{"chapter": 1, "situation": "s"}], "note":')
+        assert data == {"plot": {"chapters": [{"chapter": 1, "situation": "s"}]}}
+
+    def test_smart_quotes(self):
+        """Test that typographic quotes used as delimiters are normalized"""
+        data, fixes = repair_json('{“name”: “アリス”}')
+        assert data == {"name": "アリス"}
+        assert "smart quotes" in fixes
+
+    def test_unescaped_newline_and_quote(self):
+        """Test that raw newlines and inner quotes in strings are escaped"""
+        data, _ = repair_json('{"description": "一行目\n彼は"はい"と答えた"}')
+        assert data == {"description": '一行目\n彼は"はい"と答えた'}
+
+    def test_missing_comma_between_lines(self):
+        """Test that a comma missing at a line break is inserted"""
+        data, fixes = repair_json('{"a": "x"\n "b": "y"}')
+        assert data == {"a": "x", "b": "y"}
+        assert "missing comma" in fixes
+
+    def test_python_literals_and_bare_words(self):
+        """Test that Python literals and unquoted words become JSON values"""
+        data, _ = repair_json('{"ok": True, "none": None, "age": 三十}')
+        assert data == {"ok": True, "none": None, "age": "三十"}
+
+    def test_no_json(self):
+        """Test that text without JSON cannot be repaired"""
+        assert repair_json("申し訳ありません") == (None, [])
+
+
+class TestMergeContinuation:
+    """Test cases for merge_continuation"""
+
+    def test_plain_append(self):
+        """Test appending a continuation without overlap"""
+        assert merge_continuation('{"a": ["x", "y', '", "z"]}') == '{"a": ["x", "y", "z"]}'
+
+    def test_repeated_overlap_removed(self):
+        """Test that a repeated tail is not duplicated"""
+        merged = merge_continuation('{"a": ["first item", "second', '"first item", "second", "third"]}')
+        assert merged == '{"a": ["first item", "second", "third"]}'
+
+    def test_restarted_response_replaces_partial(self):
+        """Test that a continuation starting over replaces the partial output"""
+        partial = '{"desires": ["願望1", "願望2'
+        restart = '```json\n{"desires": ["願望1", "願望2", "願望3"]}\n```'
+        assert merge_continuation(partial, restart) == '{"desires": ["願望1", "願望2", "願望3"]}'
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,108 @@
+"""
+Tests for load_balancer module
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from src.load_balancer import HostPool
+from src.ollama_client import OllamaClient
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Minimal Ollama stand-in answering with the port it listens on"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send_json({"models": [{"name": "gpt-oss:20b"}]})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        self._send_json({"response": str(self.server.server_address[1]), "done": True})
+
+
+@pytest.fixture
+def stand_in_servers():
+    """Start two local stand-in servers on ephemeral ports"""
+    servers = []
+    for _ in range(2):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+
+    yield servers
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def server_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class TestHostPool:
+    """Test cases for HostPool"""
+
+    def test_least_outstanding_routing(self):
+        """Test that the least busy host is chosen"""
+        pool = HostPool(["http://a", "http://b"], probe=lambda url: True)
+
+        with pool.lease("http://a"):
+            assert pool.select() == "http://b"
+            with pool.lease("http://b"), pool.lease("http://b"):
+                assert pool.select() == "http://a"
+
+    def test_affinity_and_failover(self):
+        """Test that affinity sticks until the host fails"""
+        pool = HostPool(["http://a", "http://b"], probe=lambda url: False, health_check_interval=60)
+
+        first = pool.select("run-1")
+        other = "http://b" if first == "http://a" else "http://a"
+        with pool.lease(first):
+            assert pool.select("run-1") == first
+
+        pool.mark_failed(first)
+        assert pool.select("run-1") == other
+        assert pool.select("run-1") == other
+
+        pool.mark_failed(other)
+        assert pool.select("run-1") is None
+
+    def test_client_balances_and_fails_over(self, stand_in_servers):
+        """Test OllamaClient against two local stand-in servers"""
+        urls = [server_url(server) for server in stand_in_servers]
+        client = OllamaClient(hosts=urls, max_retries=2, retry_delay=0, affinity_key="run-1")
+
+        assert client.check_server() is True
+        assert client.ensure_model_ready() is True
+
+        first = client.generate("Test prompt")
+        assert first in {str(server.server_address[1]) for server in stand_in_servers}
+        assert client.generate("Test prompt") == first  # sticky
+
+        # Take the pinned host down; the request fails over to the other one
+        pinned = next(server for server in stand_in_servers if str(server.server_address[1]) == first)
+        pinned.shutdown()
+        pinned.server_close()
+
+        second = client.generate("Test prompt")
+        assert second is not None and second != first
+        assert client.host_pool.healthy_hosts() == [url for url in urls if url != server_url(pinned)]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
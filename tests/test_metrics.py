@@ -0,0 +1,126 @@
+"""
+Tests for metrics module
+"""
+
+import json
+
+import pytest
+import requests
+from unittest.mock import Mock, patch
+from src.metrics import MetricsRecorder, build_call_record
+from src.ollama_client import OllamaClient
+
+
+OLLAMA_TIMINGS = {
+    "total_duration": 5_000_000_000,
+    "load_duration": 1_000_000_000,
+    "prompt_eval_count": 200,
+    "prompt_eval_duration": 500_000_000,
+    "eval_count": 300,
+    "eval_duration": 3_000_000_000,
+}
+
+
+class TestBuildCallRecord:
+    """Test cases for build_call_record"""
+
+    def test_rates_and_durations(self):
+        """Test that Ollama nanosecond timings become seconds and tokens/sec"""
+        stats = {**OLLAMA_TIMINGS, "attempts": 2, "success": True, "host": "http://gpu1:11434"}
+        record = build_call_record(stats, step="phase1.desire_list", model="gpt-oss:20b", wall_seconds=6.0)
+
+        assert record["step"] == "phase1.desire_list"
+        assert record["prompt_tokens"] == 200
+        assert record["output_tokens"] == 300
+        assert record["load_seconds"] == pytest.approx(1.0)
+        assert record["prefill_tokens_per_sec"] == pytest.approx(400.0)
+        assert record["decode_tokens_per_sec"] == pytest.approx(100.0)
+        assert record["retries"] == 1
+
+    def test_missing_timings(self):
+        """Test that cached calls without timings have no rates"""
+        record = build_call_record({"cached": True, "success": True})
+        assert record["cached"] is True
+        assert record["decode_tokens_per_sec"] is None
+        assert record["step"] == "unknown"
+
+
+class TestMetricsRecorder:
+    """Test cases for MetricsRecorder"""
+
+    def test_writes_jsonl_and_prometheus(self, tmp_path):
+        """Test that records are appended and totals exported"""
+        recorder = MetricsRecorder(
+            jsonl_path=str(tmp_path / "calls.jsonl"),
+            prometheus_path=str(tmp_path / "ollama.prom"),
+            run_id="run1",
+        )
+        stats = {**OLLAMA_TIMINGS, "attempts": 1, "success": True}
+        recorder.record(build_call_record(stats, step="phase3.events", model="m", wall_seconds=5.5))
+        recorder.record(build_call_record(stats, step="phase3.events", model="m", wall_seconds=5.5))
+
+        lines = (tmp_path / "calls.jsonl").read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 2
+        assert json.loads(lines[0])["run_id"] == "run1"
+
+        prom = (tmp_path / "ollama.prom").read_text(encoding="utf-8")
+        assert 'ollama_calls_total{step="phase3.events",model="m",status="success",run_id="run1"} 2' in prom
+        assert 'ollama_output_tokens_total{step="phase3.events",model="m",run_id="run1"} 600' in prom
+        assert "# TYPE ollama_decode_seconds_total counter" in prom
+
+        summary = recorder.summary()
+        assert summary["calls"] == 2
+        assert summary["decode_seconds"] == pytest.approx(6.0)
+
+    @patch('requests.Session.post')
+    def test_client_records_calls(self, mock_post, tmp_path):
+        """Test that the client records step, tokens and retries per call"""
+        recorder = MetricsRecorder(jsonl_path=str(tmp_path / "calls.jsonl"))
+        client = OllamaClient(max_retries=2, retry_delay=0, metrics=recorder)
+
+        success = Mock(status_code=200)
+        success.json.return_value = {"response": "text", "done_reason": "stop", **OLLAMA_TIMINGS}
+        mock_post.side_effect = [requests.exceptions.Timeout("timed out"), success]
+
+        assert client.generate("Test prompt", step="phase5.chapter_01") == "text"
+
+        record = json.loads((tmp_path / "calls.jsonl").read_text(encoding="utf-8"))
+        assert record["step"] == "phase5.chapter_01"
+        assert record["model"] == "gpt-oss:20b"
+        assert record["retries"] == 1
+        assert record["output_tokens"] == 300
+        assert record["success"] is True
+
+    @patch('requests.Session.post')
+    def test_client_records_limiter_wait(self, mock_post, tmp_path):
+        """Test that time spent waiting for the rate limiter is recorded per call"""
+        recorder = MetricsRecorder(jsonl_path=str(tmp_path / "calls.jsonl"))
+        rate_limiter = Mock()
+        rate_limiter.acquire.return_value = 0.25
+        client = OllamaClient(max_retries=2, retry_delay=0, metrics=recorder, rate_limiter=rate_limiter)
+
+        success = Mock(status_code=200)
+        success.json.return_value = {"response": "text", "done_reason": "stop", **OLLAMA_TIMINGS}
+        mock_post.side_effect = [requests.exceptions.Timeout("timed out"), success]
+
+        assert client.generate("Test prompt", step="phase5.chapter_01") == "text"
+
+        record = json.loads((tmp_path / "calls.jsonl").read_text(encoding="utf-8"))
+        assert record["limiter_wait_seconds"] == pytest.approx(0.5)  # one wait per attempt
+        assert recorder.summary()["limiter_wait_seconds"] == pytest.approx(0.5)
+
+    def test_hedge_counters(self, tmp_path):
+        """Test that hedged calls and hedge wins are counted"""
+        recorder = MetricsRecorder(jsonl_path=str(tmp_path / "calls.jsonl"))
+        stats = {**OLLAMA_TIMINGS, "attempts": 1, "success": True}
+        recorder.record(build_call_record({**stats, "hedged": True, "hedge_won": True}, step="phase4.extract_keywords.01"))
+        recorder.record(build_call_record({**stats, "hedged": True}, step="phase4.extract_keywords.02"))
+        recorder.record(build_call_record(stats, step="phase4.extract_keywords.03"))
+
+        summary = recorder.summary()
+        assert summary["hedged_calls"] == 2
+        assert summary["hedge_wins"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
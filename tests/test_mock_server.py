@@ -0,0 +1,155 @@
+"""
+Tests for mock_server module
+"""
+
+import threading
+import time
+
+import pytest
+from unittest.mock import patch
+from src.mock_server import MockOllamaServer, parse_keep_alive, sample_from_schema
+from src.ollama_client import OllamaClient
+from src.pipeline import Pipeline
+from src.schema import validate_json_schema
+from src.utils import format_prompt, load_config, load_prompts
+
+
+def make_client(server: MockOllamaServer, **kwargs) -> OllamaClient:
+    """Create a client talking to the mock server"""
+    host, port = server.base_url.rsplit(":", 1)
+    return OllamaClient(host=host, port=int(port), retry_delay=0, **kwargs)
+
+
+@pytest.fixture
+def mock_server():
+    """Start a mock server without simulated latency"""
+    with MockOllamaServer() as server:
+        yield server
+
+
+class TestMockHelpers:
+    """Test cases for mock server helpers"""
+
+    def test_parse_keep_alive(self):
+        """Test keep_alive durations"""
+        assert parse_keep_alive("30m", 5) == 1800
+        assert parse_keep_alive(10, 5) == 10
+        assert parse_keep_alive(-1, 5) is None
+        assert parse_keep_alive(None, 5) == 5
+
+    def test_sample_from_schema_is_valid_for_every_prompt(self):
+        """Test that canned output satisfies every prompt schema"""
+        for key, prompt in load_prompts().items():
+            if "schema" in prompt:
+                sample = sample_from_schema(prompt["schema"])
+                assert validate_json_schema(sample, prompt["schema"]) == [], key
+
+
+class TestMockOllamaServer:
+    """Test cases for MockOllamaServer"""
+
+    def test_models_and_warm_up(self, mock_server):
+        """Test /api/tags, warm-up and /api/ps"""
+        client = make_client(mock_server, keep_alive="5m")
+
+        assert client.check_server()
+        assert client.check_model_available()
+        assert client.resident_models() == []
+        assert client.warm_up()
+        assert client.resident_models() == ["gpt-oss:20b"]
+
+    def test_generate_json_for_prompt_keys(self, mock_server):
+        """Test schema-valid output for schema and example-based prompts"""
+        client = make_client(mock_server)
+        prompts = load_prompts()
+
+        desire = prompts["desire_list"]
+        data = client.generate_json(
+            format_prompt(desire["user"], user_context="テスト"),
+            system_prompt=desire["system"],
+            schema=desire["schema"],
+        )
+        assert validate_json_schema(data, desire["schema"]) == []
+
+        extract = prompts["extract_chapter"]
+        data = client.generate_json(
+            format_prompt(extract["user"], plot="...", chapter_number=3),
+            system_prompt=extract["system"],
+        )
+        assert "chapter_3" in data
+
+    def test_streaming_and_chat(self, mock_server):
+        """Test streaming generation and /api/chat"""
+        client = make_client(mock_server)
+
+        stats = {}
+        text = client.generate_text("物語を書いてください", stream=True, stats=stats, max_tokens=50)
+        assert text
+        assert stats["done"] and stats["done_reason"] == "length"
+        assert stats["eval_count"] == 50
+
+        response = client.session.post(
+            f"{mock_server.base_url}/api/chat",
+            json={"model": "gpt-oss:20b", "messages": [{"role": "user", "content": "こんにちは"}], "stream": False},
+        )
+        assert response.json()["message"]["content"]
+
+    def test_unknown_model(self):
+        """Test that requests for models that are not installed fail with 404"""
+        with MockOllamaServer(models=["gpt-oss:20b"]) as server:
+            client = make_client(server, model="missing:1b")
+            assert not client.check_model_available()
+            assert client.generate("Test prompt") is None
+
+    def test_latency_model(self):
+        """Test load time, decode rate and concurrency slots"""
+        with MockOllamaServer(load_time=0.2, tokens_per_second=500, text_tokens=50, concurrency=1) as server:
+            client = make_client(server)
+
+            start = time.perf_counter()
+            stats = {}
+            client.generate("Test prompt", use_cache=False, stats=stats)
+            assert stats["load_duration"] >= 0.2e9
+            assert time.perf_counter() - start >= 0.2 + 0.1
+
+            # One slot: two concurrent requests are served one after the other
+            start = time.perf_counter()
+            threads = [threading.Thread(target=client.generate, args=("Test prompt",)) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert time.perf_counter() - start >= 2 * 0.1
+            assert server.loads == 1
+
+
+class TestPipelineWithMockServer:
+    """End-to-end pipeline run against the mock server"""
+
+    @patch('src.pipeline.load_config')
+    def test_full_pipeline(self, mock_load_config, tmp_path):
+        """Test that the whole pipeline runs offline with development.mock_api_calls"""
+        config = load_config("config/ollama_config.yaml")
+        config["development"]["mock_api_calls"] = True
+        config["output"]["base_dir"] = str(tmp_path)
+        config["checkpointing"]["output_dir"] = str(tmp_path / "checkpoints")
+        config["metrics"]["dir"] = str(tmp_path / "metrics")
+        config["metrics"]["prometheus_file"] = None
+        config["performance"]["use_context_cache"] = False
+        config["safety"]["rate_limit"]["enabled"] = False
+        mock_load_config.return_value = config
+
+        pipeline = Pipeline()
+        try:
+            results = pipeline.run_full_pipeline()
+        finally:
+            pipeline.close()
+
+        assert len(results["novels"]) == 10
+        assert (tmp_path / "novels" / "chapter_10.txt").exists()
+        assert (tmp_path / "references" / "characters.md").exists()
+        assert (tmp_path / "intermediate" / "19_future_scenarios.yaml").exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
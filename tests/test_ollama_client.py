@@ -2,10 +2,12 @@
 Tests for OllamaClient module
 """
 
+import json
+
 import pytest
 import requests
-from unittest.mock import Mock, patch
-from src.ollama_client import OllamaClient
+from unittest.mock import MagicMock, Mock, patch
+from src.ollama_client import OllamaClient, get_shared_session
 
 
 class TestOllamaClient:
@@ -23,12 +25,49 @@ class TestOllamaClient:
         assert client.model == "gpt-oss:20b"
         assert client.timeout == 300
         assert client.max_retries == 3
+        assert client.connect_timeout == 10
+
+    def test_clients_share_pooled_session(self):
+        """Test that clients with the same pool size share one session"""
+        client_a = OllamaClient(pool_size=3)
+        client_b = OllamaClient(pool_size=3)
+
+        assert client_a.session is client_b.session
+        assert client_a.session is get_shared_session(3)
+
+        adapter = client_a.session.get_adapter("http://localhost:11434")
+        assert adapter._pool_maxsize == 3
+
+    @patch('requests.Session.post')
+    def test_generate_uses_separate_timeouts(self, mock_post):
+        """Test that connect and read timeouts are passed separately"""
+        client = OllamaClient(timeout=120, connect_timeout=3)
+
+        mock_response = Mock()
+        mock_response.json.return_value = {"response": "ok"}
+        mock_post.return_value = mock_response
+
+        client.generate("Test prompt")
+        assert mock_post.call_args.kwargs["timeout"] == (3, 120)
+
+    @patch('requests.Session.post')
+    def test_pull_model_closes_stream(self, mock_post):
+        """Test that a failed pull returns its pooled connection"""
+        client = OllamaClient()
+
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
+        mock_response.iter_lines.return_value = [b'{"status": "pulling"}', b"not json"]
+        mock_post.return_value = mock_response
+
+        assert client.pull_model("m") is False
+        assert mock_response.__exit__.called
 
     def test_check_server_success(self):
         """Test server check when server is running"""
         client = OllamaClient()
 
-        with patch('requests.get') as mock_get:
+        with patch('requests.Session.get') as mock_get:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_get.return_value = mock_response
@@ -40,13 +79,13 @@ class TestOllamaClient:
         """Test server check when server is not running"""
         client = OllamaClient()
 
-        with patch('requests.get') as mock_get:
+        with patch('requests.Session.get') as mock_get:
             mock_get.side_effect = ConnectionError()
 
             result = client.check_server()
             assert result is False
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_generate_success(self, mock_post):
         """Test successful text generation"""
         client = OllamaClient()
@@ -61,7 +100,7 @@ class TestOllamaClient:
         result = client.generate("Test prompt")
         assert result == "Generated text"
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_generate_json_success(self, mock_post):
         """Test successful JSON generation"""
         client = OllamaClient()
@@ -76,7 +115,7 @@ class TestOllamaClient:
         result = client.generate_json("Test prompt")
         assert result == {"key": "value"}
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_generate_retry_on_timeout(self, mock_post):
         """Test retry mechanism on timeout"""
         client = OllamaClient(max_retries=2, retry_delay=0)
@@ -97,7 +136,7 @@ class TestOllamaClient:
         assert result == "Success"
         assert mock_post.call_count == 2
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_generate_retry_on_empty_response(self, mock_post):
         """Test retry on empty response from model"""
         client = OllamaClient(max_retries=2, retry_delay=0)
@@ -117,7 +156,7 @@ class TestOllamaClient:
         assert result == "Success"
         assert mock_post.call_count == 2
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_generate_all_retries_fail(self, mock_post):
         """Test that None is returned when all retries are exhausted"""
         client = OllamaClient(max_retries=2, retry_delay=0)
@@ -129,5 +168,137 @@ class TestOllamaClient:
         assert mock_post.call_count == 2
 
 
+    @patch('requests.Session.post')
+    def test_generate_stream_yields_chunks(self, mock_post):
+        """Test streaming generation yields NDJSON chunks and records stats"""
+        client = OllamaClient()
+
+        lines = [
+            json.dumps({"response": "Hello", "done": False}).encode(),
+            b"",
+            json.dumps({"response": " world", "done": False}).encode(),
+            json.dumps({"response": "", "done": True, "done_reason": "stop"}).encode(),
+        ]
+        mock_response = Mock()
+        mock_response.iter_lines.return_value = iter(lines)
+        mock_post.return_value = mock_response
+
+        received = []
+        stats = {}
+        chunks = list(client.generate_stream("Test prompt", on_chunk=received.append, stats=stats))
+
+        assert chunks == ["Hello", " world"]
+        assert received == chunks
+        assert stats["done"] is True
+        assert stats["done_reason"] == "stop"
+        assert stats["chunks"] == 2
+        assert stats["time_to_first_token"] is not None
+        assert mock_post.call_args.kwargs["json"]["stream"] is True
+        mock_response.close.assert_called_once()
+
+    @patch('requests.Session.post')
+    def test_generate_text_stream_interrupted(self, mock_post):
+        """Test that an interrupted stream is not retried and returns None"""
+        client = OllamaClient(max_retries=2, retry_delay=0)
+
+        def broken_lines():
+            yield json.dumps({"response": "partial", "done": False}).encode()
+            raise requests.exceptions.ChunkedEncodingError("connection lost")
+
+        mock_response = Mock()
+        mock_response.iter_lines.return_value = broken_lines()
+        mock_post.return_value = mock_response
+
+        result = client.generate_text("Test prompt", stream=True)
+        assert result is None
+        assert mock_post.call_count == 1
+
+
+    @patch('requests.Session.post')
+    def test_generate_sends_keep_alive_and_model_override(self, mock_post):
+        """Test that keep_alive and per-call model overrides reach the payload"""
+        client = OllamaClient(keep_alive="30m")
+
+        mock_response = Mock()
+        mock_response.json.return_value = {"response": "ok"}
+        mock_post.return_value = mock_response
+
+        client.generate("Test prompt", model="llama3:70b")
+        payload = mock_post.call_args.kwargs["json"]
+        assert payload["keep_alive"] == "30m"
+        assert payload["model"] == "llama3:70b"
+
+    @patch('requests.Session.post')
+    def test_warm_up_sends_empty_prompt(self, mock_post):
+        """Test that warm-up loads the model without generating tokens"""
+        client = OllamaClient(keep_alive=-1)
+        mock_post.return_value = Mock()
+
+        assert client.warm_up() is True
+        payload = mock_post.call_args.kwargs["json"]
+        assert payload == {"model": "gpt-oss:20b", "prompt": "", "stream": False, "keep_alive": -1}
+
+    @patch('requests.Session.get')
+    def test_order_by_model_puts_resident_models_first(self, mock_get):
+        """Test that calls are grouped by model, resident model first"""
+        client = OllamaClient()
+
+        mock_response = Mock()
+        mock_response.json.return_value = {"models": [{"name": "llama3:70b"}]}
+        mock_get.return_value = mock_response
+
+        calls = [("a", "gpt-oss:20b"), ("b", "llama3:70b"), ("c", "gpt-oss:20b"), ("d", "llama3:70b")]
+        ordered = client.order_by_model(calls, lambda call: call[1])
+
+        assert [name for name, _ in ordered] == ["b", "d", "a", "c"]
+        assert mock_get.call_args.args[0].endswith("/api/ps")
+
+
+    @patch('requests.Session.post')
+    def test_generate_json_sends_schema_and_reasks_on_mismatch(self, mock_post):
+        """Test that the schema is sent as format and invalid output is re-asked"""
+        client = OllamaClient(retry_delay=0)
+        schema = {
+            "type": "object",
+            "properties": {"keywords": {"type": "array", "items": {"type": "string"}}},
+            "required": ["keywords"],
+        }
+
+        invalid = Mock(status_code=200)
+        invalid.json.return_value = {"response": '{"words": ["a"]}'}
+        valid = Mock(status_code=200)
+        valid.json.return_value = {"response": '{"keywords": ["a", "b"]}'}
+        mock_post.side_effect = [invalid, valid]
+
+        result = client.generate_json("Test prompt", schema=schema, use_cache=False)
+
+        assert result == {"keywords": ["a", "b"]}
+        assert mock_post.call_count == 2
+        first, second = [call.kwargs["json"] for call in mock_post.call_args_list]
+        assert first["format"] == schema
+        assert "keywords" in second["prompt"]
+        assert second["prompt"].startswith("Test prompt")
+
+    @patch('requests.Session.post')
+    def test_generate_json_requests_missing_tail_when_truncated(self, mock_post):
+        """Test that output cut off at max_tokens is completed, not regenerated"""
+        client = OllamaClient(retry_delay=0)
+
+        truncated = Mock(status_code=200)
+        truncated.json.return_value = {
+            "response": '{"desires": ["願望1", "願望2", "願',
+            "done_reason": "length",
+        }
+        tail = Mock(status_code=200)
+        tail.json.return_value = {"response": '望3"]}', "done_reason": "stop"}
+        mock_post.side_effect = [truncated, tail]
+
+        result = client.generate_json("Test prompt", use_cache=False)
+
+        assert result == {"desires": ["願望1", "願望2", "願望3"]}
+        continuation = mock_post.call_args_list[1].kwargs["json"]
+        assert "format" not in continuation
+        assert '"願望2", "願' in continuation["prompt"]
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
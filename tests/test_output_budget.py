@@ -0,0 +1,157 @@
+"""
+Tests for output_budget module
+"""
+
+import json
+import pytest
+import requests
+from unittest.mock import Mock, patch
+from src.mock_server import MockOllamaServer
+from src.ollama_client import OllamaClient
+from src.output_budget import OutputBudget
+from src.response_cache import ResponseCache
+
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"keywords": {"type": "array", "items": {"type": "string"}}},
+    "required": ["keywords"],
+}
+
+
+class TestOutputBudget:
+    """Test cases for OutputBudget"""
+
+    def _record(self, budget, key, lengths):
+        for eval_count in lengths:
+            budget.record(key, {"eval_count": eval_count, "done_reason": "stop"})
+
+    def test_no_budget_without_history(self):
+        """Test that the caller's limit is used until min_samples outputs are known"""
+        budget = OutputBudget(min_samples=3)
+        self._record(budget, "phase4.extract_keywords", [100, 100])
+        assert budget.budget("phase4.extract_keywords", 4096) is None
+
+    def test_budget_is_percentile_times_margin(self):
+        """Test that the learned limit is the output length percentile times margin"""
+        budget = OutputBudget(percentile=99, margin=1.5, min_samples=5, min_tokens=10)
+        self._record(budget, "step", list(range(100, 200)))
+
+        assert budget.budget("step", 4096) == 297  # p99 = 198
+        assert budget.budget("step", 200) is None  # never above the caller's limit
+        assert budget.stats()["budgeted"] == 1
+
+    def test_min_tokens(self):
+        """Test that a learned limit is never below min_tokens"""
+        budget = OutputBudget(min_samples=1, min_tokens=256)
+        self._record(budget, "step", [10])
+        assert budget.budget("step", 4096) == 256
+
+    def test_ignores_cached_and_truncated(self):
+        """Test that only complete, uncached outputs are learned from"""
+        budget = OutputBudget()
+        assert not budget.record("step", {"eval_count": 50, "cached": True})
+        assert not budget.record("step", {"eval_count": 50, "done_reason": "length"})
+        assert not budget.record("step", {"eval_count": 50, "done_reason": "stop", "follow_up": "continuation"})
+        assert not budget.record("step", {"eval_count": 50, "done_reason": "stop", "follow_up": "repair"})
+        assert not budget.record("step", {"eval_count": None})
+        assert budget.record("step", {"eval_count": 50, "done_reason": "stop"})
+
+    def test_grow(self):
+        """Test that a hit budget grows up to the caller's limit"""
+        budget = OutputBudget(growth=2.0)
+        assert budget.grow(300, 4096) == 600
+        assert budget.grow(3000, 4096) == 4096
+        assert budget.stats()["retries"] == 2
+
+    def test_load_history(self, tmp_path):
+        """Test that recorded metrics of earlier runs seed the history by step kind"""
+        records = [
+            {"step": f"phase4.extract_keywords.{n:02d}", "success": True, "cached": False,
+             "done_reason": "stop", "output_tokens": 100 + n}
+            for n in range(1, 6)
+        ]
+        records.append({"step": "phase4.extract_keywords.06", "success": False, "output_tokens": 9999})
+        records.append({"step": "phase4.extract_keywords.07", "success": True, "cached": False,
+                        "done_reason": "stop", "output_tokens": 9999, "follow_up": "continuation"})
+        path = tmp_path / "calls_run.jsonl"
+        path.write_text("\n".join(json.dumps(record) for record in records) + "\n", encoding="utf-8")
+
+        budget = OutputBudget(margin=1.0, min_samples=5, min_tokens=1)
+        assert budget.load_history([path, tmp_path / "missing.jsonl"]) == 5
+        assert budget.budget("phase4.extract_keywords", 4096) == 105
+
+
+class TestBudgetedRequests:
+    """generate_json with learned limits against the mock server"""
+
+    def test_budget_sent_as_num_predict(self):
+        """Test that a learned limit replaces the flat max_tokens"""
+        budget = OutputBudget(min_samples=1, min_tokens=1, margin=1.0)
+        budget.record("phase4.extract_keywords", {"eval_count": 2000})
+
+        with MockOllamaServer() as server:
+            client = OllamaClient(hosts=[server.base_url], output_budget=budget, max_retries=1)
+            with patch.object(server, "canned_output", wraps=server.canned_output) as canned:
+                data = client.generate_json(
+                    "キーワードを抽出してください。", schema=SCHEMA, step="phase4.extract_keywords.01"
+                )
+
+        assert data is not None
+        assert canned.call_args.args[2] == 2000
+
+    def test_truncated_call_retried_with_larger_budget(self):
+        """Test that output cut off at the learned limit is regenerated with a larger one"""
+        budget = OutputBudget(min_samples=1, min_tokens=1, margin=1.0, growth=100.0)
+        budget.record("phase4.extract_keywords", {"eval_count": 2})
+
+        with MockOllamaServer() as server:
+            client = OllamaClient(hosts=[server.base_url], output_budget=budget, max_retries=1)
+            with patch.object(server, "canned_output", wraps=server.canned_output) as canned:
+                data = client.generate_json(
+                    "キーワードを抽出してください。", schema=SCHEMA, step="phase4.extract_keywords.01"
+                )
+
+        assert data is not None and "keywords" in data
+        assert [call.args[2] for call in canned.call_args_list] == [2, 200]
+        assert budget.stats()["retries"] == 1
+
+
+    @patch('requests.Session.post')
+    def test_output_cut_at_budget_is_not_cached(self, mock_post, tmp_path):
+        """Test that output cut off at a learned limit never becomes the cached answer"""
+        budget = OutputBudget(min_samples=1, min_tokens=1, margin=1.0)
+        budget.record("phase4.extract_keywords", {"eval_count": 2})
+        cache = ResponseCache(cache_dir=str(tmp_path))
+
+        truncated = Mock()
+        truncated.json.return_value = {"response": '{"keywords": ["a"', "done_reason": "length", "eval_count": 2}
+        mock_post.side_effect = [truncated, requests.exceptions.ConnectionError("lost")]
+
+        client = OllamaClient(port=21101, output_budget=budget, cache=cache, max_retries=1, max_validation_retries=0)
+        client.generate_json("キーワードを抽出してください。", schema=SCHEMA, step="phase4.extract_keywords.01")
+
+        assert cache.stats()["entries"] == 0
+
+    @patch('requests.Session.post')
+    def test_continuation_is_not_learned(self, mock_post):
+        """Test that the short tail of a continuation never becomes a learned output length"""
+        budget = OutputBudget(min_samples=1, min_tokens=1, margin=1.0)
+        truncated, rest = Mock(), Mock()
+        truncated.json.return_value = {"response": '{"keywords": ["a"', "done_reason": "length", "eval_count": 4096}
+        rest.json.return_value = {"response": ', "b"]}', "done_reason": "stop", "eval_count": 5}
+        mock_post.side_effect = [truncated, rest]
+        metrics = Mock()
+
+        client = OllamaClient(port=21102, output_budget=budget, metrics=metrics, max_retries=1)
+        data = client.generate_json("キーワードを抽出してください。", schema=SCHEMA, step="phase4.extract_keywords.01")
+
+        assert data == {"keywords": ["a", "b"]}
+        assert budget.budget("phase4.extract_keywords", 8192) is None
+        assert [record["follow_up"] for record in (call.args[0] for call in metrics.record.call_args_list)] == [
+            None, "continuation",
+        ]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,158 @@
+"""
+Tests for packing module
+"""
+
+import pytest
+from unittest.mock import Mock
+from src.packing import PromptPacker, build_packed_prompt, packed_schema
+from src.prompt_budget import PromptBudgeter
+from src.token_counter import TokenCounter, local_token_estimate
+
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"keywords": {"type": "array", "items": {"type": "string"}}},
+    "required": ["keywords"],
+}
+
+TEMPLATE = "プロット:\n{plot}\n\n第{chapter_num}章のキーワードを抽出してください。"
+
+
+class TestBuildPackedPrompt:
+    """Test cases for build_packed_prompt"""
+
+    def test_shared_data_rendered_once(self):
+        """Test that shared variables appear once and tasks reference them"""
+        prompt = build_packed_prompt(
+            TEMPLATE,
+            {"01": {"chapter_num": 1}, "02": {"chapter_num": 2}},
+            shared={"plot": "長いプロット本文"},
+        )
+
+        assert prompt.count("長いプロット本文") == 1
+        assert prompt.count("（共通データ「plot」を参照）") == 2
+        assert "## タスク 01" in prompt and "## タスク 02" in prompt
+        assert "第2章" in prompt
+
+    def test_packed_schema(self):
+        """Test that every slot is a required property"""
+        schema = packed_schema({"01": SCHEMA, "02": SCHEMA})
+        assert schema["required"] == ["01", "02"]
+        assert schema["properties"]["01"] == SCHEMA
+
+
+class TestPromptPacker:
+    """Test cases for PromptPacker"""
+
+    def _items(self, count):
+        return {f"{n:02d}": {"chapter_num": n} for n in range(1, count + 1)}
+
+    def test_answers_split_by_slot(self):
+        """Test that one packed request answers every slot"""
+        client = Mock()
+        client.generate_json.return_value = {"01": {"keywords": ["a"]}, "02": {"keywords": ["b"]}}
+
+        packer = PromptPacker(client, pack_size=10)
+        results = packer.generate_json(TEMPLATE, self._items(2), shared={"plot": "p"}, schema=SCHEMA, step="phase4.kw")
+
+        assert results == {"01": {"keywords": ["a"]}, "02": {"keywords": ["b"]}}
+        assert client.generate_json.call_count == 1
+        assert client.generate_json.call_args.kwargs["step"] == "phase4.kw.packed"
+        assert packer.stats() == {"packed_requests": 1, "packed_slots": 2, "fallbacks": 0}
+
+    def test_invalid_slot_falls_back(self):
+        """Test that a missing or invalid slot is sent as a separate request"""
+        client = Mock()
+        client.generate_json.side_effect = [
+            {"01": {"keywords": ["a"]}, "02": {"wrong": 1}},
+            {"keywords": ["b"]},
+            {"keywords": ["c"]},
+        ]
+
+        packer = PromptPacker(client, pack_size=10)
+        results = packer.generate_json(TEMPLATE, self._items(3), shared={"plot": "p"}, schema=SCHEMA, step="phase4.kw")
+
+        assert results["02"] == {"keywords": ["b"]}
+        assert results["03"] == {"keywords": ["c"]}
+        fallback_steps = [call.kwargs["step"] for call in client.generate_json.call_args_list[1:]]
+        assert fallback_steps == ["phase4.kw.02", "phase4.kw.03"]
+        # The fallback uses the ordinary prompt with the shared data inlined
+        assert "プロット:\np" in client.generate_json.call_args_list[1].args[0]
+        assert packer.stats()["fallbacks"] == 2
+
+    def test_pack_size(self):
+        """Test that requests are split into packs of at most pack_size"""
+        client = Mock()
+        client.generate_json.side_effect = lambda prompt, **kwargs: {
+            slot: {"keywords": [slot]} for slot in kwargs["output_format"]["required"]
+        }
+
+        packer = PromptPacker(client, pack_size=4)
+        results = packer.generate_json(TEMPLATE, self._items(10), shared={"plot": "p"}, schema=SCHEMA)
+
+        assert len(results) == 10
+        assert client.generate_json.call_count == 3
+
+    def test_packs_fit_context_window(self):
+        """Test that a pack is closed early when its prompt would not fit"""
+        client = Mock()
+        client.generate_json.side_effect = lambda prompt, **kwargs: {
+            slot: {"keywords": [slot]} for slot in kwargs["output_format"]["required"]
+        }
+        budgeter = PromptBudgeter(TokenCounter(), max_context_length=1200)
+        items = {f"{n:02d}": {"chapter_num": n, "plot": "あ" * 150} for n in range(1, 7)}
+
+        packer = PromptPacker(client, pack_size=10, budgeter=budgeter)
+        results = packer.generate_json(TEMPLATE, items, schema=SCHEMA, max_tokens=100)
+
+        assert len(results) == 6
+        assert client.generate_json.call_count > 1
+        for call in client.generate_json.call_args_list:
+            assert budgeter.counter.count(call.args[0]) <= budgeter.prompt_limit(call.kwargs["max_tokens"])
+
+    def test_packed_output_fits_context_window(self):
+        """Test that a pack is closed early when every slot's output would not fit next to the prompt"""
+        client = Mock()
+        client.generate_json.side_effect = lambda prompt, **kwargs: {
+            slot: {"keywords": [slot]} for slot in kwargs["output_format"]["required"]
+        }
+
+        packer = PromptPacker(client, pack_size=10, context_length=1000)
+        results = packer.generate_json(TEMPLATE, self._items(6), shared={"plot": "p"}, schema=SCHEMA, max_tokens=300)
+
+        assert len(results) == 6
+        for call in client.generate_json.call_args_list:
+            slots = len(call.kwargs["output_format"]["required"])
+            assert call.kwargs["max_tokens"] == 300 * slots
+            assert local_token_estimate(call.args[0]) + call.kwargs["max_tokens"] <= 1000
+        assert max(len(call.kwargs["output_format"]["required"]) for call in client.generate_json.call_args_list) == 2
+
+    def test_packed_text_output_fits_context_window(self):
+        """Test that packed free-text answers are limited by the context window too"""
+        client = Mock()
+        client.generate_json.side_effect = lambda prompt, **kwargs: {
+            slot: f"# {slot}" for slot in kwargs["output_format"]["required"]
+        }
+        items = {f"{name}.md": {"name": name} for name in "ABCD"}
+
+        packer = PromptPacker(client, pack_size=4, context_length=4096)
+        results = packer.generate_text("{name}の説明", items, max_tokens=1500)
+
+        assert results == {filename: f"# {filename}" for filename in items}
+        assert [call.kwargs["max_tokens"] for call in client.generate_json.call_args_list] == [3000, 3000]
+
+    def test_text_slots(self):
+        """Test that free-text answers are packed as strings"""
+        client = Mock()
+        client.generate_json.return_value = {"a.md": "# A", "b.md": ""}
+        client.generate_text.return_value = "# B"
+
+        packer = PromptPacker(client, pack_size=3)
+        results = packer.generate_text("{name}の説明", {"a.md": {"name": "A"}, "b.md": {"name": "B"}}, step="phase6")
+
+        assert results == {"a.md": "# A", "b.md": "# B"}
+        assert client.generate_text.call_args.kwargs["step"] == "phase6.b.md"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -2,8 +2,11 @@
 Tests for Pipeline module
 """
 
+import asyncio
+import threading
+import time
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
 from pathlib import Path
 from src.pipeline import Pipeline
 
@@ -107,5 +110,384 @@ class TestPipeline:
         assert pipeline.client.generate_json.called
 
 
+    @patch('src.pipeline.load_config')
+    @patch('src.pipeline.load_prompts')
+    def test_prompt_budget_is_opt_in(self, mock_load_prompts, mock_load_config, mock_config, mock_prompts):
+        """Test that prompts are only cut to the context window when prompt_budget is enabled"""
+        mock_config["performance"] = {"max_context_length": 1024, "token_counter": {"use_server": False}}
+        mock_load_config.return_value = mock_config
+        mock_load_prompts.return_value = mock_prompts
+        long_context = "あ" * 2000
+
+        pipeline = Pipeline()
+        assert pipeline.prompt_budgeter is None
+        assert long_context in pipeline._fit_prompt(mock_prompts["desire_list"], 256, user_context=long_context)
+
+        mock_config["performance"]["prompt_budget"] = {"enabled": True}
+        pipeline = Pipeline()
+        prompt = pipeline._fit_prompt(mock_prompts["desire_list"], 256, user_context=long_context)
+        assert long_context not in prompt
+        assert pipeline.prompt_budgeter.stats()["fitted"] == 1
+
+    @patch('src.pipeline.load_config')
+    @patch('src.pipeline.load_prompts')
+    def test_incremental_rebuild(self, mock_load_prompts, mock_load_config, mock_config, tmp_path):
+        """Test that a rerun skips steps whose inputs are unchanged"""
+        mock_config["output"]["base_dir"] = str(tmp_path)
+        mock_config["incremental"] = {"enabled": True}
+        mock_load_config.return_value = mock_config
+        mock_load_prompts.return_value = {
+            "desire_list": {"user": "Generate desires from: {user_context}"},
+            "ability_list": {"user": "Generate abilities from: {user_context}"},
+        }
+
+        first = Pipeline()
+        first.client.generate_json = Mock(side_effect=lambda prompt, **kwargs: {"items": [kwargs["step"]]})
+        results = first.run_phase1_expansion("context")
+        assert first.fingerprints.stats() == {"rebuilt": 2, "skipped": 0}
+
+        # Same inputs: nothing is sent and the saved output is read back
+        second = Pipeline()
+        second.client.generate_json = Mock()
+        assert second.run_phase1_expansion("context") == results
+        assert not second.client.generate_json.called
+        assert second.fingerprints.stats() == {"rebuilt": 0, "skipped": 2}
+
+        # A changed prompt rebuilds only that step
+        mock_load_prompts.return_value["ability_list"]["user"] = "List abilities for: {user_context}"
+        third = Pipeline()
+        third.client.generate_json = Mock(return_value={"items": ["new"]})
+        assert third.run_phase1_expansion("context")["ability_list"] != results["ability_list"]
+        assert [call.kwargs["step"] for call in third.client.generate_json.call_args_list] == ["phase1.ability_list"]
+        assert third.fingerprints.stats() == {"rebuilt": 1, "skipped": 1}
+
+    @patch('src.pipeline.load_config')
+    @patch('src.pipeline.load_prompts')
+    def test_incremental_phase2_sample_is_deterministic(
+        self, mock_load_prompts, mock_load_config, mock_config, tmp_path
+    ):
+        """Test that Phase 2 samples the same lists the same way in incremental mode"""
+        mock_config["output"]["base_dir"] = str(tmp_path)
+        mock_config["incremental"] = {"enabled": True, "seed": 7}
+        mock_load_config.return_value = mock_config
+        mock_load_prompts.return_value = {"characters": {"user": "{desire_sample} {ability_sample} {role_sample}"}}
+        phase1_results = {
+            "desire_list": "desires: [%s]" % ", ".join(f"d{i}" for i in range(30)),
+            "ability_list": "abilities: [%s]" % ", ".join(f"a{i}" for i in range(30)),
+            "role_list": "roles: [%s]" % ", ".join(f"r{i}" for i in range(30)),
+        }
+
+        first = Pipeline()
+        first.client.generate_json = Mock(return_value={"characters": []})
+        first.run_phase2_characters("context", phase1_results)
+
+        second = Pipeline()
+        second.client.generate_json = Mock()
+        second.run_phase2_characters("context", phase1_results)
+
+        assert not second.client.generate_json.called
+        assert second.fingerprints.stats() == {"rebuilt": 0, "skipped": 1}
+
+    @patch('src.pipeline.load_config')
+    @patch('src.pipeline.load_prompts')
+    def test_run_phase5_streaming_writes_files(
+        self, mock_load_prompts, mock_load_config, mock_config, tmp_path
+    ):
+        """Test Phase 5 streaming mode writes chapters to disk"""
+        mock_config["output"]["base_dir"] = str(tmp_path)
+        mock_config["phases"]["phase5_novel"] = {"streaming": True}
+        mock_load_config.return_value = mock_config
+        mock_load_prompts.return_value = {
+            "story_chapter": {
+                "system": "System prompt",
+                "user": "Chapter {chapter_number}: {chapter_plot} {chapter_references} {characters_list}",
+            }
+        }
+
+        pipeline = Pipeline()
+
+        def fake_stream(prompt, **kwargs):
+            for chunk in ["第", "一", "章"]:
+                kwargs["on_chunk"](chunk)
+            kwargs["stats"].update(done=True, time_to_first_token=0.1, total_time=0.2)
+            return "第一章"
+
+        pipeline.client.generate_text = Mock(side_effect=fake_stream)
+
+        novels = pipeline.run_phase5_novel_generation("characters", {})
+
+        assert novels["story_1"] == "第一章"
+        chapter_file = tmp_path / "novels" / "chapter_01.txt"
+        assert chapter_file.read_text(encoding="utf-8") == "第一章"
+        assert not (tmp_path / "novels" / "chapter_01.txt.part").exists()
+        assert pipeline.client.generate_text.call_args.kwargs["stream"] is True
+
+    @patch('src.pipeline.load_config')
+    @patch('src.pipeline.load_prompts')
+    def test_phase_runs_inside_event_loop(self, mock_load_prompts, mock_load_config, mock_config, tmp_path):
+        """Test that graph-based phases work when called from a running event loop (e.g. Jupyter)"""
+        mock_config["output"]["base_dir"] = str(tmp_path)
+        mock_load_config.return_value = mock_config
+        mock_load_prompts.return_value = {"story_chapter": {"user": "Chapter {chapter_number}"}}
+
+        pipeline = Pipeline()
+        pipeline.client.generate_text = Mock(side_effect=lambda prompt, **kwargs: prompt)
+
+        async def from_notebook():
+            novels = pipeline.run_phase5_novel_generation("characters", {})
+            novels_async = await pipeline.run_phase5_novel_generation_async("characters", {})
+            return novels, novels_async
+
+        novels, novels_async = asyncio.run(from_notebook())
+
+        assert novels == novels_async
+        assert novels["story_10"] == "Chapter 10"
+
+    @patch('src.pipeline.load_config')
+    @patch('src.pipeline.load_prompts')
+    def test_run_phase3_with_digests(self, mock_load_prompts, mock_load_config, mock_config, tmp_path):
+        """Test that Phase 3 passes digests except for verbatim dependencies"""
+        mock_config["output"]["base_dir"] = str(tmp_path)
+        mock_config["phases"]["phase3_world"] = {
+            "digests": {"enabled": True, "verbatim": {"interpretation": ["observation"]}},
+        }
+        mock_load_config.return_value = mock_config
+        mock_load_prompts.return_value = {
+            "events": {"user": "Events"},
+            "observation": {"user": "Observation of {events}"},
+            "interpretation": {"user": "Interpretation of {events} / {observation}"},
+            "world_digest": {"user": "Summarize {element_name}: {element_data}"},
+        }
+
+        pipeline = Pipeline()
+        pipeline.async_client.generate_json = AsyncMock(
+            side_effect=lambda prompt, **kwargs: {"detail": kwargs["step"] + " " + "x" * 400}
+        )
+        pipeline.async_client.generate_text = AsyncMock(return_value="digest")
+
+        world_data = pipeline.run_phase3_world_building({"plottype": "type"})
+
+        assert set(world_data) == {"events", "observation", "interpretation"}
+        interpretation_prompt = pipeline.async_client.generate_json.call_args_list[2].args[0]
+        assert "Interpretation of digest / detail: phase3.observation" in interpretation_prompt
+        # Each element is summarized once, however many elements read it
+        digest_steps = [call.kwargs["step"] for call in pipeline.async_client.generate_text.call_args_list]
+        assert digest_steps == ["phase3.digest.events"]
+        assert (tmp_path / "intermediate" / "digests" / "events.md").read_text(encoding="utf-8") == "digest"
+
+    @patch('src.pipeline.load_config')
+    @patch('src.pipeline.load_prompts')
+    def test_pipeline_graph_dependencies(self, mock_load_prompts, mock_load_config, mock_config):
+        """Test that full-pipeline steps wait only for the steps whose output they read"""
+        mock_load_config.return_value = mock_config
+        mock_load_prompts.return_value = {"events": {"user": "Events"}, "observation": {"user": "{events}"}}
+
+        pipeline = Pipeline()
+        graph = pipeline._build_pipeline_graph("context", {
+            "phase1": {}, "characters_list": "", "world_data": {}, "plot_data": {}, "novels": {}, "references": {},
+        })
+        graph.order()
+
+        assert graph.dependencies("phase1.plottype_list") == []
+        assert graph.dependencies("phase3.events") == ["phase1.plottype_selection"]
+        assert graph.dependencies("phase3.observation") == ["phase1.plottype_selection", "phase3.events"]
+        assert graph.dependencies("phase6.desire_list.md") == ["phase1.desire_list"]
+        assert graph.dependencies("phase6.events.md") == ["phase3.events"]
+        assert graph.dependencies("phase5.chapter_03") == ["phase2.characters", "phase4.search_references.03"]
+        assert "phase3.checkpoint" in graph.dependencies("phase4.search_references.03")
+
+    @patch('src.pipeline.load_config')
+    @patch('src.pipeline.load_prompts')
+    def test_run_phase4_chapter_chains(self, mock_load_prompts, mock_load_config, mock_config, tmp_path):
+        """Test that concurrent chapter chains match a serial run and fail independently"""
+        mock_load_prompts.return_value = {
+            "plot": {"user": "Plot for {plottype}"},
+            "extract_chapter": {"user": "Chapter {chapter_number} of {plot}"},
+            "extract_keywords": {"user": "Keywords of {chapter_plot}"},
+            "search_references": {"user": "References for {keywords} in {world_data}"},
+        }
+
+        def generate_json(prompt, **kwargs):
+            if kwargs["step"] == "phase4.extract_keywords.03":
+                raise RuntimeError("server down")
+            return {"step": kwargs["step"], "prompt_length": len(prompt)}
+
+        runs = {}
+        for concurrency in (1, 4):
+            mock_config["output"]["base_dir"] = str(tmp_path / str(concurrency))
+            mock_config["phases"]["phase4_plot"] = {"packing": False, "max_concurrency": concurrency}
+            mock_load_config.return_value = mock_config
+            pipeline = Pipeline()
+            pipeline.client.generate_json = Mock(side_effect=generate_json)
+            plot_data = pipeline.run_phase4_plot_generation("context", {"plottype": "type"}, "characters", {"events": "e"})
+            files = sorted((tmp_path / str(concurrency) / "intermediate").iterdir())
+            runs[concurrency] = (list(plot_data.items()), [(f.name, f.read_bytes()) for f in files])
+
+        assert runs[1] == runs[4]
+        plot_data = dict(runs[4][0])
+        assert "plot_3" in plot_data and "plot_reference_3" not in plot_data
+        assert "plot_reference_10" in plot_data
+
+    @patch('src.pipeline.load_config')
+    @patch('src.pipeline.load_prompts')
+    def test_run_phase5_concurrent_chapters(self, mock_load_prompts, mock_load_config, mock_config, tmp_path):
+        """Test that chapters are generated concurrently and saved in order"""
+        mock_config["output"]["base_dir"] = str(tmp_path)
+        mock_config["phases"]["phase5_novel"] = {"max_concurrency": 3}
+        mock_load_config.return_value = mock_config
+        mock_load_prompts.return_value = {
+            "story_chapter": {"user": "Chapter {chapter_number}: {chapter_plot} {chapter_references} {characters_list}"},
+        }
+
+        running, peak = [], []
+        lock = threading.Lock()
+
+        def generate_text(prompt, **kwargs):
+            with lock:
+                running.append(kwargs["step"])
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(kwargs["step"])
+            return f"text of {kwargs['step']}"
+
+        pipeline = Pipeline()
+        pipeline.client.generate_text = Mock(side_effect=generate_text)
+
+        novels = pipeline.run_phase5_novel_generation("characters", {})
+
+        assert list(novels) == [f"story_{n}" for n in range(1, 11)]
+        assert max(peak) == 3
+        assert (tmp_path / "novels" / "chapter_07.txt").read_text(encoding="utf-8") == "text of phase5.chapter_07"
+        assert not list((tmp_path / "novels").glob("*.tmp"))
+
+    @patch('src.pipeline.load_config')
+    @patch('src.pipeline.load_prompts')
+    def test_run_phase6_writes_references_as_they_finish(
+        self, mock_load_prompts, mock_load_config, mock_config, tmp_path
+    ):
+        """Test that references run concurrently and each file is saved when its call finishes"""
+        mock_config["output"]["base_dir"] = str(tmp_path)
+        mock_config["phases"]["phase6_references"] = {"max_concurrency": 3}
+        mock_load_config.return_value = mock_config
+        mock_load_prompts.return_value = {
+            "reference_characters": {"user": "Characters: {characters_list}"},
+            "reference_user_context": {"user": "Context: {user_context}"},
+            "reference_world_element": {"user": "{element_name}: {element_data}"},
+        }
+        fast_file = tmp_path / "references" / "user_context.md"
+
+        def generate_text(prompt, **kwargs):
+            if kwargs["step"] == "phase6.characters.md":
+                # Only finishes if another reference was saved while this call ran
+                deadline = time.monotonic() + 5
+                while not fast_file.exists() and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                return "# Characters" if fast_file.exists() else None
+            return f"# {kwargs['step']}"
+
+        pipeline = Pipeline()
+        pipeline.client.generate_text = Mock(side_effect=generate_text)
+
+        references = pipeline.run_phase6_reference_generation(
+            "context", {}, "characters", {"events": "e", "media": "m"}, {}
+        )
+
+        assert list(references) == ["characters.md", "user_context.md", "events.md", "media.md"]
+        assert references["characters.md"] == "# Characters"
+        assert (tmp_path / "references" / "media.md").read_text(encoding="utf-8") == "# phase6.media.md"
+
+    @patch('src.pipeline.load_config')
+    @patch('src.pipeline.load_prompts')
+    def test_pipeline_graph_hands_chapters_to_phase5(
+        self, mock_load_prompts, mock_load_config, mock_config, tmp_path
+    ):
+        """Test that a chapter's novel starts before the other chapters' extraction is done"""
+        mock_config["output"]["base_dir"] = str(tmp_path)
+        mock_config["checkpointing"]["output_dir"] = str(tmp_path / "checkpoints")
+        mock_config["phases"]["phase4_plot"] = {"packing": False}
+        mock_load_config.return_value = mock_config
+        mock_load_prompts.return_value = {
+            "plot": {"user": "Plot"},
+            "extract_chapter": {"user": "Chapter {chapter_number} of {plot}"},
+            "extract_keywords": {"user": "Keywords of {chapter_plot}"},
+            "search_references": {"user": "References for {keywords}"},
+            "story_chapter": {"user": "Chapter {chapter_number}: {chapter_plot} {chapter_references}"},
+        }
+
+        def generate_json(prompt, **kwargs):
+            time.sleep(0.005)
+            return {"step": kwargs["step"]}
+
+        def generate_text(prompt, **kwargs):
+            time.sleep(0.05)
+            return "text"
+
+        pipeline = Pipeline()
+        pipeline.client.generate_json = Mock(side_effect=generate_json)
+        pipeline.client.generate_text = Mock(side_effect=generate_text)
+        state = {"phase1": {}, "characters_list": "", "world_data": {}, "plot_data": {}, "novels": {}, "references": {}}
+        graph = pipeline._build_pipeline_graph("context", state)
+        asyncio.run(graph.run())
+
+        assert len(state["novels"]) == 10
+        assert graph.timings["phase5.chapter_01"][0] < graph.timings["phase4.search_references.10"][0]
+
+    @patch('src.pipeline.load_config')
+    @patch('src.pipeline.load_prompts')
+    def test_phase4_checkpoint_leaves_plot_data_to_phase5(
+        self, mock_load_prompts, mock_load_config, mock_config, tmp_path
+    ):
+        """Test that a Phase 5 step running during the Phase 4 checkpoint sees plot_data untouched"""
+        mock_config["output"]["base_dir"] = str(tmp_path)
+        mock_config["checkpointing"]["output_dir"] = str(tmp_path / "checkpoints")
+        mock_config["phases"]["phase4_plot"] = {"packing": False}
+        mock_load_config.return_value = mock_config
+        mock_load_prompts.return_value = {
+            "plot": {"user": "Plot"},
+            "extract_chapter": {"user": "Chapter {chapter_number} of {plot}"},
+            "extract_keywords": {"user": "Keywords of {chapter_plot}"},
+            "search_references": {"user": "References for {keywords}"},
+            "story_chapter": {"user": "Chapter {chapter_number}: {chapter_plot} {chapter_references}"},
+        }
+
+        mutations = []
+
+        class WatchedDict(dict):
+            def clear(self):
+                mutations.append("clear")
+                super().clear()
+
+        checkpoint_started, chapter_running = threading.Event(), threading.Event()
+        overlapped, saved = [], {}
+
+        def save_checkpoint(phase_name, data):
+            if phase_name == "phase4_plot":
+                checkpoint_started.set()
+                overlapped.append(chapter_running.wait(5))
+            saved[phase_name] = data
+
+        def generate_text(prompt, **kwargs):
+            if kwargs["step"] == "phase5.chapter_10":
+                chapter_running.set()
+                overlapped.append(checkpoint_started.wait(5))
+            return prompt
+
+        pipeline = Pipeline()
+        pipeline.checkpoint_manager.save_checkpoint = Mock(side_effect=save_checkpoint)
+        pipeline.client.generate_json = Mock(side_effect=lambda prompt, **kwargs: {"step": kwargs["step"]})
+        pipeline.client.generate_text = Mock(side_effect=generate_text)
+        state = {
+            "phase1": {}, "characters_list": "", "world_data": {}, "plot_data": WatchedDict(), "novels": {}, "references": {},
+        }
+        graph = pipeline._build_pipeline_graph("context", state)
+        asyncio.run(graph.run())
+
+        assert overlapped == [True, True]
+        assert mutations == []
+        assert "phase4.search_references.10" in state["novels"]["story_10"]
+        assert list(saved["phase4_plot"]) == list(pipeline._ordered_plot(state["plot_data"]))
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,70 @@
+"""
+Tests for prompt_budget module
+"""
+
+import pytest
+from src.prompt_budget import HEAD_CUT_MARK, TAIL_CUT_MARK, PromptBudgeter
+from src.token_counter import TokenCounter
+
+
+TEMPLATE = "キーワード: {keywords}\n\n世界設定:\n{world_data}\n"
+
+
+def _budgeter(strategy, window=1000):
+    # ASCII text: about four characters per token
+    return PromptBudgeter(TokenCounter(), max_context_length=window, strategy=strategy)
+
+
+class TestPromptBudgeter:
+    """Test cases for PromptBudgeter"""
+
+    def test_short_prompt_unchanged(self):
+        """Test that a prompt that fits is returned as formatted"""
+        budgeter = _budgeter("sliding_window")
+        prompt = budgeter.fit(TEMPLATE, {"keywords": "a", "world_data": "b"}, output_tokens=100)
+        assert prompt == TEMPLATE.format(keywords="a", world_data="b")
+        assert budgeter.stats()["fitted"] == 0
+
+    def test_output_reserve(self):
+        """Test that the output reserve is at most half the window"""
+        budgeter = _budgeter("sliding_window", window=8192)
+        assert budgeter.prompt_limit(100) == 8192 - 100 - 64
+        assert budgeter.prompt_limit(40960) == 4096 - 64
+
+    def test_sliding_window_keeps_the_end(self):
+        """Test that sliding_window cuts long variables from the front"""
+        budgeter = _budgeter("sliding_window")
+        world_data = "\n".join(f"line {n:04d} " + "x" * 30 for n in range(200))
+
+        prompt = budgeter.fit(TEMPLATE, {"keywords": "k", "world_data": world_data}, output_tokens=100)
+
+        assert budgeter.counter.count(prompt) <= budgeter.prompt_limit(100)
+        assert HEAD_CUT_MARK in prompt
+        assert "line 0199" in prompt and "line 0000" not in prompt
+        assert budgeter.stats() == {"fitted": 1, "overflows": 0}
+
+    def test_priority_cuts_low_priority_first(self):
+        """Test that priority cuts the least important variable and keeps its beginning"""
+        budgeter = _budgeter("priority")
+        keywords = "keyword " * 100
+        world_data = "\n".join(f"line {n:04d} " + "x" * 30 for n in range(200))
+
+        prompt = budgeter.fit(
+            TEMPLATE,
+            {"keywords": keywords, "world_data": world_data},
+            output_tokens=100,
+            priority=["keywords", "world_data"],
+        )
+
+        assert keywords in prompt
+        assert TAIL_CUT_MARK in prompt
+        assert "line 0000" in prompt and "line 0199" not in prompt
+
+    def test_unknown_strategy(self):
+        """Test that an unknown strategy is rejected"""
+        with pytest.raises(ValueError):
+            _budgeter("random")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
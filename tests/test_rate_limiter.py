@@ -0,0 +1,95 @@
+"""
+Tests for rate_limiter module
+"""
+
+import asyncio
+import threading
+
+import pytest
+from unittest.mock import Mock, patch
+from src.ollama_client import OllamaClient
+from src.rate_limiter import RateLimiter, TokenBucket
+
+
+class TestRateLimiter:
+    """Test cases for TokenBucket and RateLimiter"""
+
+    def test_bucket_allows_burst_then_spaces_requests(self):
+        """Test that a burst is admitted and later callers are queued"""
+        with patch("src.rate_limiter.time.monotonic", return_value=100.0):
+            bucket = TokenBucket(rate_per_minute=60, burst=2)
+            waits = [bucket.reserve() for _ in range(4)]
+
+        assert waits == pytest.approx([0.0, 0.0, 1.0, 2.0])
+
+    def test_bucket_refills_over_time(self):
+        """Test that tokens are refilled at the configured rate"""
+        with patch("src.rate_limiter.time.monotonic", return_value=100.0):
+            bucket = TokenBucket(rate_per_minute=60, burst=1)
+            assert bucket.reserve() == 0.0
+
+        with patch("src.rate_limiter.time.monotonic", return_value=101.5):
+            assert bucket.reserve() == 0.0
+
+    def test_per_class_limit_and_wait_metrics(self):
+        """Test that a class limit applies on top of the host limit"""
+        limiter = RateLimiter(max_requests_per_minute=600, burst=1, per_class={"batch": 60})
+
+        with patch("src.rate_limiter.time.monotonic", return_value=100.0):
+            assert limiter._reserve("http://a", "batch") == 0.0
+            assert limiter._reserve("http://b", "batch") == pytest.approx(1.0)
+            assert limiter._reserve("http://c", "interactive") == 0.0
+
+        stats = limiter.stats()
+        assert stats["requests"] == 3
+        assert stats["delayed_requests"] == 1
+        assert stats["total_wait_seconds"] == pytest.approx(1.0)
+
+    def test_thread_and_async_safety(self):
+        """Test that concurrent reservations never hand out the same slot"""
+        limiter = RateLimiter(max_requests_per_minute=6000, burst=1)
+        waits = []
+        lock = threading.Lock()
+
+        def worker():
+            wait = limiter._reserve("http://a", "default")
+            with lock:
+                waits.append(wait)
+
+        threads = [threading.Thread(target=worker) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        async def run_async():
+            await asyncio.gather(*(limiter.acquire_async("http://b") for _ in range(3)))
+
+        asyncio.run(run_async())
+
+        # Each queued caller waits one interval (0.01s) longer than the previous one
+        ordered = sorted(waits)
+        gaps = [b - a for a, b in zip(ordered, ordered[1:])]
+        assert all(gap > 0.005 for gap in gaps[1:])
+        assert limiter.stats()["requests"] == 23
+
+    @patch('requests.Session.post')
+    def test_client_acquires_before_request(self, mock_post):
+        """Test that OllamaClient consults the limiter for each request"""
+        limiter = RateLimiter(max_requests_per_minute=60)
+        limiter.acquire = Mock(return_value=0.0)
+        client = OllamaClient(rate_limiter=limiter, request_class="batch")
+
+        mock_response = Mock()
+        mock_response.json.return_value = {"response": "ok"}
+        mock_post.return_value = mock_response
+
+        client.generate("Test prompt")
+        client.generate("Test prompt", request_class="interactive")
+
+        assert limiter.acquire.call_args_list[0].args == (client.base_url, "batch")
+        assert limiter.acquire.call_args_list[1].args == (client.base_url, "interactive")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
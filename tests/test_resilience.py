@@ -0,0 +1,146 @@
+"""
+Tests for resilience module
+"""
+
+import pytest
+import requests
+from unittest.mock import Mock, patch
+from src.ollama_client import OllamaClient
+from src.resilience import (
+    CircuitBreaker,
+    RetryBudget,
+    backoff_delay,
+    is_retryable_error,
+)
+
+
+def make_http_error(status_code):
+    """Build an HTTPError carrying a response with the given status"""
+    response = Mock()
+    response.status_code = status_code
+    response.json.return_value = {"error": f"status {status_code}"}
+    return requests.exceptions.HTTPError(f"{status_code} error", response=response)
+
+
+class TestResilience:
+    """Test cases for backoff, classification, budgets and circuit breakers"""
+
+    def test_backoff_delay_bounds(self):
+        """Test that jittered delays stay within the exponential cap"""
+        for attempt in range(6):
+            delay = backoff_delay(attempt, base_delay=1, max_delay=10)
+            assert 0 <= delay <= min(10, 2 ** attempt)
+
+    def test_error_classification(self):
+        """Test retryable vs fatal errors"""
+        assert is_retryable_error(requests.exceptions.Timeout())
+        assert is_retryable_error(requests.exceptions.ConnectionError())
+        assert is_retryable_error(make_http_error(503))
+        assert is_retryable_error(make_http_error(429))
+        assert not is_retryable_error(make_http_error(404))
+        assert not is_retryable_error(make_http_error(400))
+
+    def test_retry_budget(self):
+        """Test that the retry budget is shared and resettable"""
+        budget = RetryBudget(2)
+        assert budget.try_consume()
+        assert budget.try_consume()
+        assert not budget.try_consume()
+        assert budget.remaining == 0
+
+        budget.reset()
+        assert budget.remaining == 2
+
+    def test_circuit_breaker_opens_and_recovers(self):
+        """Test open, half-open probe and close transitions"""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+        with patch("src.resilience.time.monotonic", return_value=100.0):
+            breaker.record_failure()
+            assert breaker.allow_request()
+            breaker.record_failure()
+            assert breaker.state == CircuitBreaker.OPEN
+            assert not breaker.allow_request()
+
+        with patch("src.resilience.time.monotonic", return_value=111.0):
+            assert breaker.allow_request()  # probe
+            assert not breaker.allow_request()  # only one probe at a time
+            breaker.record_success()
+            assert breaker.state == CircuitBreaker.CLOSED
+            assert breaker.allow_request()
+
+    def test_circuit_breaker_release_probe(self):
+        """Test that a released probe lets the next request probe"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+
+        with patch("src.resilience.time.monotonic", return_value=100.0):
+            breaker.record_failure()
+        with patch("src.resilience.time.monotonic", return_value=111.0):
+            assert breaker.allow_request()
+            breaker.release_probe()
+            assert breaker.state == CircuitBreaker.HALF_OPEN
+            assert breaker.allow_request()
+
+    @patch('requests.Session.post')
+    def test_fatal_error_is_not_retried(self, mock_post):
+        """Test that a 404 for an unknown model fails without retrying"""
+        client = OllamaClient(port=21001, max_retries=3, retry_delay=0)
+
+        mock_response = Mock()
+        mock_response.raise_for_status.side_effect = make_http_error(404)
+        mock_post.return_value = mock_response
+
+        assert client.generate("Test prompt") is None
+        assert mock_post.call_count == 1
+        assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+    @patch('requests.Session.post')
+    def test_open_circuit_fails_fast(self, mock_post):
+        """Test that an open circuit short-circuits requests"""
+        client = OllamaClient(port=21002, max_retries=3, retry_delay=0, circuit_failure_threshold=2)
+
+        mock_post.side_effect = requests.exceptions.ConnectionError("refused")
+
+        assert client.generate("Test prompt") is None
+        assert mock_post.call_count == 2  # circuit opened after two failures
+
+        assert client.generate("Test prompt") is None
+        assert mock_post.call_count == 2
+
+    @patch('requests.Session.post')
+    def test_probe_without_verdict_releases_slot(self, mock_post):
+        """Test that a half-open probe answered with a 404 does not wedge the circuit"""
+        client = OllamaClient(port=21004, max_retries=1, retry_delay=0, circuit_failure_threshold=1)
+        breaker = client.circuit_breaker
+
+        with patch("src.resilience.time.monotonic", return_value=100.0):
+            breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        mock_response = Mock()
+        mock_response.raise_for_status.side_effect = make_http_error(404)
+        mock_post.return_value = mock_response
+
+        with patch("src.resilience.time.monotonic", return_value=200.0):
+            assert client.generate("Test prompt") is None  # the probe
+            assert breaker.state == CircuitBreaker.HALF_OPEN
+
+            mock_post.return_value = Mock(**{"json.return_value": {"response": "ok"}})
+            assert client.generate("Test prompt") == "ok"
+
+        assert mock_post.call_count == 2
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    @patch('requests.Session.post')
+    def test_retry_budget_limits_retries(self, mock_post):
+        """Test that an exhausted retry budget stops retries"""
+        client = OllamaClient(port=21003, max_retries=5, retry_delay=0, retry_budget=RetryBudget(1))
+
+        mock_post.side_effect = requests.exceptions.Timeout("timed out")
+
+        assert client.generate("Test prompt") is None
+        assert mock_post.call_count == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
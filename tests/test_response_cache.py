@@ -0,0 +1,102 @@
+"""
+Tests for ResponseCache module
+"""
+
+import os
+import time
+
+import pytest
+from unittest.mock import Mock, patch
+from src.ollama_client import OllamaClient
+from src.response_cache import ResponseCache
+
+
+class TestResponseCache:
+    """Test cases for ResponseCache"""
+
+    def test_key_depends_on_all_inputs(self):
+        """Test that every request component changes the cache key"""
+        base = dict(model="m", prompt="p", system_prompt="s", format="json", options={"temperature": 0.7})
+        key = ResponseCache.make_key(**base)
+
+        assert key == ResponseCache.make_key(**base)
+        for field, value in [
+            ("model", "other"),
+            ("prompt", "other"),
+            ("system_prompt", "other"),
+            ("format", ""),
+            ("options", {"temperature": 0.8}),
+        ]:
+            assert key != ResponseCache.make_key(**{**base, field: value})
+
+    def test_set_get_and_persistence(self, tmp_path):
+        """Test round trip and reload from disk"""
+        cache = ResponseCache(cache_dir=str(tmp_path))
+        cache.set("abc", "日本語の応答")
+
+        assert cache.get("abc") == "日本語の応答"
+        assert cache.get("missing") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+        reloaded = ResponseCache(cache_dir=str(tmp_path))
+        assert reloaded.get("abc") == "日本語の応答"
+
+    def test_ttl_expiry(self, tmp_path):
+        """Test that expired entries are treated as misses"""
+        cache = ResponseCache(cache_dir=str(tmp_path), ttl=10)
+        cache.set("abc", "response")
+
+        with patch("src.response_cache.time.time", return_value=time.time() + 60):
+            assert cache.get("abc") is None
+
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction(self, tmp_path):
+        """Test that the least recently used entry is evicted first"""
+        entry_size = len('{"created_at": 0000000000.000000, "response": "xxxxxxxxxx"}')
+        cache = ResponseCache(cache_dir=str(tmp_path), max_size_mb=(entry_size * 2.5) / (1024 * 1024))
+
+        cache.set("a", "x" * 10)
+        cache.set("b", "x" * 10)
+        cache.get("a")  # "b" is now least recently used
+        cache.set("c", "x" * 10)
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+        assert cache.stats()["evictions"] == 1
+        assert not os.path.exists(tmp_path / "b.json")
+
+    @patch('requests.Session.post')
+    def test_client_uses_cache_and_bypass(self, mock_post, tmp_path):
+        """Test OllamaClient cache hits and the use_cache bypass"""
+        client = OllamaClient(cache=ResponseCache(cache_dir=str(tmp_path)))
+
+        mock_response = Mock()
+        mock_response.json.return_value = {"response": '{"key": "value"}'}
+        mock_post.return_value = mock_response
+
+        assert client.generate_json("Test prompt") == {"key": "value"}
+        assert client.generate_json("Test prompt") == {"key": "value"}
+        assert mock_post.call_count == 1
+
+        client.generate_json("Test prompt", use_cache=False)
+        assert mock_post.call_count == 2
+
+    @patch('requests.Session.post')
+    def test_client_drops_unparseable_cached_json(self, mock_post, tmp_path):
+        """Test that a response which fails JSON parsing is not kept in the cache"""
+        cache = ResponseCache(cache_dir=str(tmp_path))
+        client = OllamaClient(cache=cache)
+
+        mock_response = Mock()
+        mock_response.json.return_value = {"response": "not json"}
+        mock_post.return_value = mock_response
+
+        assert client.generate_json("Test prompt") is None
+        assert cache.stats()["entries"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,58 @@
+"""
+Tests for schema module
+"""
+
+import pytest
+from src.schema import _validate_subset, validate_json_schema
+
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "characters": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "type": {"type": "string", "enum": ["protagonist", "adversary"]},
+                    "name": {"type": "string"},
+                },
+                "required": ["type", "name"],
+            },
+            "minItems": 1,
+        },
+    },
+    "required": ["characters"],
+}
+
+
+class TestSchemaValidation:
+    """Test cases for JSON Schema validation"""
+
+    def test_valid_data(self):
+        """Test that matching data has no errors"""
+        data = {"characters": [{"type": "protagonist", "name": "A"}]}
+        assert validate_json_schema(data, SCHEMA) == []
+        assert _validate_subset(data, SCHEMA, "$") == []
+
+    def test_missing_required_property(self):
+        """Test that missing properties are reported"""
+        errors = _validate_subset({"characters": [{"type": "protagonist"}]}, SCHEMA, "$")
+        assert errors == ["$.characters[0]: missing required property 'name'"]
+        assert validate_json_schema({"characters": [{"type": "protagonist"}]}, SCHEMA)
+
+    def test_wrong_type_and_enum(self):
+        """Test that type and enum mismatches are reported"""
+        errors = _validate_subset({"characters": [{"type": "hero", "name": 1}]}, SCHEMA, "$")
+        assert len(errors) == 2
+        assert any("not one of" in error for error in errors)
+        assert any("expected string" in error for error in errors)
+
+    def test_min_items(self):
+        """Test that empty arrays are rejected when minItems is set"""
+        errors = _validate_subset({"characters": []}, SCHEMA, "$")
+        assert errors == ["$.characters: expected at least 1 items, got 0"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,109 @@
+"""
+Tests for step_graph module
+"""
+
+import asyncio
+import pytest
+from src.step_graph import StepGraph
+
+
+def _step(log, name, seconds=0.0, result=None, error=None):
+    async def run():
+        log.append(f"start {name}")
+        await asyncio.sleep(seconds)
+        log.append(f"end {name}")
+        if error:
+            raise error
+        return result if result is not None else name
+    return run
+
+
+class TestStepGraph:
+    """Test cases for StepGraph"""
+
+    def test_dependencies_run_first(self):
+        """Test that a step starts only after its dependencies finished"""
+        log = []
+        graph = StepGraph(max_concurrency=4)
+        graph.add("social_structure", _step(log, "social_structure", 0.02))
+        graph.add("living_environment", _step(log, "living_environment"), ["social_structure"])
+
+        results = asyncio.run(graph.run())
+
+        assert results == {"social_structure": "social_structure", "living_environment": "living_environment"}
+        assert log.index("end social_structure") < log.index("start living_environment")
+
+    def test_ready_steps_overlap(self):
+        """Test that independent steps run at once, up to max_concurrency"""
+        log = []
+        graph = StepGraph(max_concurrency=2)
+        for name in ("a", "b", "c"):
+            graph.add(name, _step(log, name, 0.02))
+
+        asyncio.run(graph.run())
+
+        assert log[:2] == ["start a", "start b"]
+        assert log.index("start c") > log.index("end a")
+        assert graph.timings["a"][0] < graph.timings["b"][1]
+
+    def test_failure_skips_dependents(self):
+        """Test that a failed step skips the steps depending on it, not the others"""
+        log = []
+        graph = StepGraph()
+        graph.add("events", _step(log, "events", error=RuntimeError("server down")))
+        graph.add("observation", _step(log, "observation"), ["events"])
+        graph.add("other", _step(log, "other"))
+
+        results = asyncio.run(graph.run())
+
+        assert results == {"other": "other"}
+        assert graph.status == {"events": "failed", "observation": "skipped", "other": "done"}
+        assert "start observation" not in log
+
+    def test_invalid_graphs(self):
+        """Test that unknown dependencies, cycles and duplicates are rejected"""
+        graph = StepGraph()
+        graph.add("a", _step([], "a"), ["missing"])
+        with pytest.raises(ValueError):
+            graph.order()
+
+        graph = StepGraph()
+        graph.add("a", _step([], "a"), ["b"])
+        graph.add("b", _step([], "b"), ["a"])
+        with pytest.raises(ValueError, match="cycle"):
+            asyncio.run(graph.run())
+
+        with pytest.raises(ValueError):
+            graph.add("a", _step([], "a"))
+
+    def test_priority_orders_ready_steps(self):
+        """Test that a free slot goes to the ready step with the highest priority"""
+        log = []
+        graph = StepGraph(max_concurrency=1)
+        graph.add("plot", _step(log, "plot", 0.01))
+        graph.add("extract_chapter.02", _step(log, "extract_chapter.02"), ["plot"], priority=1)
+        graph.add("reference", _step(log, "reference"), ["plot"])
+        graph.add("chapter_01", _step(log, "chapter_01"), ["plot"], priority=2)
+
+        asyncio.run(graph.run())
+
+        starts = [entry[len("start "):] for entry in log if entry.startswith("start ")]
+        assert starts == ["plot", "chapter_01", "extract_chapter.02", "reference"]
+
+    def test_critical_path(self):
+        """Test that the critical path follows the dependency each step waited for longest"""
+        graph = StepGraph(max_concurrency=4)
+        graph.add("plottype_list", _step([], "plottype_list", 0.01))
+        graph.add("desire_list", _step([], "desire_list", 0.05))
+        graph.add("plottype_selection", _step([], "plottype_selection", 0.01), ["plottype_list"])
+        graph.add("characters", _step([], "characters", 0.01), ["desire_list", "plottype_selection"])
+        graph.add("events", _step([], "events"), ["plottype_selection"])
+
+        assert graph.critical_path() == []
+        asyncio.run(graph.run())
+
+        assert graph.critical_path() == ["desire_list", "characters"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,67 @@
+"""
+Tests for token_counter module
+"""
+
+import pytest
+from unittest.mock import Mock
+from src.mock_server import MockOllamaServer
+from src.ollama_client import OllamaClient
+from src.token_counter import TokenCounter, local_token_estimate
+
+
+class TestEstimateTokens:
+    """Test cases for the local approximation"""
+
+    def test_japanese_counts_per_character(self):
+        """Test that Japanese text is not counted at four characters per token"""
+        assert local_token_estimate("霧の向こうで") == 6
+        assert local_token_estimate("abcdefgh") == 2
+        assert local_token_estimate("") == 0
+
+
+class TestTokenCounter:
+    """Test cases for TokenCounter"""
+
+    def test_server_counts_are_memoized(self):
+        """Test that a text is tokenized by the server only once"""
+        client = Mock()
+        client.tokenize.return_value = [1, 2, 3]
+
+        counter = TokenCounter(client)
+        assert counter.count("世界設定") == 3
+        assert counter.count("世界設定") == 3
+
+        assert client.tokenize.call_count == 1
+        assert counter.stats()["hits"] == 1
+
+    def test_fallback_is_calibrated(self):
+        """Test that the approximation is scaled by observed real counts"""
+        client = Mock()
+        client.tokenize.side_effect = [list(range(50)), None]
+
+        counter = TokenCounter(client)
+        counter.count("あ" * 100)  # estimated 100, really 50
+        assert counter.ratio == pytest.approx(0.5)
+
+        # The endpoint failed: later counts use the calibrated approximation
+        assert counter.count("い" * 40) == 20
+        assert not counter.use_server
+        assert counter.count("う" * 40) == 20
+        assert client.tokenize.call_count == 2
+
+    def test_local_only(self):
+        """Test that no server is asked without a client"""
+        counter = TokenCounter()
+        assert counter.count("abcdefgh") == 2
+        assert counter.stats()["server_counts"] == 0
+
+    def test_mock_server_tokenize(self):
+        """Test counting through /api/tokenize of the mock server"""
+        with MockOllamaServer() as server:
+            counter = TokenCounter(OllamaClient(hosts=[server.base_url]))
+            assert counter.count("a" * 40) == 10
+        assert counter.stats()["server_counts"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])